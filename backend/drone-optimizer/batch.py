@@ -0,0 +1,243 @@
+"""Plan many sites in one run on a shared process pool.
+
+The manifest lists site directories (each with the usual .npy / .wkt inputs)
+and optional per-site settings; relative paths are relative to the manifest:
+
+    {
+      "defaults": {"max_distance": 37725, "time_budget_s": 300},
+      "sites": [
+        "substations/orange_12",
+        {"data_dir": "feeders/f_204", "name": "f_204", "max_distance": 17000, "time_budget_s": 900}
+      ]
+    }
+
+    python batch.py sites.json --workers 8 --output-root D:\\plans\\2025-q3
+
+Sites are solved one per worker process, largest first, so the longest solves
+start early and small sites fill the gaps at the end. Every site gets its own
+namespace <output-root>/<name>/ with output/, cache/ and solve.log (the
+site's console output). A throughput report (sites per hour, solver CPU time)
+is printed and written to <output-root>/batch_report.json.
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+import argparse
+import contextlib
+import json
+import os
+import time
+
+from terminal import DEFAULT_MAX_DISTANCE_PER_TRIP, DroneOptimizer, load_array, route_set_stats
+
+# name -> (type, default, minimum); None defaults are optional
+SITE_PARAMS = {
+    "max_distance": (int, DEFAULT_MAX_DISTANCE_PER_TRIP, 1),
+    "time_budget_s": ((int, float), 300, 1),
+    "time_limit": ((int, float), None, 1),
+    "max_vehicles": (int, 60, 1),
+    "min_vehicles": (int, None, 1),
+    "subset": (int, None, 1),
+}
+# Without an explicit time_limit, each probe gets time_budget_s divided by
+# this; the budget itself is a deadline, so later probes may get less
+PROBES_PER_BUDGET = 5
+DEFAULT_OUTPUT_ROOT = "batch_output"
+
+# --- Manifest ---
+def _site_params(entry, defaults, where):
+    unknown = sorted(set(entry) - set(SITE_PARAMS) - {"data_dir", "name"})
+    if unknown:
+        raise ValueError(f"{where}: unknown settings {', '.join(unknown)}")
+    params = {}
+    for name, (kind, default, minimum) in SITE_PARAMS.items():
+        value = entry.get(name, defaults.get(name, default))
+        if value is not None:
+            if isinstance(value, bool) or not isinstance(value, kind) or value < minimum:
+                raise ValueError(f"{where}: {name} must be a number >= {minimum}")
+        params[name] = value
+    return params
+
+def load_manifest(path):
+    """Site list of a batch manifest.
+
+    Returns:
+        List of site dicts with name, data_dir and every key of SITE_PARAMS
+
+    Raises:
+        ValueError: For malformed entries, missing directories or duplicate names
+    """
+    path = Path(path)
+    manifest = json.loads(path.read_text())
+    if isinstance(manifest, list):
+        manifest = {"sites": manifest}
+    defaults = manifest.get("defaults", {})
+    _site_params(defaults, {}, "defaults")
+
+    sites, names = [], set()
+    for i, entry in enumerate(manifest.get("sites", [])):
+        entry = {"data_dir": entry} if isinstance(entry, str) else dict(entry)
+        where = f"site {i + 1}"
+        if "data_dir" not in entry:
+            raise ValueError(f"{where}: data_dir is required")
+        data_dir = (path.parent / entry["data_dir"]).resolve()
+        if not data_dir.is_dir():
+            raise ValueError(f"{where}: {data_dir} is not a directory")
+        name = entry.get("name") or data_dir.name
+        if name in names:
+            raise ValueError(f"{where}: duplicate site name '{name}'; set a unique \"name\"")
+        names.add(name)
+        sites.append({"name": name, "data_dir": str(data_dir), **_site_params(entry, defaults, where)})
+    if not sites:
+        raise ValueError(f"{path} lists no sites")
+    return sites
+
+def site_size(site):
+    """Number of photo waypoints a site's solve will visit."""
+    photo = load_array(site["data_dir"], "photo_indexes")
+    num_navigable = load_array(site["data_dir"], "distance_matrix").shape[0]
+    # Same inclusive/exclusive end handling as create_data_model
+    count = int(photo[1] - photo[0]) + (0 if photo[1] == num_navigable else 1)
+    return min(count, site["subset"]) if site["subset"] else count
+
+# --- Solving ---
+def solve_site(site, output_root, export=True):
+    """Worker task: solve and export one site in its own namespace.
+
+    The site's console output goes to <namespace>/solve.log.
+
+    Returns:
+        Dict with the site name, size, feasibility, plan, wall and CPU time, or the error
+    """
+    namespace = Path(output_root) / site["name"]
+    namespace.mkdir(parents=True, exist_ok=True)
+    time_limit = site["time_limit"] or max(1, site["time_budget_s"] / PROBES_PER_BUDGET)
+    result = {"name": site["name"], "data_dir": site["data_dir"], "size": site.get("size"),
+              "time_budget_s": site["time_budget_s"], "per_attempt_time_s": time_limit, "feasible": False}
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+
+    with open(namespace / "solve.log", "w") as log, contextlib.redirect_stdout(log):
+        try:
+            optimizer = DroneOptimizer(site["data_dir"], max_distance_per_trip=site["max_distance"],
+                                       cache_dir=namespace / "cache", output_dir=namespace / "output")
+            # Loading the site counts against the budget too. The configured
+            # budget is part of the cache key; the time left is not
+            all_routes = optimizer.solve(subset_size=site["subset"], max_vehicles=site["max_vehicles"],
+                                         per_attempt_time_s=time_limit, min_vehicles=site["min_vehicles"],
+                                         time_budget_s=site["time_budget_s"],
+                                         deadline=wall_start + site["time_budget_s"])
+            result["feasible"] = all_routes is not None
+            if all_routes is not None:
+                result["plan"] = route_set_stats(all_routes)
+                result["from_cache"] = optimizer.from_cache
+                if export:
+                    geofence = optimizer.export()["geofence"]
+                    result["geofence_violations"] = len(geofence["violations"]) if geofence else None
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+            print(f"✗ {result['error']}")
+
+    result["wall_time_s"] = round(time.perf_counter() - wall_start, 3)
+    # process_time counts every thread of the worker, including the native solver
+    result["cpu_time_s"] = round(time.process_time() - cpu_start, 3)
+    result["over_budget"] = result["wall_time_s"] > site["time_budget_s"]
+    return result
+
+def run_batch(sites, output_root=DEFAULT_OUTPUT_ROOT, workers=None, export=True):
+    """Solve every site on a shared process pool, largest first.
+
+    Returns:
+        Report dict with per-site results and the aggregate throughput
+    """
+    workers = max(1, min(workers or os.cpu_count() or 1, len(sites)))
+    for site in sites:
+        site["size"] = site_size(site)
+    # Longest-processing-time first: big sites start early, small ones fill in
+    order = sorted(sites, key=lambda s: s["size"], reverse=True)
+    print(f"\n=== Batch: {len(sites)} sites on {workers} worker(s) ===")
+
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(solve_site, site, str(output_root), export): site for site in order}
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if result.get("error"):
+                status = f"✗ {result['error']}"
+            elif not result["feasible"]:
+                status = "✗ infeasible"
+            else:
+                status = (f"✓ {result['plan']['num_vehicles']} drones, "
+                          f"{result['plan']['total_distance'] / 5280:.1f} mi")
+            print(f"[{len(results)}/{len(sites)}] {result['name']} ({result['size']} waypoints): {status} "
+                  f"in {result['wall_time_s']:.1f} s")
+    wall_time = time.perf_counter() - start
+
+    results.sort(key=lambda r: r["size"], reverse=True)
+    cpu_time = sum(r["cpu_time_s"] for r in results)
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "output_root": str(output_root),
+        "workers": workers,
+        "num_sites": len(results),
+        "feasible": sum(1 for r in results if r.get("feasible")),
+        "failed": sum(1 for r in results if r.get("error")),
+        "over_budget": sum(1 for r in results if r["over_budget"]),
+        "wall_time_s": round(wall_time, 3),
+        "cpu_time_s": round(cpu_time, 3),
+        "sites_per_hour": round(len(results) * 3600 / wall_time, 2) if wall_time > 0 else None,
+        "waypoints_per_hour": round(sum(r["size"] for r in results) * 3600 / wall_time) if wall_time > 0 else None,
+        "cpu_utilization": round(cpu_time / (wall_time * workers), 3) if wall_time > 0 else None,
+        "sites": results,
+    }
+
+def print_batch_report(report):
+    """Per-site results and the aggregate throughput of a batch run."""
+    print("\n=== Batch Report ===")
+    print(f"  {'site':<24}{'waypoints':>10}{'drones':>8}{'miles':>9}{'wall':>9}{'cpu':>9}  status")
+    for r in report["sites"]:
+        plan = r.get("plan") or {}
+        miles = f"{plan['total_distance'] / 5280:.1f}" if plan else "-"
+        status = ("error" if r.get("error") else "infeasible" if not r["feasible"]
+                  else "cached" if r.get("from_cache") else "ok")
+        if r["over_budget"]:
+            status += ", over budget"
+        if r.get("geofence_violations"):
+            status += f", {r['geofence_violations']} geofence violation(s)"
+        print(f"  {r['name']:<24}{r['size']:>10}{plan.get('num_vehicles', '-'):>8}{miles:>9}"
+              f"{r['wall_time_s']:>8.1f}s{r['cpu_time_s']:>8.1f}s  {status}")
+    print(f"\n  Sites: {report['num_sites']} ({report['feasible']} feasible, {report['failed']} failed, "
+          f"{report['over_budget']} over budget)")
+    print(f"  Wall time: {report['wall_time_s']:.1f} s on {report['workers']} worker(s)")
+    print(f"  Solver CPU time: {report['cpu_time_s']:.1f} s "
+          f"({100 * (report['cpu_utilization'] or 0):.0f}% of the pool)")
+    print(f"  Throughput: {report['sites_per_hour']} sites/hour, {report['waypoints_per_hour']} waypoints/hour")
+
+# --- Command line ---
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Plan every site of a manifest on a shared process pool.")
+    parser.add_argument("manifest", help="JSON manifest of site directories (see batch.py)")
+    parser.add_argument("--workers", type=int, default=None, help="sites solved at once (default: CPU count)")
+    parser.add_argument("--output-root", default=DEFAULT_OUTPUT_ROOT,
+                        help=f"directory of the per-site namespaces (default: {DEFAULT_OUTPUT_ROOT})")
+    parser.add_argument("--report", default=None,
+                        help="throughput report path (default: <output-root>/batch_report.json)")
+    parser.add_argument("--no-export", action="store_true", help="solve only, skip writing the output files")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Command-line entry point; returns a process exit code."""
+    args = parse_args(argv)
+    sites = load_manifest(args.manifest)
+    output_root = Path(args.output_root)
+    output_root.mkdir(parents=True, exist_ok=True)
+
+    report = run_batch(sites, output_root, args.workers, export=not args.no_export)
+    print_batch_report(report)
+    report_path = Path(args.report) if args.report else output_root / "batch_report.json"
+    report_path.write_text(json.dumps(report, indent=2))
+    print(f"✓ Batch report written to {report_path}")
+    return 1 if report["failed"] else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
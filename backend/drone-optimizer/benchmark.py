@@ -0,0 +1,442 @@
+"""Benchmark harness for the optimizer pipeline on synthetic sites.
+
+Generates grid-inspection sites of any size in the same file layout as a real
+site (points, index ranges, polygon, distance and predecessor matrices), runs
+every pipeline stage on them and writes a JSON report:
+
+    python benchmark.py run --sizes 100 1000 5000 --report bench.json
+    python benchmark.py compare baseline.json bench.json
+    python benchmark.py generate --size 2000 --out D:\\sites\\synthetic_2000
+
+Sites whose dense matrices would exceed LARGE_SITE_BYTES on disk (about
+15,000 waypoints and up) are only generated with --allow-large.
+
+Stages: load, create_data_model, model_build, solve, path_expansion, geofence,
+export and serve (Flask test client against server.py). Each stage is recorded
+with instrumentation.stages and reports its wall and CPU time, the peak of
+traced Python/numpy allocations (tracemalloc) and the change of the process
+resident set size over the stage, where the platform reports it.
+"""
+from pathlib import Path
+import argparse
+import json
+import math
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import shapely
+from shapely.geometry import Polygon
+
+import instrumentation
+from mission_format import FEET_PER_DEGREE
+from preprocess import write_shortest_paths
+import terminal
+
+REPORT_VERSION = 2
+DEFAULT_SIZES = (100, 500, 1000, 2000)
+# Site center; only affects the lon/lat of the generated points
+SITE_CENTER = (-81.38, 28.54)
+GRID_SPACING_FT = 150.0
+ASSETS_PER_WAYPOINT = 0.25
+SITE_INFO = "site.json"
+# float64 distance plus int32 predecessor per node pair (see preprocess.write_shortest_paths)
+MATRIX_BYTES_PER_PAIR = 12
+# Larger sites need allow_large: 20,000 waypoints are about 28,000 nodes, 9 GB
+LARGE_SITE_BYTES = 4 * 2**30
+
+# --- Synthetic sites ---
+def _star_polygon(rng, radius_ft, vertices=16):
+    """Irregular star-shaped polygon around (0, 0), in feet."""
+    angles = np.sort(rng.uniform(0, 2 * np.pi, vertices))
+    radii = radius_ft * rng.uniform(0.7, 1.0, vertices)
+    return np.column_stack((radii * np.cos(angles), radii * np.sin(angles)))
+
+def _to_lon_lat(xy_ft):
+    lon0, lat0 = SITE_CENTER
+    lon = lon0 + xy_ft[:, 0] / (FEET_PER_DEGREE * math.cos(math.radians(lat0)))
+    lat = lat0 + xy_ft[:, 1] / FEET_PER_DEGREE
+    return np.column_stack((lon, lat))
+
+def generate_site(out_dir, num_waypoints, seed=0, spacing_ft=GRID_SPACING_FT, workers=None,
+                  allow_large=False):
+    """Write a synthetic grid-inspection site with the input files of a real one.
+
+    Intermediate waypoints sit on a square street grid clipped to a random
+    polygon; photo waypoints are placed along grid edges and connected to the
+    edge's two ends, so drone paths between photos run over the grid. Assets
+    are poles next to grid nodes. The photo nearest the polygon center is
+    index 0, the depot.
+
+    Args:
+        out_dir: Directory for the .npy files, polygon_lon_lat.wkt and site.json
+        num_waypoints: Number of photo waypoints
+        seed: Random seed; the same arguments always give the same site
+        spacing_ft: Distance between neighboring grid nodes
+        workers: Dijkstra worker processes (see preprocess.write_shortest_paths)
+        allow_large: Write matrices larger than LARGE_SITE_BYTES
+
+    Returns:
+        Dict written to site.json (sizes, suggested max distance, generation time)
+
+    Raises:
+        ValueError: If the site is too small for a grid, or its matrices would
+            exceed LARGE_SITE_BYTES without allow_large
+    """
+    start = time.perf_counter()
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    # About one grid node per two photos; the polygon clips roughly a third
+    side = max(4, math.ceil(math.sqrt(num_waypoints / 2) * 1.3))
+    radius_ft = side * spacing_ft / 2
+    polygon_ft = Polygon(_star_polygon(rng, radius_ft))
+
+    axis = (np.arange(side) - (side - 1) / 2) * spacing_ft
+    gx, gy = np.meshgrid(axis, axis, indexing="ij")
+    grid_xy = np.column_stack((gx.ravel(), gy.ravel()))
+    inside = shapely.contains_xy(polygon_ft, grid_xy[:, 0], grid_xy[:, 1])
+    grid_id = np.full(len(grid_xy), -1)
+    grid_id[inside] = np.arange(inside.sum())
+    grid_xy = grid_xy[inside]
+
+    # Street segments between horizontally and vertically adjacent inside nodes
+    cell = grid_id.reshape(side, side)
+    pairs = [np.column_stack((cell[:-1, :].ravel(), cell[1:, :].ravel())),
+             np.column_stack((cell[:, :-1].ravel(), cell[:, 1:].ravel()))]
+    grid_edges = np.concatenate(pairs)
+    grid_edges = grid_edges[(grid_edges >= 0).all(axis=1)]
+    if not len(grid_edges):
+        raise ValueError("Site too small to build a grid; use more waypoints")
+
+    # Photo waypoints along random segments, slightly off the line
+    on_edge = grid_edges[rng.integers(0, len(grid_edges), num_waypoints)]
+    t = rng.uniform(0.1, 0.9, num_waypoints)[:, None]
+    a, b = grid_xy[on_edge[:, 0]], grid_xy[on_edge[:, 1]]
+    photo_xy = a + t * (b - a) + rng.normal(0, 5.0, (num_waypoints, 2))
+    order = np.argsort(np.hypot(photo_xy[:, 0], photo_xy[:, 1]), kind="stable")
+    order = np.concatenate(([order[0]], np.sort(order[1:])))
+    photo_xy, on_edge = photo_xy[order], on_edge[order]
+
+    # Node ids: photos first, then grid nodes (the navigable points), then assets
+    num_photos, num_grid = num_waypoints, len(grid_xy)
+    num_nodes = num_photos + num_grid
+    matrix_bytes = num_nodes ** 2 * MATRIX_BYTES_PER_PAIR
+    if matrix_bytes > LARGE_SITE_BYTES and not allow_large:
+        raise ValueError(f"{num_waypoints} waypoints need {num_nodes} nodes and {matrix_bytes / 2**30:.1f} GB "
+                         f"of dense matrices on disk; pass allow_large=True (--allow-large) to write them")
+    photo_ids = np.arange(num_photos)
+    edges = np.concatenate((
+        grid_edges + num_photos,
+        np.column_stack((photo_ids, on_edge[:, 0] + num_photos)),
+        np.column_stack((photo_ids, on_edge[:, 1] + num_photos)),
+    ))
+    node_xy = np.concatenate((photo_xy, grid_xy))
+    lengths = np.hypot(*(node_xy[edges[:, 0]] - node_xy[edges[:, 1]]).T)
+
+    num_assets = max(1, int(num_waypoints * ASSETS_PER_WAYPOINT))
+    asset_xy = grid_xy[rng.integers(0, num_grid, num_assets)] + rng.normal(0, 8.0, (num_assets, 2))
+
+    write_shortest_paths(num_nodes, edges, lengths, out_dir, workers)
+
+    # Index ranges in the layout of the real site files: [start, end]
+    np.save(out_dir / "points_lat_long.npy", _to_lon_lat(np.concatenate((node_xy, asset_xy))))
+    np.save(out_dir / "photo_indexes.npy", np.array([0, num_photos - 1]))
+    np.save(out_dir / "waypoint_indexes.npy", np.array([num_photos, num_nodes - 1]))
+    np.save(out_dir / "asset_indexes.npy", np.array([num_nodes, num_nodes + num_assets - 1]))
+    lon_lat = _to_lon_lat(np.asarray(polygon_ft.exterior.coords))
+    (out_dir / "polygon_lon_lat.wkt").write_text(Polygon(lon_lat).wkt)
+
+    # Longest depot round trip plus slack, so every waypoint is reachable
+    depot_row = np.load(out_dir / "distance_matrix.npy", mmap_mode="r")[0]
+    info = {
+        "num_waypoints": num_waypoints,
+        "num_grid_nodes": num_grid,
+        "num_assets": num_assets,
+        "seed": seed,
+        "spacing_ft": spacing_ft,
+        "max_distance_ft": int(math.ceil(2.5 * float(np.max(depot_row)) / 1000) * 1000),
+        "matrix_bytes": matrix_bytes,
+        "generate_time_s": round(time.perf_counter() - start, 3),
+    }
+    (out_dir / SITE_INFO).write_text(json.dumps(info, indent=2))
+    return info
+
+def ensure_site(work_dir, num_waypoints, seed=0, allow_large=False):
+    """Generated site of this size and seed, reused from work_dir if present."""
+    site_dir = Path(work_dir) / f"site_{num_waypoints}_{seed}"
+    info_file = site_dir / SITE_INFO
+    if info_file.exists():
+        return site_dir, json.loads(info_file.read_text())
+    print(f"\nGenerating synthetic site with {num_waypoints} waypoints...")
+    info = generate_site(site_dir, num_waypoints, seed, allow_large=allow_large)
+    print(f"✓ {info['num_waypoints']} waypoints, {info['num_grid_nodes']} grid nodes "
+          f"in {info['generate_time_s']:.1f} s")
+    return site_dir, info
+
+# --- Measurement ---
+def _current_rss_bytes():
+    """Current resident set size of this process, or None where it is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+class StageTimer:
+    """Runs named pipeline stages on the process-wide stage recorder.
+
+    The optimizer's own stages (model builds, solve attempts, ...) nest inside
+    the benchmark stages, so their memory peaks are tracked consistently.
+
+    Args:
+        trace_memory: Track the peak of Python/numpy allocations per stage
+            with tracemalloc (native OR-Tools memory only shows in the RSS change)
+    """
+
+    def __init__(self, trace_memory=True):
+        self.recorder = instrumentation.stages
+        self.recorder.reset()
+        if trace_memory:
+            self.recorder.enable_memory_tracing()
+        self.stages = {}
+
+    def run(self, name, fn, *args, **kwargs):
+        """Call fn(*args, **kwargs) as stage `name` and return its result."""
+        rss_before = _current_rss_bytes()
+        try:
+            with self.recorder.stage(name):
+                return fn(*args, **kwargs)
+        finally:
+            # The stage's own record is appended after those of its children
+            record = self.recorder.records[-1]
+            stage = {key: value for key, value in record.items() if key != "stage"}
+            rss_after = _current_rss_bytes()
+            stage["rss_change_bytes"] = (rss_after - rss_before
+                                         if rss_before is not None and rss_after is not None else None)
+            self.stages[name] = stage
+
+def _serve(output_dir):
+    """Request the dashboard endpoints from server.py, cold and then cached."""
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    import server
+
+    server.OUTPUT_DIR = Path(output_dir)
+    client = server.app.test_client()
+    paths = ["/missions/summary", "/missions/1?zoom=14", "/mission-data"]
+    timings = {}
+    for label in ("cold", "cached"):
+        for path in paths:
+            start = time.perf_counter()
+            response = client.get(path, headers={"Accept-Encoding": "gzip"})
+            if response.status_code != 200:
+                raise RuntimeError(f"{path} returned {response.status_code}")
+            timings[f"{label} {path}"] = {"time_s": round(time.perf_counter() - start, 4),
+                                          "bytes": len(response.data)}
+    return timings
+
+def benchmark_site(site_dir, info, time_limit_s, trace_memory=True, serve=True):
+    """Run every pipeline stage on one site.
+
+    Returns:
+        Dict with the site info, per-stage measurements and the plan found
+    """
+    timer = StageTimer(trace_memory)
+    scratch = Path(tempfile.mkdtemp(prefix="bench_", dir=site_dir))
+    try:
+        return _run_stages(timer, site_dir, info, scratch, time_limit_s, serve)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+def _run_stages(timer, site_dir, info, scratch, time_limit_s, serve):
+
+    def load():
+        optimizer = terminal.DroneOptimizer(site_dir, max_distance_per_trip=info["max_distance_ft"],
+                                            cache_dir=scratch / "cache", output_dir=scratch / "output")
+        for name in ("distance_matrix", "predecessors", "points_lat_long", "asset_indexes",
+                     "photo_indexes", "waypoint_indexes", "polygon"):
+            getattr(optimizer, name)
+        return optimizer
+
+    optimizer = timer.run("load", load)
+    data = timer.run("create_data_model", optimizer.create_data_model)
+    est_min = terminal.estimate_min_vehicles(data["distance_matrix"], data["max_distance"])
+    timer.run("model_build", terminal.build_routing_model, data, est_min)
+    all_routes = timer.run("solve", optimizer.solve, per_attempt_time_s=time_limit_s, warm_start=False)
+    result = {"instance": info, "stages": timer.stages}
+    if all_routes is None:
+        result["plan"] = None
+        return result
+
+    timer.run("path_expansion", optimizer.expanded_routes)
+    timer.run("geofence", optimizer.validate_geofence)
+    timer.run("export", optimizer.export)
+    if serve:
+        try:
+            result["requests"] = timer.run("serve", _serve, optimizer.output_dir)
+        except ImportError as e:
+            print(f"⚠ Skipping the serve stage: {e}")
+    result["plan"] = terminal.route_set_stats(all_routes)
+    return result
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmark(sizes=DEFAULT_SIZES, time_limit_s=2, work_dir=None, seed=0,
+                  trace_memory=True, serve=True, allow_large=False):
+    """Benchmark the pipeline on synthetic sites of the given sizes.
+
+    allow_large is passed to generate_site for sites not yet in work_dir.
+
+    Returns:
+        Report dict (see write_report)
+    """
+    work_dir = Path(work_dir) if work_dir else Path(tempfile.gettempdir()) / "gridwatch-bench"
+    report = {
+        "version": REPORT_VERSION,
+        "commit": _git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"sizes": list(sizes), "time_limit_s": time_limit_s, "seed": seed,
+                   "trace_memory": trace_memory},
+        "instances": [],
+    }
+    for size in sizes:
+        site_dir, info = ensure_site(work_dir, size, seed, allow_large)
+        print(f"\n=== Benchmark: {size} waypoints ===")
+        report["instances"].append(benchmark_site(site_dir, info, time_limit_s, trace_memory, serve))
+    return report
+
+def write_report(report, path):
+    Path(path).write_text(json.dumps(report, indent=2))
+    print(f"✓ Benchmark report written to {path}")
+
+def print_report(report):
+    """Stage times and memory peaks of every instance."""
+    print(f"\n=== Benchmark report ({report.get('commit') or 'unknown commit'}) ===")
+    for instance in report["instances"]:
+        plan = instance.get("plan") or {}
+        print(f"\n  {instance['instance']['num_waypoints']} waypoints: "
+              f"{plan.get('num_vehicles', '-')} vehicles, {plan.get('total_distance', '-')} ft")
+        print(f"  {'stage':<20}{'time':>10}{'traced peak':>14}{'RSS change':>12}")
+        for name, stage in instance["stages"].items():
+            traced = stage.get("peak_traced_bytes")
+            rss = stage.get("rss_change_bytes")
+            print(f"  {name:<20}{stage['time_s']:>9.3f}s"
+                  f"{(f'{traced / 2**20:.1f} MB' if traced is not None else '-'):>14}"
+                  f"{(f'{rss / 2**20:+.0f} MB' if rss is not None else '-'):>12}")
+
+# --- Comparison ---
+def compare_reports(baseline, current, threshold_pct=10.0, min_time_s=0.05):
+    """Stage-by-stage time and memory changes between two reports.
+
+    Stages faster than min_time_s in both reports are too noisy to flag.
+
+    Returns:
+        (rows, regressions); each row is (size, stage, old_s, new_s, change_pct,
+        old_peak, new_peak) and regressions are the rows slower than threshold_pct
+    """
+    old_by_size = {i["instance"]["num_waypoints"]: i for i in baseline["instances"]}
+    rows, regressions = [], []
+    for instance in current["instances"]:
+        size = instance["instance"]["num_waypoints"]
+        old = old_by_size.get(size)
+        if old is None:
+            continue
+        for name, stage in instance["stages"].items():
+            old_stage = old["stages"].get(name)
+            if old_stage is None:
+                continue
+            old_s, new_s = old_stage["time_s"], stage["time_s"]
+            change = 100.0 * (new_s - old_s) / old_s if old_s > 0 else 0.0
+            row = (size, name, old_s, new_s, change,
+                   old_stage.get("peak_traced_bytes"), stage.get("peak_traced_bytes"))
+            rows.append(row)
+            if change > threshold_pct and max(old_s, new_s) >= min_time_s:
+                regressions.append(row)
+    return rows, regressions
+
+def print_comparison(baseline, current, threshold_pct=10.0):
+    rows, regressions = compare_reports(baseline, current, threshold_pct)
+    print(f"\n=== {baseline.get('commit') or 'baseline'} -> {current.get('commit') or 'current'} ===")
+    print(f"  {'size':>6}  {'stage':<20}{'before':>10}{'after':>10}{'change':>9}{'traced peak':>22}")
+    for size, name, old_s, new_s, change, old_peak, new_peak in rows:
+        flag = "  ✗" if (size, name, old_s, new_s, change, old_peak, new_peak) in regressions else ""
+        peak = (f"{old_peak / 2**20:.1f} -> {new_peak / 2**20:.1f} MB"
+                if old_peak is not None and new_peak is not None else "-")
+        print(f"  {size:>6}  {name:<20}{old_s:>9.3f}s{new_s:>9.3f}s{change:>+8.1f}%{peak:>22}{flag}")
+    if regressions:
+        print(f"\n✗ {len(regressions)} stage(s) more than {threshold_pct:.0f}% slower")
+    else:
+        print(f"\n✓ No stage more than {threshold_pct:.0f}% slower")
+    return regressions
+
+# --- Command line ---
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the optimizer pipeline on synthetic sites.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="generate sites (if needed) and time every stage")
+    run.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), metavar="N")
+    run.add_argument("--time-limit", type=float, default=2, help="seconds per solve attempt")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--work-dir", default=None, help="where generated sites are kept between runs")
+    run.add_argument("--report", default="benchmark_report.json")
+    run.add_argument("--baseline", default=None, help="report to compare the new one against")
+    run.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    run.add_argument("--no-tracemalloc", action="store_true",
+                     help="skip allocation tracing (lower overhead, RSS change only)")
+    run.add_argument("--no-serve", action="store_true", help="skip the Flask serve stage")
+    run.add_argument("--allow-large", action="store_true",
+                     help=f"generate sites with more than {LARGE_SITE_BYTES // 2**30} GB of matrices")
+
+    compare = commands.add_parser("compare", help="compare two reports")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=10.0)
+
+    generate = commands.add_parser("generate", help="write one synthetic site")
+    generate.add_argument("--size", type=int, required=True, metavar="N")
+    generate.add_argument("--out", required=True)
+    generate.add_argument("--seed", type=int, default=0)
+    generate.add_argument("--workers", type=int, default=None, help="Dijkstra worker processes")
+    generate.add_argument("--allow-large", action="store_true",
+                          help=f"write more than {LARGE_SITE_BYTES // 2**30} GB of matrices")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Command-line entry point; returns a process exit code."""
+    args = parse_args(argv)
+    if args.command == "generate":
+        info = generate_site(args.out, args.size, args.seed, workers=args.workers,
+                             allow_large=args.allow_large)
+        print(json.dumps(info, indent=2))
+        return 0
+    if args.command == "compare":
+        baseline = json.loads(Path(args.baseline).read_text())
+        current = json.loads(Path(args.current).read_text())
+        return 1 if print_comparison(baseline, current, args.threshold) else 0
+
+    report = run_benchmark(args.sizes, args.time_limit, args.work_dir, args.seed,
+                           trace_memory=not args.no_tracemalloc, serve=not args.no_serve,
+                           allow_large=args.allow_large)
+    print_report(report)
+    write_report(report, args.report)
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        return 1 if print_comparison(baseline, report, args.threshold) else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
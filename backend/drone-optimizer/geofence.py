@@ -0,0 +1,109 @@
+"""Geofence validation of expanded mission paths against the flight polygon.
+
+Every segment of every mission is checked in one batch with shapely 2.x
+vectorized predicates: waypoints with contains_xy against the prepared
+polygon, and segments between two inside waypoints against an STRtree of the
+polygon's boundary edges, which catches legs that cut across a concave part
+of the boundary or a hole. Points within GEOFENCE_TOLERANCE_FT of the boundary
+count as inside, so waypoints placed on the boundary itself are not flagged.
+"""
+import time
+
+import numpy as np
+import shapely
+
+from mission_format import FEET_PER_DEGREE
+
+# Distance outside the polygon still accepted as inside
+GEOFENCE_TOLERANCE_FT = 1.0
+
+def boundary_edges(polygon):
+    """Two-point LineStrings of every ring edge of a Polygon or MultiPolygon."""
+    edges = []
+    for ring in shapely.get_parts(shapely.boundary(polygon)):
+        coords = shapely.get_coordinates(ring)
+        edges.append(np.stack((coords[:-1], coords[1:]), axis=1))
+    return shapely.linestrings(np.concatenate(edges)) if edges else np.empty(0, dtype=object)
+
+class Geofence:
+    """Flight boundary prepared for repeated batch checks.
+
+    Args:
+        polygon: Boundary in lon/lat (shapely Polygon or MultiPolygon)
+        tolerance_ft: Distance outside the polygon still accepted as inside
+    """
+
+    def __init__(self, polygon, tolerance_ft=GEOFENCE_TOLERANCE_FT):
+        self.polygon = polygon.buffer(tolerance_ft / FEET_PER_DEGREE) if tolerance_ft > 0 else polygon
+        shapely.prepare(self.polygon)
+        self.edges = boundary_edges(self.polygon)
+        self.tree = shapely.STRtree(self.edges)
+
+    def check(self, longitude, latitude, offsets):
+        """Check all missions of a flat waypoint layout.
+
+        Args:
+            longitude / latitude: Flat waypoint coordinates of all missions
+            offsets: Mission i spans [offsets[i], offsets[i + 1])
+
+        Returns:
+            Dict with the number of waypoints and segments checked, the elapsed
+            time and a list of violations, one per mission that leaves the
+            boundary: mission_id, outside_waypoints, crossing_segments and
+            first_violation (waypoint position within the mission)
+        """
+        start = time.perf_counter()
+        longitude = np.asarray(longitude, dtype=np.float64)
+        latitude = np.asarray(latitude, dtype=np.float64)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        inside = shapely.contains_xy(self.polygon, longitude, latitude)
+
+        # Segment k runs from waypoint k to k + 1, within a mission
+        has_next = np.ones(len(longitude), dtype=bool)
+        has_next[offsets[1:][offsets[1:] > offsets[:-1]] - 1] = False
+        current = np.flatnonzero(has_next)
+
+        # Legs with an outside end are violations already; the others only
+        # leave the polygon if they cross one of its edges
+        both_inside = current[inside[current] & inside[current + 1]]
+        crossing = np.zeros(len(longitude), dtype=bool)
+        if len(both_inside) and len(self.edges):
+            coords = np.stack((np.column_stack((longitude[both_inside], latitude[both_inside])),
+                               np.column_stack((longitude[both_inside + 1], latitude[both_inside + 1]))), axis=1)
+            hits = self.tree.query(shapely.linestrings(coords), predicate="intersects")[0]
+            crossing[both_inside[np.unique(hits)]] = True
+
+        mission_of = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+        outside_count = np.bincount(mission_of[~inside], minlength=len(offsets) - 1)
+        crossing_count = np.bincount(mission_of[crossing], minlength=len(offsets) - 1)
+        violations = []
+        for mission in np.flatnonzero(outside_count + crossing_count):
+            span = slice(offsets[mission], offsets[mission + 1])
+            first = int(np.flatnonzero(~inside[span] | crossing[span])[0])
+            violations.append({
+                "mission_id": int(mission) + 1,
+                "outside_waypoints": int(outside_count[mission]),
+                "crossing_segments": int(crossing_count[mission]),
+                "first_violation": first,
+            })
+
+        return {
+            "num_missions": len(offsets) - 1,
+            "num_waypoints": len(longitude),
+            "num_segments": len(current),
+            "violations": violations,
+            "time_s": round(time.perf_counter() - start, 4),
+        }
+
+def print_geofence_report(report):
+    """One line for a clean plan, or one line per mission that leaves the boundary."""
+    if not report["violations"]:
+        print(f"✓ Geofence: all {report['num_segments']} segments of {report['num_missions']} missions "
+              f"inside the boundary ({report['time_s'] * 1000:.1f} ms)")
+        return
+    print(f"⚠ Geofence: {len(report['violations'])} of {report['num_missions']} missions leave the boundary "
+          f"({report['time_s'] * 1000:.1f} ms)")
+    for v in report["violations"]:
+        print(f"  Mission {v['mission_id']}: {v['outside_waypoints']} waypoint(s) outside, "
+              f"{v['crossing_segments']} segment(s) crossing the boundary "
+              f"(first at waypoint {v['first_violation']})")
@@ -0,0 +1,153 @@
+"""Per-stage timing, memory peaks and opt-in profiling of the optimizer.
+
+The optimizer wraps its stages in `stage(name)`: array loads, create_data_model,
+every model build and solve attempt, path expansion, geofence validation and
+export. Each stage records wall time and CPU time, and with memory tracing
+enabled the peak of traced Python/numpy allocations during the stage
+(tracemalloc; the solver's native memory is not traced). Stages nest, and a
+parent's peak includes its children's.
+
+Recording goes to the module-level `stages` recorder, like a metrics
+registry; solves in worker processes (workers > 1, decomposition) are timed
+as a whole by the parent but their inner stages are not recorded.
+"""
+from collections import OrderedDict
+import contextlib
+import cProfile
+import functools
+import io
+import json
+import pstats
+import time
+import tracemalloc
+from pathlib import Path
+
+class StageRecorder:
+    """Records the stages run in this process.
+
+    Args:
+        trace_memory: Track the traced allocation peak of every stage
+    """
+
+    def __init__(self, trace_memory=False):
+        self.records = []
+        self._stack = []
+        self.trace_memory = False
+        if trace_memory:
+            self.enable_memory_tracing()
+
+    def enable_memory_tracing(self):
+        """Start tracemalloc; Python allocations get slower while it runs."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.trace_memory = True
+
+    def reset(self):
+        self.records = []
+
+    @contextlib.contextmanager
+    def stage(self, name, **tags):
+        """Time the enclosed block as stage `name`; tags are stored with the record."""
+        frame = {"peak": 0}
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            if self._stack:
+                # Keep the parent's peak so far before the child resets it
+                self._stack[-1]["peak"] = max(self._stack[-1]["peak"], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        self._stack.append(frame)
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            record = {
+                "stage": name,
+                "time_s": round(time.perf_counter() - wall_start, 4),
+                "cpu_s": round(time.process_time() - cpu_start, 4),
+                **tags,
+            }
+            self._stack.pop()
+            if tracing:
+                peak = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+                record["peak_traced_bytes"] = peak
+                if self._stack:
+                    self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+            self.records.append(record)
+
+    def summary(self):
+        """Per stage name: count, total and maximum time, total CPU time and largest memory peak."""
+        totals = OrderedDict()
+        for record in self.records:
+            entry = totals.setdefault(record["stage"], {"count": 0, "time_s": 0.0, "max_time_s": 0.0,
+                                                        "cpu_s": 0.0, "peak_traced_bytes": None})
+            entry["count"] += 1
+            entry["time_s"] += record["time_s"]
+            entry["max_time_s"] = max(entry["max_time_s"], record["time_s"])
+            entry["cpu_s"] += record["cpu_s"]
+            if "peak_traced_bytes" in record:
+                entry["peak_traced_bytes"] = max(entry["peak_traced_bytes"] or 0, record["peak_traced_bytes"])
+        for entry in totals.values():
+            entry["time_s"] = round(entry["time_s"], 4)
+            entry["cpu_s"] = round(entry["cpu_s"], 4)
+        return totals
+
+    def write(self, path, **run):
+        """Append one JSON line with the run's fields, its stage summary and all records."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        line = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), **run,
+                "summary": self.summary(), "records": self.records}
+        with open(path, "a") as f:
+            f.write(json.dumps(line, default=str) + "\n")
+        return path
+
+def print_stage_report(recorder):
+    """Time, CPU time and memory peak per stage of a recorder."""
+    summary = recorder.summary()
+    if not summary:
+        return
+    print("\n=== Stage Timings ===")
+    print(f"  {'stage':<20}{'count':>6}{'total':>10}{'max':>10}{'cpu':>10}{'traced peak':>14}")
+    for name, entry in summary.items():
+        peak = entry["peak_traced_bytes"]
+        print(f"  {name:<20}{entry['count']:>6}{entry['time_s']:>9.3f}s{entry['max_time_s']:>9.3f}s"
+              f"{entry['cpu_s']:>9.3f}s{(f'{peak / 2**20:.1f} MB' if peak is not None else '-'):>14}")
+
+# Process-wide recorder used by the optimizer
+stages = StageRecorder()
+
+def stage(name, **tags):
+    """Record a stage on the process-wide recorder (see StageRecorder.stage)."""
+    return stages.stage(name, **tags)
+
+def timed(name):
+    """Decorator recording every call of a function as stage `name`."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stages.stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+# --- Profiling ---
+@contextlib.contextmanager
+def profile(path, top=20):
+    """cProfile the enclosed block, dump the stats to path and print the top functions.
+
+    Open the dump with `python -m pstats <path>` or snakeviz.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(top)
+        print(f"\n=== Profile (top {top} by cumulative time) ===")
+        print(out.getvalue().strip())
+        print(f"✓ Profile written to {path}")
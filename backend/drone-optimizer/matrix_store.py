@@ -0,0 +1,281 @@
+"""Compact, tiled storage for the N×N distance and predecessor matrices.
+
+distance_matrix.npy and predecessors.npy are usually float64 and int32/int64,
+although every value fits a much narrower type: distances are whole feet
+(the solver truncates them to int32 anyway) and predecessors are node indices
+or -9999. build_store() rewrites them with the narrowest safe dtype:
+
+    distances     uint16 when the longest path is under 65535 ft, else uint32
+                  (build_store() fails if a distance does not fit)
+    predecessors  int16 below 32768 nodes, else int32
+
+Each matrix is stored as row-block tiles in matrix_store/<name>/, tile_NNNNN.npy
+plus meta.json. Tiles are opened memory-mapped on first use; a row is a view
+into its tile, and submatrix reads touch only the tiles of the selected rows.
+
+    python matrix_store.py --data-dir D:\\sites\\site2
+
+terminal.load_array() uses the store when it exists and is not older than the
+.npy it was built from; the .npy files can be deleted once the store is built.
+The solver only needs whole feet; exported segment distances are read from
+distance_matrix.npy while it exists.
+"""
+from pathlib import Path
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+STORE_DIR = "matrix_store"
+STORE_VERSION = 1
+STORED_MATRICES = ("distance_matrix", "predecessors")
+# Target size of one tile
+TILE_BYTES = 32 * 1024 * 1024
+NO_PREDECESSOR = -9999
+
+# --- Dtypes ---
+def distance_dtype(max_distance):
+    """Narrowest unsigned dtype that holds distances up to max_distance.
+
+    The dtype's largest value is reserved for unreachable pairs.
+    """
+    for dtype in (np.uint16, np.uint32):
+        if max_distance < np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    raise ValueError(f"Distance {max_distance} does not fit in uint32")
+
+def predecessor_dtype(num_nodes):
+    """Narrowest signed dtype for node indices below num_nodes and NO_PREDECESSOR."""
+    for dtype in (np.int16, np.int32):
+        if num_nodes - 1 <= np.iinfo(dtype).max and NO_PREDECESSOR >= np.iinfo(dtype).min:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+def _row_blocks(num_rows, row_bytes, target=None):
+    rows = max(1, (target or TILE_BYTES) // max(row_bytes, 1))
+    return rows, [(s, min(s + rows, num_rows)) for s in range(0, num_rows, rows)]
+
+def _max_finite(matrix, block_rows):
+    """Largest finite value of a (memory-mapped) matrix, read one row block at a time."""
+    largest = 0
+    for start in range(0, matrix.shape[0], block_rows):
+        block = np.asarray(matrix[start:start + block_rows])
+        finite = block[np.isfinite(block)] if block.dtype.kind == "f" else block
+        if finite.size:
+            largest = max(largest, int(finite.max()))
+    return largest
+
+# --- Tiled matrices ---
+class TiledMatrix:
+    """Read-only N×M matrix stored as memory-mapped row-block tiles.
+
+    Supports the indexing the optimizer uses on the full matrices:
+    m[i] (a view of row i), m[rows, cols] with equal-length index arrays
+    (element-wise), and m[np.ix_(rows, cols)] (submatrix).
+
+    Args:
+        path: Directory with meta.json and the tile files
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.meta = json.loads((self.path / "meta.json").read_text())
+        self.shape = tuple(self.meta["shape"])
+        self.dtype = np.dtype(self.meta["dtype"])
+        self.tile_rows = self.meta["tile_rows"]
+        self.unreachable = self.meta.get("unreachable")
+        self._tiles = {}
+
+    ndim = 2
+
+    @property
+    def nbytes(self):
+        return self.shape[0] * self.shape[1] * self.dtype.itemsize
+
+    def __len__(self):
+        return self.shape[0]
+
+    def _tile(self, t):
+        if t not in self._tiles:
+            self._tiles[t] = np.load(self.path / f"tile_{t:05d}.npy", mmap_mode="r")
+        return self._tiles[t]
+
+    def row(self, i):
+        """Row i as a view of its tile."""
+        i = int(i)
+        if i < 0:
+            i += self.shape[0]
+        return self._tile(i // self.tile_rows)[i % self.tile_rows]
+
+    def rows(self, rows, cols=slice(None)):
+        """Submatrix of the given rows and columns, reading each tile once."""
+        rows = np.asarray(rows, dtype=np.int64).ravel()
+        out = np.empty((len(rows),) + np.arange(self.shape[1])[cols].shape, dtype=self.dtype)
+        tiles = rows // self.tile_rows
+        for t in np.unique(tiles):
+            selected = np.flatnonzero(tiles == t)
+            out[selected] = self._tile(int(t))[rows[selected] - t * self.tile_rows][:, cols]
+        return out
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            if np.ndim(key) == 0 and not isinstance(key, slice):
+                return self.row(key)
+            return self.rows(np.arange(self.shape[0])[key])
+        rows, cols = key
+        if np.ndim(rows) == 0 and not isinstance(rows, slice):
+            return self.row(rows)[cols]
+        if isinstance(rows, slice):
+            return self.rows(np.arange(self.shape[0])[rows], cols)
+        rows = np.asarray(rows)
+        # np.ix_ gives a column vector of rows and a row vector of columns
+        if rows.ndim == 2 and rows.shape[1] == 1 and np.ndim(cols) == 2 and np.shape(cols)[0] == 1:
+            return self.rows(rows[:, 0], np.asarray(cols)[0])
+
+        rows, cols = np.broadcast_arrays(rows.astype(np.int64), np.asarray(cols, dtype=np.int64))
+        flat_rows, flat_cols = rows.ravel(), cols.ravel()
+        out = np.empty(flat_rows.shape, dtype=self.dtype)
+        tiles = flat_rows // self.tile_rows
+        for t in np.unique(tiles):
+            selected = np.flatnonzero(tiles == t)
+            out[selected] = self._tile(int(t))[flat_rows[selected] - t * self.tile_rows, flat_cols[selected]]
+        return out.reshape(rows.shape)
+
+    def __repr__(self):
+        return f"TiledMatrix({str(self.path)!r}, shape={self.shape}, dtype={self.dtype})"
+
+def store_path(data_dir, name):
+    return Path(data_dir) / STORE_DIR / name
+
+def open_stored(data_dir, name):
+    """The stored matrix `name` of a site, or None if there is no up-to-date store.
+
+    A store is out of date when the .npy it was built from has changed since.
+    """
+    path = store_path(data_dir, name)
+    try:
+        matrix = TiledMatrix(path)
+    except FileNotFoundError:
+        return None
+    source = Path(data_dir) / f"{name}.npy"
+    if source.exists():
+        stat = source.stat()
+        if [stat.st_size, stat.st_mtime_ns] != matrix.meta.get("source"):
+            print(f"⚠ {path} is older than {source.name}; rebuild it with matrix_store.py")
+            return None
+    return matrix
+
+# --- Building the store ---
+def write_tiles(source, path, dtype, unreachable=None, extra_meta=None):
+    """Copy a (memory-mapped) matrix into row-block tiles of the given dtype.
+
+    Float values are truncated towards zero like astype(np.int32);
+    non-finite values become `unreachable`. The tiles are written to a
+    temporary directory that replaces `path` when complete.
+
+    Returns:
+        meta.json contents
+
+    Raises:
+        ValueError: A value does not fit `dtype` or would read back as `unreachable`
+    """
+    path = Path(path)
+    partial = path.with_name(path.name + ".partial")
+    shutil.rmtree(partial, ignore_errors=True)
+    partial.mkdir(parents=True)
+    tile_rows, blocks = _row_blocks(source.shape[0], source.shape[1] * dtype.itemsize)
+    limit = np.iinfo(dtype).max if dtype.kind in "iu" else None
+    if unreachable is not None:
+        limit = unreachable - 1
+    for t, (start, stop) in enumerate(blocks):
+        block = np.asarray(source[start:stop])
+        # astype() would wrap large values around silently
+        largest = _max_finite(block, len(block))
+        if limit is not None and largest > limit:
+            shutil.rmtree(partial, ignore_errors=True)
+            raise ValueError(f"Value {largest} in rows {start}-{stop - 1} does not fit {dtype.name} "
+                             f"(largest storable value {limit})")
+        if block.dtype.kind == "f":
+            block = np.where(np.isfinite(block), block, unreachable if unreachable is not None else 0)
+        np.save(partial / f"tile_{t:05d}.npy", block.astype(dtype))
+
+    meta = {
+        "version": STORE_VERSION,
+        "shape": list(source.shape),
+        "dtype": dtype.name,
+        "source_dtype": source.dtype.name,
+        "tile_rows": tile_rows,
+        "num_tiles": len(blocks),
+        "unreachable": unreachable,
+        **(extra_meta or {}),
+    }
+    (partial / "meta.json").write_text(json.dumps(meta, indent=2))
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(partial, path)
+    return meta
+
+def build_store(data_dir):
+    """Rewrite a site's distance and predecessor matrices as compact tiles.
+
+    Returns:
+        Dict per matrix with the source and stored dtype and size in bytes
+    """
+    data_dir = Path(data_dir)
+    report = {}
+    for name in STORED_MATRICES:
+        source_file = data_dir / f"{name}.npy"
+        source = np.load(source_file, mmap_mode="r")
+        block_rows = _row_blocks(source.shape[0], source.shape[1] * source.dtype.itemsize)[0]
+        start = time.perf_counter()
+        if name == "distance_matrix":
+            dtype = distance_dtype(_max_finite(source, block_rows))
+        else:
+            dtype = predecessor_dtype(source.shape[0])
+        if dtype.itemsize > source.dtype.itemsize:
+            dtype = source.dtype
+        # The largest value of the final dtype marks unreachable pairs;
+        # write_tiles fails if a real distance reaches it
+        unreachable = int(np.iinfo(dtype).max) if name == "distance_matrix" and dtype.kind in "iu" else None
+
+        # Record the source so open_stored can tell when the store is stale
+        stat = source_file.stat()
+        meta = write_tiles(source, store_path(data_dir, name), dtype, unreachable,
+                           extra_meta={"source": [stat.st_size, stat.st_mtime_ns]})
+        report[name] = {
+            "source_dtype": source.dtype.name,
+            "dtype": dtype.name,
+            "source_bytes": source.nbytes,
+            "bytes": source.shape[0] * source.shape[1] * dtype.itemsize,
+            "num_tiles": meta["num_tiles"],
+            "time_s": round(time.perf_counter() - start, 3),
+        }
+    return report
+
+def print_store_report(report):
+    """Memory of every matrix before and after compaction."""
+    print("\n=== Matrix Store ===")
+    total_before = total_after = 0
+    for name, entry in report.items():
+        before, after = entry["source_bytes"], entry["bytes"]
+        total_before += before
+        total_after += after
+        print(f"  {name:<16} {entry['source_dtype']:>8} {before / 2**20:>9.1f} MB -> "
+              f"{entry['dtype']:>7} {after / 2**20:>9.1f} MB  ({entry['num_tiles']} tiles, {entry['time_s']:.2f} s)")
+    if total_before:
+        print(f"  Saved {(total_before - total_after) / 2**20:.1f} MB "
+              f"({100 * (1 - total_after / total_before):.0f}%) per full copy of both matrices")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Store a site's N×N matrices with compact dtypes in tiles.")
+    parser.add_argument("--data-dir", default=".", help="site directory with distance_matrix.npy and predecessors.npy")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    print_store_report(build_store(args.data_dir))
+
+if __name__ == "__main__":
+    main()
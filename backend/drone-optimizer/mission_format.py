@@ -0,0 +1,283 @@
+"""Columnar binary export of mission data, and JSON derived from it.
+
+Each artifact is an .npz of flat arrays:
+
+- mission_paths.npz: int32 waypoint indices, float64 lon/lat, uint8 type codes
+  and float64 segment distances of all missions back to back, with int64
+  per-mission offsets (mission i is waypoint_index[offsets[i]:offsets[i + 1]])
+  The float32 lod_tolerance_ft column holds the Douglas-Peucker significance
+  of every waypoint (see simplification_tolerances)
+- photo_points.npz / asset_points.npz: int32 indices and float64 lon/lat
+
+Coordinates and distances keep the float64 values of the source arrays, so
+the JSON derived from the npz is identical to the JSON files.
+
+The dicts returned by *_to_json() have the same structure as the indent=2 JSON
+files written by terminal.py, so the server can answer from the npz files
+without re-parsing megabytes of JSON.
+"""
+from pathlib import Path
+import json
+import os
+
+import numpy as np
+
+# uint8 type code -> waypoint_type string
+WAYPOINT_TYPES = ("depot", "photo", "asset", "intermediate")
+FEET_PER_KM = 3280.84
+FEET_PER_MILE = 5280.0
+
+# Simplification levels served to the map; 0 keeps every waypoint
+LOD_TOLERANCES_FT = (0.0, 3.0, 10.0, 30.0, 100.0, 300.0)
+# Rough degrees to feet, as in the exporter's Euclidean fallback
+FEET_PER_DEGREE = 364000
+
+POINT_KINDS = {
+    "photo": {"type": "photo_waypoints", "index_field": "waypoint_index"},
+    "asset": {"type": "electrical_assets", "index_field": "asset_index"},
+}
+
+# --- Level of detail ---
+def simplification_tolerances(longitude, latitude, offsets, min_tolerance_ft=LOD_TOLERANCES_FT[1]):
+    """Douglas-Peucker significance of every waypoint, per mission.
+
+    A waypoint is kept by a Douglas-Peucker simplification with tolerance t
+    exactly when its significance is greater than t, so one array serves every
+    level: simplified = waypoints[significance > t]. Significances are capped
+    by the parent split so that levels are nested. Mission endpoints get inf.
+    Ranges whose deviation is below min_tolerance_ft are not split further;
+    their waypoints are only part of the full-resolution level.
+
+    Args:
+        longitude / latitude: Flat waypoint coordinates of all missions
+        offsets: Mission i spans [offsets[i], offsets[i + 1])
+        min_tolerance_ft: Smallest non-zero tolerance that has to be exact
+
+    Returns:
+        float32 array aligned with the waypoints, in feet
+    """
+    # Local planar coordinates in feet
+    lat0 = np.radians(np.mean(latitude)) if len(latitude) else 0.0
+    x = np.asarray(longitude, dtype=np.float64) * FEET_PER_DEGREE * np.cos(lat0)
+    y = np.asarray(latitude, dtype=np.float64) * FEET_PER_DEGREE
+    significance = np.zeros(len(x), dtype=np.float64)
+
+    for start, end in zip(np.asarray(offsets[:-1]).tolist(), np.asarray(offsets[1:]).tolist()):
+        if end <= start:
+            continue
+        significance[start] = significance[end - 1] = np.inf
+        stack = [(start, end - 1, np.inf)]
+        while stack:
+            a, b, cap = stack.pop()
+            if b - a < 2:
+                continue
+            # Distance of the interior points to the segment a-b
+            dx, dy = x[b] - x[a], y[b] - y[a]
+            px, py = x[a + 1:b] - x[a], y[a + 1:b] - y[a]
+            length_sq = dx * dx + dy * dy
+            if length_sq > 0:
+                t = np.clip((px * dx + py * dy) / length_sq, 0.0, 1.0)
+                dist = np.hypot(px - t * dx, py - t * dy)
+            else:
+                dist = np.hypot(px, py)
+            k = int(np.argmax(dist))
+            deviation = min(float(dist[k]), cap)
+            if deviation <= min_tolerance_ft:
+                significance[a + 1:b] = dist.clip(max=deviation)
+                continue
+            significance[a + 1 + k] = deviation
+            stack.append((a, a + 1 + k, deviation))
+            stack.append((a + 1 + k, b, deviation))
+
+    return significance.astype(np.float32)
+
+def lod_indices(bundle, mission, tolerance_ft):
+    """Positions within a mission kept at the given simplification tolerance."""
+    start, end = bundle["offsets"][mission], bundle["offsets"][mission + 1]
+    if tolerance_ft <= 0 or "lod_tolerance_ft" not in bundle:
+        return np.arange(end - start)
+    return np.flatnonzero(bundle["lod_tolerance_ft"][start:end] > tolerance_ft)
+
+def zoom_tolerance_ft(zoom, latitude):
+    """Largest precomputed tolerance that stays below one screen pixel at a web-map zoom."""
+    feet_per_pixel = 156543.03392 * np.cos(np.radians(latitude)) / 2 ** zoom * 3.28084
+    return max(t for t in LOD_TOLERANCES_FT if t <= feet_per_pixel)
+
+# --- Writing ---
+def _write_npz(path, **arrays):
+    """Write an uncompressed npz atomically and return its size in bytes."""
+    path = Path(path)
+    temp_file = path.with_name(path.name + ".tmp")
+    try:
+        with open(temp_file, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(temp_file, path)
+    finally:
+        if temp_file.exists():
+            temp_file.unlink()
+    return path.stat().st_size
+
+def save_missions(path, bundle):
+    """Write all missions to one columnar npz.
+
+    Args:
+        path: Output .npz path
+        bundle: Dict of flat per-waypoint arrays waypoint_index, longitude,
+            latitude, type_code, segment_distance_ft and lod_tolerance_ft, plus offsets (mission i
+            spans [offsets[i], offsets[i + 1])), total_distance_ft per mission
+            and JSON-serializable meta (max_distance_per_mission_ft, depot_coordinates)
+
+    Returns:
+        Size of the written file in bytes
+    """
+    return _write_npz(
+        path,
+        waypoint_index=np.asarray(bundle["waypoint_index"], dtype=np.int32),
+        longitude=np.asarray(bundle["longitude"], dtype=np.float64),
+        latitude=np.asarray(bundle["latitude"], dtype=np.float64),
+        type_code=np.asarray(bundle["type_code"], dtype=np.uint8),
+        segment_distance_ft=np.asarray(bundle["segment_distance_ft"], dtype=np.float64),
+        offsets=np.asarray(bundle["offsets"], dtype=np.int64),
+        lod_tolerance_ft=np.asarray(bundle["lod_tolerance_ft"], dtype=np.float32),
+        total_distance_ft=np.asarray(bundle["total_distance_ft"], dtype=np.float64),
+        meta=np.array(json.dumps(bundle["meta"])),
+    )
+
+def save_points(path, kind, indexes, coords):
+    """Write photo or asset points to a columnar npz.
+
+    Args:
+        kind: "photo" or "asset"
+        indexes: Global point indices
+        coords: (n, 2) [longitude, latitude] array
+
+    Returns:
+        Size of the written file in bytes
+    """
+    coords = np.asarray(coords)
+    return _write_npz(
+        path,
+        index=np.asarray(indexes, dtype=np.int32),
+        longitude=coords[:, 0].astype(np.float64),
+        latitude=coords[:, 1].astype(np.float64),
+        meta=np.array(json.dumps({"kind": kind})),
+    )
+
+# --- Reading ---
+def load_missions(path):
+    """Load mission_paths.npz into a dict of arrays (meta decoded)."""
+    with np.load(path, allow_pickle=False) as npz:
+        bundle = {name: npz[name] for name in npz.files}
+    bundle["meta"] = json.loads(str(bundle["meta"]))
+    return bundle
+
+def mission_columns(bundle, mission):
+    """Per-waypoint arrays of one mission, with derived cumulative distance."""
+    start, end = bundle["offsets"][mission], bundle["offsets"][mission + 1]
+    segment = bundle["segment_distance_ft"][start:end].astype(np.float64)
+    return {
+        "waypoint_index": bundle["waypoint_index"][start:end],
+        "longitude": bundle["longitude"][start:end],
+        "latitude": bundle["latitude"][start:end],
+        "type_code": bundle["type_code"][start:end],
+        "segment_distance_ft": segment,
+        "cumulative_distance_ft": np.cumsum(segment),
+    }
+
+def mission_summary(bundle, mission):
+    """Scalar statistics of one mission (everything but the waypoint list)."""
+    start, end = bundle["offsets"][mission], bundle["offsets"][mission + 1]
+    total_dist = float(bundle["total_distance_ft"][mission])
+    return {
+        "mission_id": mission + 1,
+        "total_distance_ft": total_dist,
+        "total_distance_km": total_dist / FEET_PER_KM,
+        "total_distance_miles": total_dist / FEET_PER_MILE,
+        "num_waypoints": int(end - start),
+        "num_photo_points": int(np.count_nonzero(
+            bundle["type_code"][start:end] == WAYPOINT_TYPES.index("photo"))),
+        "depot_index": 0,
+    }
+
+WAYPOINT_FIELDS = ("sequence", "waypoint_index", "longitude", "latitude", "waypoint_type",
+                   "segment_distance_ft", "cumulative_distance_ft")
+
+def decimate_indices(num_waypoints, step=1, max_points=None):
+    """Indices of the waypoints kept by decimation; first and last are always kept.
+
+    Args:
+        step: Keep every step-th waypoint
+        max_points: Upper bound on the number of kept waypoints (raises step as needed)
+    """
+    if max_points is not None and max_points >= 2 and num_waypoints > max_points:
+        step = max(step, -(-(num_waypoints - 1) // (max_points - 1)))
+    indices = np.arange(0, num_waypoints, max(step, 1))
+    if num_waypoints and indices[-1] != num_waypoints - 1:
+        indices = np.append(indices, num_waypoints - 1)
+    return indices
+
+def mission_waypoints(bundle, mission, indices=None, fields=WAYPOINT_FIELDS):
+    """Waypoint dicts of one mission, as in mission_paths.json.
+
+    Args:
+        indices: Optional positions within the mission to return (see decimate_indices)
+        fields: Waypoint fields to include (projection), in WAYPOINT_FIELDS order
+    """
+    columns = mission_columns(bundle, mission)
+    columns["sequence"] = np.arange(len(columns["waypoint_index"]))
+    columns["waypoint_type"] = np.array(WAYPOINT_TYPES)[columns["type_code"]]
+    if indices is not None:
+        columns = {name: values[indices] for name, values in columns.items()}
+    fields = [name for name in WAYPOINT_FIELDS if name in fields]
+    values = [columns[name].tolist() for name in fields]
+    return [dict(zip(fields, row)) for row in zip(*values)]
+
+def missions_summary(bundle):
+    """Plan-wide statistics, as the "summary" block of mission_paths.json."""
+    missions = [mission_summary(bundle, i) for i in range(len(bundle["total_distance_ft"]))]
+    return {
+        "total_missions": len(missions),
+        "total_distance_ft": sum(m["total_distance_ft"] for m in missions),
+        "total_distance_km": sum(m["total_distance_km"] for m in missions),
+        "total_distance_miles": sum(m["total_distance_miles"] for m in missions),
+        "total_waypoints": sum(m["num_waypoints"] for m in missions),
+        "total_photo_points_visited": sum(m["num_photo_points"] for m in missions),
+        **bundle["meta"],
+    }
+
+def missions_to_json(bundle):
+    """Full mission_paths.json structure derived from a mission bundle."""
+    return {
+        "type": "drone_mission_paths",
+        "summary": missions_summary(bundle),
+        "missions": [
+            {**mission_summary(bundle, i), "waypoints": mission_waypoints(bundle, i)}
+            for i in range(len(bundle["total_distance_ft"]))
+        ],
+    }
+
+def points_json(kind, indexes, longitude, latitude):
+    """photo_points.json / asset_points.json structure.
+
+    Args:
+        kind: "photo" or "asset"
+        indexes: Global point indices
+        longitude / latitude: Point coordinates
+    """
+    index_field = POINT_KINDS[kind]["index_field"]
+    points = [
+        {index_field: idx, "longitude": lon, "latitude": lat, "type": kind}
+        for idx, lon, lat in zip(np.asarray(indexes).tolist(), np.asarray(longitude).tolist(),
+                                 np.asarray(latitude).tolist())
+    ]
+    return {
+        "type": POINT_KINDS[kind]["type"],
+        "count": len(points),
+        "points": points,
+    }
+
+def points_to_json(path):
+    """photo_points.json / asset_points.json structure derived from a points npz."""
+    with np.load(path, allow_pickle=False) as npz:
+        kind = json.loads(str(npz["meta"]))["kind"]
+        return points_json(kind, npz["index"], npz["longitude"], npz["latitude"])
@@ -0,0 +1,282 @@
+"""Build distance_matrix.npy and predecessors.npy for a site.
+
+The navigable graph connects every navigable point (photo waypoints and
+intermediate waypoints, the points before asset_indexes[0]) to its nearest
+neighbors; an edge is kept only if the straight segment stays inside the
+site polygon. All-pairs shortest paths are then computed with Dijkstra in row
+blocks spread over a process pool, and each block is written straight into
+memory-mapped .npy files, so the full N×N matrices are never held in RAM:
+
+    python preprocess.py --data-dir D:\\sites\\site2 --neighbors 8 --workers 8
+
+The files are written under temporary names and renamed when complete, so an
+interrupted run never leaves a truncated matrix behind.
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+import argparse
+import heapq
+import math
+import os
+import time
+
+import numpy as np
+from numpy.lib.format import open_memmap
+import shapely
+
+try:
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import dijkstra
+    from scipy.spatial import cKDTree
+except ImportError:
+    csr_matrix = dijkstra = cKDTree = None
+
+from matrix_store import build_store, print_store_report
+from mission_format import FEET_PER_DEGREE
+from terminal import load_array, load_polygon
+
+DEFAULT_NEIGHBORS = 8
+# Disconnected graphs are retried with twice the neighbors up to this many
+MAX_NEIGHBORS = 64
+# Predecessor of unreachable nodes and of the source itself, as scipy writes it
+NO_PREDECESSOR = -9999
+# Upper bound on the rows of both matrices a worker holds at once
+BLOCK_BYTES = 128 * 1024 * 1024
+# Row blocks per worker, so faster workers pick up more of the remaining rows
+BLOCKS_PER_WORKER = 4
+
+# --- Navigable graph ---
+def project_feet(lon_lat):
+    """Local planar coordinates in feet of (lon, lat) rows."""
+    lon_lat = np.asarray(lon_lat, dtype=np.float64)
+    lat0 = np.radians(np.mean(lon_lat[:, 1]))
+    return np.column_stack((lon_lat[:, 0] * FEET_PER_DEGREE * np.cos(lat0),
+                            lon_lat[:, 1] * FEET_PER_DEGREE))
+
+def nearest_neighbors(xy, k):
+    """Indices of the k nearest other points of every point, shape (n, k)."""
+    k = min(k, len(xy) - 1)
+    if cKDTree is not None:
+        return cKDTree(xy).query(xy, k=k + 1)[1][:, 1:]
+    # Brute force in blocks of rows to bound the temporary distance block
+    neighbors = np.empty((len(xy), k), dtype=np.int64)
+    block = max(1, (32 * 1024 * 1024) // (8 * len(xy)))
+    for start in range(0, len(xy), block):
+        rows = xy[start:start + block]
+        d2 = ((rows[:, None, :] - xy[None, :, :]) ** 2).sum(axis=2)
+        d2[np.arange(len(rows)), np.arange(start, start + len(rows))] = np.inf
+        nearest = np.argpartition(d2, k - 1, axis=1)[:, :k]
+        order = np.take_along_axis(d2, nearest, axis=1).argsort(axis=1)
+        neighbors[start:start + len(rows)] = np.take_along_axis(nearest, order, axis=1)
+    return neighbors
+
+def build_graph(lon_lat, polygon, k=DEFAULT_NEIGHBORS):
+    """Undirected k-nearest-neighbor graph with edges kept inside polygon.
+
+    Args:
+        lon_lat: (n, 2) navigable point coordinates
+        polygon: Site boundary in lon/lat, or None to keep every edge
+        k: Neighbors per point
+
+    Returns:
+        (edges, lengths): (m, 2) int32 node pairs with a < b, and their lengths in feet
+    """
+    xy = project_feet(lon_lat)
+    neighbors = nearest_neighbors(xy, k)
+    pairs = np.column_stack((np.repeat(np.arange(len(xy)), neighbors.shape[1]), neighbors.ravel()))
+    edges = np.unique(np.sort(pairs, axis=1), axis=0)
+
+    if polygon is not None:
+        shapely.prepare(polygon)
+        segments = shapely.linestrings(np.asarray(lon_lat, dtype=np.float64)[edges])
+        edges = edges[shapely.covered_by(segments, polygon)]
+
+    lengths = np.hypot(*(xy[edges[:, 0]] - xy[edges[:, 1]]).T)
+    return edges.astype(np.int32), lengths
+
+def count_unreachable(num_nodes, edges, source=0):
+    """Number of nodes with no path from source."""
+    neighbors = [[] for _ in range(num_nodes)]
+    for a, b in edges.tolist():
+        neighbors[a].append(b)
+        neighbors[b].append(a)
+    seen = np.zeros(num_nodes, dtype=bool)
+    seen[source] = True
+    stack = [source]
+    while stack:
+        for other in neighbors[stack.pop()]:
+            if not seen[other]:
+                seen[other] = True
+                stack.append(other)
+    return int(num_nodes - seen.sum())
+
+# --- All-pairs shortest paths ---
+_worker_state = {}
+
+def _init_worker(indptr, indices, weights, distance_file, predecessor_file):
+    """Process pool initializer: keep the CSR graph and open the output memmaps."""
+    _worker_state["graph"] = (indptr, indices, weights)
+    _worker_state["distances"] = np.load(distance_file, mmap_mode="r+")
+    _worker_state["predecessors"] = np.load(predecessor_file, mmap_mode="r+")
+
+def _dijkstra_rows(indptr, indices, weights, rows):
+    """Distances and predecessors from each source in rows, pure Python heapq fallback."""
+    num_nodes = len(indptr) - 1
+    dist = np.full((len(rows), num_nodes), np.inf)
+    pred = np.full((len(rows), num_nodes), NO_PREDECESSOR, dtype=np.int32)
+    for i, source in enumerate(rows):
+        d_row, p_row = dist[i], pred[i]
+        d_row[source] = 0.0
+        heap = [(0.0, source)]
+        while heap:
+            d, node = heapq.heappop(heap)
+            if d > d_row[node]:
+                continue
+            for j in range(indptr[node], indptr[node + 1]):
+                other, nd = indices[j], d + weights[j]
+                if nd < d_row[other]:
+                    d_row[other] = nd
+                    p_row[other] = node
+                    heapq.heappush(heap, (nd, other))
+    return dist, pred
+
+def _solve_rows(start, stop):
+    """Worker task: shortest paths from sources [start, stop), written to the memmaps."""
+    indptr, indices, weights = _worker_state["graph"]
+    rows = np.arange(start, stop)
+    if dijkstra is not None:
+        graph = csr_matrix((weights, indices, indptr), shape=(len(indptr) - 1,) * 2)
+        dist, pred = dijkstra(graph, directed=True, indices=rows, return_predecessors=True)
+    else:
+        dist, pred = _dijkstra_rows(indptr.tolist(), indices.tolist(), weights.tolist(), rows.tolist())
+    _worker_state["distances"][start:stop] = dist
+    _worker_state["predecessors"][start:stop] = pred
+    _worker_state["distances"].flush()
+    _worker_state["predecessors"].flush()
+    return stop - start
+
+def _csr(num_nodes, edges, lengths):
+    """(indptr, indices, weights) of the symmetric adjacency of an undirected edge list."""
+    src = np.concatenate((edges[:, 0], edges[:, 1]))
+    dst = np.concatenate((edges[:, 1], edges[:, 0]))
+    weights = np.concatenate((lengths, lengths)).astype(np.float64)
+    order = np.argsort(src, kind="stable")
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=num_nodes), out=indptr[1:])
+    return indptr, dst[order].astype(np.int32), weights[order]
+
+def write_shortest_paths(num_nodes, edges, lengths, out_dir, workers=None):
+    """Write distance_matrix.npy (float64) and predecessors.npy (int32) for a graph.
+
+    Rows are computed in blocks by a process pool; every worker writes its
+    block into the memory-mapped outputs, so memory use stays at a few blocks
+    regardless of the number of nodes.
+
+    Args:
+        num_nodes: Number of graph nodes
+        edges / lengths: Undirected edges and their lengths (see build_graph)
+        out_dir: Directory the two .npy files are written to
+        workers: Worker processes; defaults to the CPU count, 1 runs in-process
+
+    Returns:
+        Dict with the worker count, block size and elapsed time
+    """
+    start_time = time.perf_counter()
+    out_dir = Path(out_dir)
+    workers = max(1, workers or os.cpu_count() or 1)
+    partial = {name: out_dir / f"{name}.partial.npy" for name in ("distance_matrix", "predecessors")}
+    open_memmap(partial["distance_matrix"], mode="w+", dtype=np.float64, shape=(num_nodes, num_nodes)).flush()
+    open_memmap(partial["predecessors"], mode="w+", dtype=np.int32, shape=(num_nodes, num_nodes)).flush()
+
+    block = max(1, min(BLOCK_BYTES // (num_nodes * 12), math.ceil(num_nodes / (workers * BLOCKS_PER_WORKER))))
+    blocks = [(s, min(s + block, num_nodes)) for s in range(0, num_nodes, block)]
+    initargs = (*_csr(num_nodes, edges, lengths), str(partial["distance_matrix"]), str(partial["predecessors"]))
+    if dijkstra is None:
+        print("⚠ scipy not installed, using the pure Python Dijkstra: about 20x slower "
+              "on large sites; pip install -r requirements.txt")
+
+    done = 0
+    if workers == 1:
+        _init_worker(*initargs)
+        try:
+            for s, e in blocks:
+                done += _solve_rows(s, e)
+        finally:
+            _worker_state.clear()
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+            futures = [pool.submit(_solve_rows, s, e) for s, e in blocks]
+            for future in as_completed(futures):
+                done += future.result()
+                print(f"\r  {done}/{num_nodes} rows", end="", flush=True)
+        print()
+
+    for name, path in partial.items():
+        os.replace(path, out_dir / f"{name}.npy")
+    return {"workers": workers, "block_rows": block, "time_s": round(time.perf_counter() - start_time, 3)}
+
+# --- Site preprocessing ---
+def preprocess_site(data_dir, neighbors=DEFAULT_NEIGHBORS, workers=None, compact=False):
+    """Build the navigable graph of a site and write its all-pairs matrices.
+
+    If the depot cannot reach every navigable point, the graph is rebuilt
+    with twice the neighbors, up to MAX_NEIGHBORS. With compact=True the
+    matrices are also written as compact tiles (see matrix_store.py).
+
+    Returns:
+        Dict with the node and edge counts, the neighbors used and timings
+
+    Raises:
+        ValueError: If points stay unreachable at MAX_NEIGHBORS (usually
+            points outside the polygon)
+    """
+    data_dir = Path(data_dir)
+    points = load_array(data_dir, "points_lat_long")
+    # Assets follow the navigable points and are not part of the graph
+    num_nodes = int(load_array(data_dir, "asset_indexes")[0])
+    polygon = load_polygon(data_dir / "polygon_lon_lat.wkt")
+    print(f"\nPreprocessing {num_nodes} navigable points in '{data_dir}'...")
+
+    start = time.perf_counter()
+    k = neighbors
+    while True:
+        edges, lengths = build_graph(points[:num_nodes], polygon, k)
+        unreachable = count_unreachable(num_nodes, edges)
+        if not unreachable:
+            break
+        if k >= MAX_NEIGHBORS:
+            raise ValueError(f"{unreachable} navigable points cannot be reached from the depot "
+                             f"with {k} neighbors; check that they lie inside the polygon")
+        print(f"⚠ {unreachable} points unreachable with {k} neighbors, retrying with {2 * k}")
+        k = min(2 * k, MAX_NEIGHBORS)
+    graph_time = time.perf_counter() - start
+    print(f"✓ Graph: {len(edges)} edges ({k} neighbors) in {graph_time:.2f} s")
+
+    stats = write_shortest_paths(num_nodes, edges, lengths, data_dir, workers)
+    size_mb = num_nodes * num_nodes * 12 / 2**20
+    print(f"✓ distance_matrix.npy and predecessors.npy ({size_mb:.0f} MB) written in "
+          f"{stats['time_s']:.2f} s on {stats['workers']} worker(s)")
+    if compact:
+        print_store_report(build_store(data_dir))
+    return {"num_nodes": num_nodes, "num_edges": len(edges), "neighbors": k,
+            "graph_time_s": round(graph_time, 3), **stats}
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate distance_matrix.npy and predecessors.npy from points_lat_long.npy "
+                    "and polygon_lon_lat.wkt.")
+    parser.add_argument("--data-dir", default=".", help="site directory with the input files")
+    parser.add_argument("--neighbors", type=int, default=DEFAULT_NEIGHBORS,
+                        help="nearest neighbors connected to each point")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Dijkstra worker processes (default: CPU count)")
+    parser.add_argument("--compact", action="store_true",
+                        help="also store the matrices with compact dtypes (see matrix_store.py)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    preprocess_site(args.data_dir, args.neighbors, args.workers, args.compact)
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,32 @@
-import geopandas as gpd
-import dill as pickle
-import numpy as np
-import pandas as pd
-from shapely import wkt
 from ortools.constraint_solver import routing_enums_pb2
 from ortools.constraint_solver import pywrapcp
+from shapely import wkt
 from pathlib import Path
+import argparse
+import contextlib
+import numpy as np
 import shutil
+import functools
+import hashlib
+import json
 import math
-import matplotlib.pyplot as plt
+import os
+import time
+import multiprocessing
+from multiprocessing import shared_memory
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from geofence import Geofence, print_geofence_report
+from instrumentation import print_stage_report, profile, stage, stages, timed
+from matrix_store import open_stored
+from mission_format import (WAYPOINT_TYPES, missions_summary, missions_to_json, points_json,
+                            save_missions, save_points, simplification_tolerances)
+
+# geopandas and matplotlib are imported lazily in DroneOptimizer.plot*() so
+# that headless solves, workers and the API server never pay for them.
+
+DEFAULT_MAX_DISTANCE_PER_TRIP = 37725
 
 # --- Load polygon helper ---
 def load_polygon(polygon_path="polygon_lon_lat.wkt"):
@@ -25,40 +43,41 @@ def load_polygon(polygon_path="polygon_lon_lat.wkt"):
         return None
 
 # --- Load data ---
-print("=== Loading Data ===")
-distance_matrix = np.load('distance_matrix.npy')
-asset_indexes = np.load('asset_indexes.npy')
-photo_indexes = np.load('photo_indexes.npy')
-points_lat_long = np.load('points_lat_long.npy')
-predecessors = np.load('predecessors.npy')
-waypoint_indexes = np.load('waypoint_indexes.npy')
-max_distance_per_trip = 37725
-
-print(f"distance_matrix: {distance_matrix.shape}")
-print(f"asset_indexes: {asset_indexes}")
-print(f"photo_indexes: {photo_indexes}")
-print(f"points_lat_long: {points_lat_long.shape}")
-print(f"predecessors: {predecessors.shape}")
-print(f"waypoint_indexes: {waypoint_indexes}")
-
-# Load polygon once at startup
-POLYGON = load_polygon()
-
-# --- Understand the data structure ---
-num_navigable = distance_matrix.shape[0]
-num_total_points = points_lat_long.shape[0]
-num_assets = asset_indexes[1] - asset_indexes[0] + 1
-num_photos = photo_indexes[1] - photo_indexes[0] + 1
-
-print(f"\n=== Data Structure ===")
-print(f"Total points in coordinate list: {num_total_points}")
-print(f"Navigable waypoints (in distance matrix): {num_navigable}")
-print(f"Photo waypoints: {num_photos} (indices {photo_indexes[0]} to {photo_indexes[1]})")
-print(f"Asset points: {num_assets} (indices {asset_indexes[0]} to {asset_indexes[1]})")
-print(f"Note: Assets are NOT in distance matrix - they're reference points only")
-
-def build_routing_model(data, num_vehicles):
-    """Builds and returns an OR-Tools RoutingModel for a given number of vehicles."""
+# The dense N×N arrays are opened memory-mapped: opening only reads the .npy
+# header, and later indexing pages in just the rows and columns that are used.
+# A compact tiled copy (see matrix_store.py) is preferred when one is up to date.
+MMAP_ARRAYS = {"distance_matrix", "predecessors"}
+
+def load_array(data_dir, name):
+    """Load '<data_dir>/<name>.npy'; large matrices are returned as read-only memmaps or tiles."""
+    with stage("load", array=name):
+        if name in MMAP_ARRAYS:
+            stored = open_stored(data_dir, name)
+            if stored is not None:
+                return stored
+        return np.load(Path(data_dir) / f"{name}.npy", mmap_mode="r" if name in MMAP_ARRAYS else None)
+
+def transit_matrix(data):
+    """The distance matrix as nested int lists for RegisterTransitMatrix.
+
+    The conversion costs seconds and a Python int per entry on large sites,
+    so it runs once per data and is reused by every later model build; it is
+    redone only when data["distance_matrix"] is replaced.
+    """
+    matrix = data["distance_matrix"]
+    cached = data.get("transit_matrix")
+    if cached is None or cached[0] is not matrix:
+        cached = data["transit_matrix"] = (matrix, np.asarray(matrix, dtype=np.int64).tolist())
+    return cached[1]
+
+def build_routing_model(data, num_vehicles, transit="matrix"):
+    """Builds and returns an OR-Tools RoutingModel for a given number of vehicles.
+
+    Args:
+        transit: "matrix" registers the distance matrix so arc costs are
+            evaluated in native code; "callback" uses a Python callback
+            (kept for benchmarking)
+    """
     manager = pywrapcp.RoutingIndexManager(
         len(data["distance_matrix"]),
         num_vehicles,
@@ -66,12 +85,19 @@ def build_routing_model(data, num_vehicles):
     )
     routing = pywrapcp.RoutingModel(manager)
 
-    def distance_callback(from_index, to_index):
-        from_node = manager.IndexToNode(from_index)
-        to_node = manager.IndexToNode(to_index)
-        return int(data["distance_matrix"][from_node][to_node])
+    if transit == "matrix":
+        # OR-Tools maps variable indices to nodes itself, so arc evaluations
+        # stay in native code instead of calling back into Python
+        transit_callback_index = routing.RegisterTransitMatrix(transit_matrix(data))
+    elif transit == "callback":
+        def distance_callback(from_index, to_index):
+            from_node = manager.IndexToNode(from_index)
+            to_node = manager.IndexToNode(to_index)
+            return int(data["distance_matrix"][from_node][to_node])
 
-    transit_callback_index = routing.RegisterTransitCallback(distance_callback)
+        transit_callback_index = routing.RegisterTransitCallback(distance_callback)
+    else:
+        raise ValueError(f"Unknown transit evaluator: {transit}")
     routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
 
     dimension_name = "Distance"
@@ -90,22 +116,1023 @@ def build_routing_model(data, num_vehicles):
 def estimate_min_vehicles(distance_matrix, max_distance, depot=0):
     """Quick lower-bound estimate of minimum vehicles required."""
     N = distance_matrix.shape[0]
-    dm = distance_matrix.copy().astype(np.float64)
-    big = dm.max() * 10 + 1.0
-    np.fill_diagonal(dm, big)
-    min_out = np.min(dm, axis=1)
+    big = float(distance_matrix.max()) * 10 + 1.0
+    # Cheapest outgoing arc of every node, in row blocks so the matrix is never copied whole
+    min_out = np.empty(N, dtype=np.float64)
+    for start in range(0, N, 1024):
+        block = np.asarray(distance_matrix[start:start + 1024], dtype=np.float64)
+        block[np.arange(len(block)), np.arange(start, start + len(block))] = big
+        min_out[start:start + 1024] = block.min(axis=1)
     total_min_travel = np.sum(min_out)
     approx_total_needed = total_min_travel * 1.5
     est = max(1, math.ceil(approx_total_needed / float(max_distance)))
     return est
 
+DEFAULT_FIRST_SOLUTION_STRATEGY = "PARALLEL_CHEAPEST_INSERTION"
+DEFAULT_METAHEURISTIC = "GUIDED_LOCAL_SEARCH"
+
+# First-solution strategies raced against each other in parallel "strategies" mode
+PARALLEL_STRATEGIES = [
+    "PARALLEL_CHEAPEST_INSERTION",
+    "PATH_CHEAPEST_ARC",
+    "SAVINGS",
+    "LOCAL_CHEAPEST_INSERTION",
+]
+
+def make_search_parameters(time_limit_s, first_solution_strategy=DEFAULT_FIRST_SOLUTION_STRATEGY,
+                           metaheuristic=DEFAULT_METAHEURISTIC):
+    """Default search parameters used for every solve attempt.
+
+    Args:
+        time_limit_s: Time limit in seconds (fractions allowed)
+        first_solution_strategy: Name of an OR-Tools FirstSolutionStrategy
+        metaheuristic: Name of an OR-Tools LocalSearchMetaheuristic
+    """
+    search_parameters = pywrapcp.DefaultRoutingSearchParameters()
+    search_parameters.first_solution_strategy = getattr(
+        routing_enums_pb2.FirstSolutionStrategy, first_solution_strategy)
+    search_parameters.local_search_metaheuristic = getattr(
+        routing_enums_pb2.LocalSearchMetaheuristic, metaheuristic)
+    search_parameters.time_limit.FromMilliseconds(int(time_limit_s * 1000))
+    search_parameters.log_search = False
+    return search_parameters
+
+def extract_routes(manager, routing, solution, num_vehicles):
+    """Read (route, distance) tuples for every vehicle out of a solution."""
+    all_routes = []
+    for vehicle_id in range(num_vehicles):
+        index = routing.Start(vehicle_id)
+        route = []
+        route_distance = 0
+
+        while not routing.IsEnd(index):
+            node = manager.IndexToNode(index)
+            route.append(node)
+            previous_index = index
+            index = solution.Value(routing.NextVar(index))
+            route_distance += routing.GetArcCostForVehicle(previous_index, index, vehicle_id)
+
+        route.append(manager.IndexToNode(index))
+        all_routes.append((route, route_distance))
+    return all_routes
+
+def insert_nodes_cheapest(routes, nodes, distance_matrix, max_distance, depot=0):
+    """Insert nodes into routes at their cheapest feasible position.
+
+    Args:
+        routes: List of inner node lists (depot excluded), modified in place
+        nodes: Nodes to insert
+        distance_matrix: Local distance matrix
+        max_distance: Per-route distance limit
+
+    Returns:
+        True if every node was placed without breaking max_distance
+    """
+    lengths = []
+    for inner in routes:
+        path = [depot] + inner + [depot]
+        lengths.append(int(sum(distance_matrix[a][b] for a, b in zip(path[:-1], path[1:]))))
+
+    for node in nodes:
+        best = None
+        for r, inner in enumerate(routes):
+            path = np.array([depot] + inner + [depot])
+            delta = (distance_matrix[path[:-1], node] + distance_matrix[node, path[1:]]
+                     - distance_matrix[path[:-1], path[1:]])
+            pos = int(np.argmin(delta))
+            if lengths[r] + delta[pos] <= max_distance and (best is None or delta[pos] < best[0]):
+                best = (int(delta[pos]), r, pos)
+        if best is None:
+            return False
+        delta, r, pos = best
+        routes[r].insert(pos, int(node))
+        lengths[r] += delta
+    return True
+
+def routes_to_hint(all_routes, num_vehicles, distance_matrix, max_distance):
+    """Convert a feasible solution into an initial-route hint for num_vehicles.
+
+    Extra vehicles get empty routes. When there are more non-empty routes than
+    vehicles, the shortest routes are dissolved and their nodes re-inserted
+    into the remaining ones.
+
+    Returns:
+        List of num_vehicles inner node lists, or None if no feasible hint exists
+    """
+    ordered = sorted(all_routes, key=lambda item: item[1], reverse=True)
+    inner_routes = [list(route[1:-1]) for route, _ in ordered if len(route) > 2]
+
+    if len(inner_routes) > num_vehicles:
+        dropped = [node for inner in inner_routes[num_vehicles:] for node in inner]
+        inner_routes = inner_routes[:num_vehicles]
+        if not insert_nodes_cheapest(inner_routes, dropped, distance_matrix, max_distance):
+            return None
+
+    return inner_routes + [[] for _ in range(num_vehicles - len(inner_routes))]
+
+# --- Early termination ---
+# Optional per-attempt stopping rules (the early_stop dict of solve_with_vehicles):
+#   plateau_window_s: end the attempt once the objective has not improved by
+#       plateau_min_improvement (a fraction) for this many seconds
+#   first_solution_timeout_s: give up on an attempt, as infeasible, when no
+#       first solution was found within this many seconds
+DEFAULT_PLATEAU_MIN_IMPROVEMENT = 0.001
+EARLY_STOP_REASONS = ("plateau", "no_first_solution")
+# How many limit checks pass between two looks at the cross-process stop event
+LIMIT_CHECK_INTERVAL = 256
+# Shortest attempt started before a search deadline; less time than this is not worth a probe
+MIN_ATTEMPT_TIME_S = 1.0
+
+def solve_with_vehicles(data, num_vehicles, per_attempt_time_s, hint_routes=None,
+                        first_solution_strategy=DEFAULT_FIRST_SOLUTION_STRATEGY,
+                        stop_event=None, on_solution=None, early_stop=None, stats=None,
+                        metaheuristic=DEFAULT_METAHEURISTIC):
+    """Run one solve attempt with a fixed number of vehicles.
+
+    Args:
+        hint_routes: Optional feasible solution (list of (route, distance)) used
+            as the starting assignment
+        first_solution_strategy: Name of an OR-Tools FirstSolutionStrategy
+        stop_event: Optional multiprocessing.Event; the search stops early once it is set
+        on_solution: Optional callable(dict) called for every improving solution
+            with its time "t" since the solve started, "objective", "span"
+            (longest route) and the number of "vehicles" used
+        early_stop: Optional dict of plateau / first-solution stopping rules
+            (see the Early termination section)
+        stats: Optional dict filled with the "stop_reason" ("time_limit",
+            "plateau", "no_first_solution", "stopped" or "completed"),
+            "first_solution_s", "best_solution_s" and "solve_time_s" of the attempt
+        metaheuristic: Name of an OR-Tools LocalSearchMetaheuristic
+
+    Returns:
+        (all_routes, objective) or (None, None) if no solution was found
+    """
+    with stage("model_build", num_vehicles=num_vehicles):
+        manager, routing, _ = build_routing_model(data, num_vehicles)
+    search_parameters = make_search_parameters(per_attempt_time_s, first_solution_strategy, metaheuristic)
+
+    early_stop = early_stop or {}
+    plateau_window_s = early_stop.get("plateau_window_s")
+    min_improvement = early_stop.get("plateau_min_improvement", DEFAULT_PLATEAU_MIN_IMPROVEMENT)
+    first_solution_timeout_s = early_stop.get("first_solution_timeout_s")
+    # start is reset right before the search, after the model is built
+    state = {"start": time.perf_counter(), "best": None, "reference": None,
+             "improved_at": None, "first_at": None, "best_at": None, "reason": None}
+    distance_dimension = routing.GetDimensionOrDie("Distance")
+
+    def at_solution():
+        # Guided local search also accepts worse solutions; only track improvements
+        objective = routing.CostVar().Value()
+        if state["best"] is not None and objective >= state["best"]:
+            return
+        now = time.perf_counter() - state["start"]
+        if state["best"] is None:
+            state["first_at"] = now
+        state["best"], state["best_at"] = objective, now
+        # The plateau clock only restarts on an improvement of at least min_improvement
+        if state["reference"] is None or objective < state["reference"] * (1 - min_improvement):
+            state["reference"], state["improved_at"] = objective, now
+        if on_solution is not None:
+            on_solution({
+                "t": round(now, 4),
+                "objective": objective,
+                "span": max(distance_dimension.CumulVar(routing.End(v)).Value()
+                            for v in range(num_vehicles)),
+                "vehicles": sum(not routing.IsEnd(routing.NextVar(routing.Start(v)).Value())
+                                for v in range(num_vehicles)),
+            })
+
+    routing.AddAtSolutionCallback(at_solution)
+
+    if stop_event is not None or plateau_window_s or first_solution_timeout_s:
+        # The limit is polled very often; only look at the event every few hundred calls
+        calls = 0
+
+        def should_stop():
+            nonlocal calls
+            calls += 1
+            if stop_event is not None and calls % LIMIT_CHECK_INTERVAL == 0 and stop_event.is_set():
+                state["reason"] = "stopped"
+                return True
+            elapsed = time.perf_counter() - state["start"]
+            if state["best"] is None:
+                if first_solution_timeout_s and elapsed > first_solution_timeout_s:
+                    state["reason"] = "no_first_solution"
+                    return True
+            elif plateau_window_s and elapsed - state["improved_at"] > plateau_window_s:
+                state["reason"] = "plateau"
+                return True
+            return False
+
+        routing.AddSearchMonitor(routing.solver().CustomLimit(should_stop))
+
+    initial = None
+    if hint_routes is not None:
+        hint = routes_to_hint(hint_routes, num_vehicles,
+                              data["distance_matrix"], data["max_distance"])
+        if hint is not None:
+            routing.CloseModelWithParameters(search_parameters)
+            initial = routing.ReadAssignmentFromRoutes(hint, True)
+
+    with stage("solve_attempt", num_vehicles=num_vehicles):
+        state["start"] = time.perf_counter()
+        if initial is not None:
+            solution = routing.SolveFromAssignmentWithParameters(initial, search_parameters)
+        else:
+            solution = routing.SolveWithParameters(search_parameters)
+
+    if stats is not None:
+        solve_time_s = time.perf_counter() - state["start"]
+        reason = state["reason"]
+        if reason is None:
+            reason = "time_limit" if solve_time_s >= 0.99 * per_attempt_time_s else "completed"
+        stats.update({
+            "stop_reason": reason,
+            "first_solution_s": state["first_at"],
+            "best_solution_s": state["best_at"],
+            "solve_time_s": solve_time_s,
+        })
+
+    if not solution:
+        return None, None
+    return extract_routes(manager, routing, solution, num_vehicles), solution.ObjectiveValue()
+
+def attempt_time_left(per_attempt_time_s, deadline):
+    """Time limit of the next solve attempt under an optional deadline.
+
+    Returns:
+        per_attempt_time_s, shortened to the time left before deadline (a
+        time.perf_counter() value), or None once less than MIN_ATTEMPT_TIME_S is left
+    """
+    if deadline is None:
+        return per_attempt_time_s
+    remaining = deadline - time.perf_counter()
+    if remaining < MIN_ATTEMPT_TIME_S:
+        return None
+    return min(per_attempt_time_s, remaining)
+
+def search_fleet_size(data, min_vehicles, max_vehicles, per_attempt_time_s, mode="bracket",
+                      solve_attempt=None, progress=None, on_solution=None, early_stop=None,
+                      solver_options=None, deadline=None):
+    """Find the smallest feasible vehicle count between min_vehicles and max_vehicles.
+
+    "linear" tries every count in turn. "bracket" grows the count exponentially
+    until a feasible solution appears, then bisects between the last infeasible
+    and the first feasible count, warm-starting each probe from the best
+    feasible solution found so far.
+
+    Args:
+        solve_attempt: Optional callable(num_vehicles, hint_routes, time_limit_s)
+            returning (all_routes, objective, info); defaults to a serial solve_with_vehicles
+        progress: Optional callable(dict) told the vehicle count before each probe
+            and the probe count and best feasible solution after it
+        on_solution: Optional callable(dict) receiving the improving solutions of
+            serial probes (see solve_with_vehicles), tagged with "attempt" and
+            "num_vehicles"; not available with a custom solve_attempt
+        early_stop: Optional early termination rules of serial probes (see solve_with_vehicles)
+        solver_options: Optional first_solution_strategy / metaheuristic of serial probes
+        deadline: Optional time.perf_counter() value the search must end by; each
+            probe's time limit is cut to the time left, and once it runs out the
+            search stops with the best feasible plan found so far, which may
+            use more vehicles than necessary
+
+    Returns:
+        (all_routes, probes) where probes is a list of per-solve stats dicts
+    """
+    probes = []
+    best = None
+    report = progress or (lambda update: None)
+
+    def out_of_time():
+        if attempt_time_left(per_attempt_time_s, deadline) is not None:
+            return False
+        print(f"\n⚠ Time budget used up after {len(probes)} probe(s)"
+              + ("; keeping the best plan found" if best is not None else ""))
+        return True
+
+    def probe(num_vehicles):
+        nonlocal best
+        time_limit_s = attempt_time_left(per_attempt_time_s, deadline)
+        print(f"\nAttempting solve with {num_vehicles} vehicle(s)...")
+        report({"num_vehicles": num_vehicles})
+        start = time.perf_counter()
+        if solve_attempt is None:
+            tag = {"attempt": len(probes) + 1, "num_vehicles": num_vehicles}
+            info = {}
+            routes, objective = solve_with_vehicles(
+                data, num_vehicles, time_limit_s, hint_routes=best,
+                on_solution=on_solution and (lambda record: on_solution({**tag, **record})),
+                early_stop=early_stop, stats=info, **(solver_options or {}))
+        else:
+            # Raced on worker processes; only the whole attempt is timed here
+            with stage("solve_attempt", num_vehicles=num_vehicles, parallel=True):
+                routes, objective, info = solve_attempt(num_vehicles, best, time_limit_s)
+        probes.append({
+            "num_vehicles": num_vehicles,
+            "feasible": routes is not None,
+            "objective": objective,
+            "hinted": best is not None,
+            "wall_time_s": time.perf_counter() - start,
+            **info,
+        })
+        if routes is None:
+            print(f"\n No solution found with {num_vehicles} vehicles.")
+            report({"probes": len(probes)})
+            return False
+        best = routes
+        report({"probes": len(probes), "best_num_vehicles": num_vehicles, "best_objective": objective})
+        return True
+
+    if mode == "linear":
+        for num_vehicles in range(min_vehicles, max_vehicles + 1):
+            if out_of_time() or probe(num_vehicles):
+                break
+        return best, probes
+
+    if mode != "bracket":
+        raise ValueError(f"Unknown fleet search mode: {mode}")
+
+    # Exponential phase: find an infeasible/feasible bracket
+    infeasible = min_vehicles - 1
+    feasible = None
+    num_vehicles, step = min_vehicles, 1
+    while num_vehicles <= max_vehicles:
+        if out_of_time():
+            return None, probes
+        if probe(num_vehicles):
+            feasible = num_vehicles
+            break
+        infeasible = num_vehicles
+        if num_vehicles == max_vehicles:
+            break
+        num_vehicles = min(num_vehicles + step, max_vehicles)
+        step *= 2
+
+    if feasible is None:
+        return None, probes
+
+    # Bisection phase: every feasible probe becomes the hint for the next one
+    while feasible - infeasible > 1:
+        if out_of_time():
+            break
+        mid = (infeasible + feasible) // 2
+        if probe(mid):
+            feasible = mid
+        else:
+            infeasible = mid
+
+    return best, probes
+
+def print_probe_report(probes, wall_time_s=None):
+    """Print how many solves the fleet search ran and how long each took.
+
+    Args:
+        wall_time_s: Elapsed time of the whole search; probes of a parallel
+            search overlap, so their times add up to more than that
+    """
+    probe_time = sum(p["wall_time_s"] for p in probes)
+    solves = sum(p.get("candidates", 1) for p in probes)
+    if wall_time_s is None:
+        print(f"\n=== Fleet Search: {solves} solve(s), {probe_time:.1f} s summed over probes ===")
+    else:
+        print(f"\n=== Fleet Search: {solves} solve(s) in {wall_time_s:.1f} s "
+              f"({probe_time:.1f} s summed over probes) ===")
+    for p in probes:
+        status = "feasible" if p["feasible"] else "infeasible"
+        objective = f", objective {p['objective']}" if p["feasible"] else ""
+        hinted = " (warm start)" if p.get("hinted") else ""
+        strategy = ""
+        if p.get("strategy"):
+            metaheuristic = f" + {p['metaheuristic']}" if p.get("metaheuristic") else ""
+            strategy = f" [{p['strategy']}{metaheuristic}, seed {p['seed']}]"
+        stopped = f" (stopped: {p['stop_reason']})" if p.get("stop_reason") in EARLY_STOP_REASONS else ""
+        print(f"  {p['num_vehicles']:>3} vehicles: {status:<10} {p['wall_time_s']:6.1f} s"
+              f"{objective}{hinted}{strategy}{stopped}")
+    early = [p for p in probes if p.get("stop_reason") in EARLY_STOP_REASONS]
+    if early:
+        counts = {reason: sum(p["stop_reason"] == reason for p in early) for reason in EARLY_STOP_REASONS}
+        print("  Early stops: " + ", ".join(f"{n} {reason}" for reason, n in counts.items() if n))
+
+# --- Solver progress log ---
+# Improving solutions of every solve attempt, written as JSON lines so a run
+# can be followed live (the server streams them) and analysed afterwards.
+class SolverLog:
+    """Time series of improving solutions, kept in memory and appended to a JSONL file.
+
+    Use an instance as the on_solution callback of solve(). Every record gets
+    the run id and a wall-clock "time" next to the solver fields.
+
+    Args:
+        path: Optional .jsonl file; records are appended and flushed one per line
+        run_id: Identifies the run in a shared log (default: a timestamp)
+    """
+
+    def __init__(self, path=None, run_id=None):
+        self.path = Path(path) if path else None
+        self.run_id = run_id or time.strftime("%Y%m%dT%H%M%S")
+        self.records = []
+        self._file = None
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a")
+
+    def __call__(self, record):
+        record = {"run_id": self.run_id, "time": round(time.time(), 3), **record}
+        self.records.append(record)
+        if self._file is not None:
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+CONVERGENCE_THRESHOLDS = (0.01, 0.001)
+
+def print_convergence_report(records, thresholds=CONVERGENCE_THRESHOLDS):
+    """Print, per solve attempt, how fast the objective approached its final value.
+
+    For each threshold the report shows the time after which the objective
+    stayed within that fraction of the attempt's final objective, which is
+    the data needed to choose per_attempt_time_s.
+    """
+    attempts = {}
+    for record in records:
+        attempts.setdefault((record.get("attempt"), record.get("num_vehicles")), []).append(record)
+    if not attempts:
+        return
+    header = "".join(f"{f'within {t:.1%}':>14}" for t in thresholds)
+    print(f"\n=== Convergence ({len(records)} improving solutions) ===")
+    print(f"  {'attempt':<10}{'vehicles':>9}{'first':>9}{'last':>9}{'improvements':>14}{header}")
+    for (attempt, num_vehicles), series in attempts.items():
+        final = series[-1]["objective"]
+        reached = [next(r["t"] for r in series if r["objective"] <= final * (1 + t)) for t in thresholds]
+        print(f"  {str(attempt):<10}{num_vehicles:>9}{series[0]['t']:>8.2f}s{series[-1]['t']:>8.2f}s"
+              f"{len(series):>14}" + "".join(f"{t:>13.2f}s" for t in reached))
+
+# --- Parallel solving ---
+# Worker processes attach to the parent's distance matrix through shared memory
+# instead of receiving a pickled copy with every task.
+_worker_state = {}
+
+def _init_solver_worker(shm_name, shape, dtype, max_distance, depot, stop_event, early_stop=None,
+                        stop_above=None):
+    """Process pool initializer: attach to the shared distance matrix."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _worker_state["shm"] = shm
+    _worker_state["data"] = {
+        "distance_matrix": np.ndarray(shape, dtype=dtype, buffer=shm.buf),
+        "max_distance": max_distance,
+        "depot": depot,
+    }
+    _worker_state["stop_event"] = stop_event
+    _worker_state["stop_above"] = stop_above
+    _worker_state["early_stop"] = early_stop
+
+class _CandidateStop:
+    """Stop signal of one candidate: the shared stop event, or a feasible
+    result with fewer vehicles (the shared stop_above value, 0 when unset)."""
+
+    def __init__(self, stop_event, stop_above, num_vehicles):
+        self.stop_event = stop_event
+        self.stop_above = stop_above
+        self.num_vehicles = num_vehicles
+
+    def is_set(self):
+        if self.stop_event.is_set():
+            return True
+        bound = self.stop_above.value if self.stop_above is not None else 0
+        return 0 < bound < self.num_vehicles
+
+def _permute_data(data, seed):
+    """Shuffle the non-depot node order; returns (permuted data, local->original map)."""
+    n = len(data["distance_matrix"])
+    rng = np.random.default_rng(seed)
+    order = np.concatenate(([0], 1 + rng.permutation(n - 1)))
+    permuted = {k: v for k, v in data.items() if k != "transit_matrix"}
+    permuted["distance_matrix"] = np.ascontiguousarray(data["distance_matrix"][np.ix_(order, order)])
+    return permuted, order
+
+def _solve_candidate(candidate, per_attempt_time_s, hint_routes):
+    """Worker entry point: solve one (num_vehicles, strategy, seed) candidate."""
+    data = _worker_state["data"]
+    stop_event = _CandidateStop(_worker_state["stop_event"], _worker_state["stop_above"],
+                                candidate["num_vehicles"])
+    start = time.perf_counter()
+
+    seed = candidate.get("seed", 0)
+    order = None
+    if seed:
+        # OR-Tools routing has no random seed; a seeded node order diversifies
+        # tie-breaking in the first-solution heuristics instead
+        data, order = _permute_data(data, seed)
+        if hint_routes is not None:
+            inverse = np.argsort(order)
+            hint_routes = [([int(inverse[n]) for n in route], dist) for route, dist in hint_routes]
+
+    stats = {}
+    routes, objective = solve_with_vehicles(
+        data, candidate["num_vehicles"], per_attempt_time_s,
+        hint_routes=hint_routes,
+        first_solution_strategy=candidate["strategy"],
+        metaheuristic=candidate.get("metaheuristic", DEFAULT_METAHEURISTIC),
+        stop_event=stop_event,
+        early_stop=_worker_state["early_stop"],
+        stats=stats,
+    )
+    if routes is not None and order is not None:
+        routes = [([int(order[n]) for n in route], dist) for route, dist in routes]
+
+    return {
+        **candidate,
+        "routes": routes,
+        "objective": objective,
+        "feasible": routes is not None,
+        "stopped": stop_event.is_set(),
+        "stop_reason": stats["stop_reason"],
+        "best_solution_s": stats["best_solution_s"],
+        "wall_time_s": time.perf_counter() - start,
+    }
+
+class ParallelSolver:
+    """Solves several routing candidates at once on a ProcessPoolExecutor.
+
+    A candidate is a dict with "num_vehicles", "strategy" (FirstSolutionStrategy
+    name), optionally "metaheuristic", and "seed". early_stop applies to every solve on the workers. Use as
+    a context manager so the pool and the shared memory block are released.
+    """
+
+    def __init__(self, data, workers, early_stop=None):
+        matrix = np.ascontiguousarray(data["distance_matrix"])
+        self._shm = shared_memory.SharedMemory(create=True, size=matrix.nbytes)
+        np.ndarray(matrix.shape, dtype=matrix.dtype, buffer=self._shm.buf)[:] = matrix
+        ctx = multiprocessing.get_context()
+        self._stop_event = ctx.Event()
+        self._stop_above = ctx.Value("i", 0)
+        self.workers = workers
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=ctx,
+            initializer=_init_solver_worker,
+            initargs=(self._shm.name, matrix.shape, matrix.dtype.str,
+                      data["max_distance"], data["depot"], self._stop_event, early_stop,
+                      self._stop_above),
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._shm.close()
+        self._shm.unlink()
+
+    def submit(self, fn, *args):
+        """Run fn(*args) on a worker that has the shared matrix attached."""
+        return self._executor.submit(fn, *args)
+
+    def run(self, candidates, per_attempt_time_s, pick="first", hint_routes=None):
+        """Solve all candidates and return (winner, results).
+
+        pick="first" takes the first feasible result and stops the other
+        attempts; pick="best" waits for every candidate and keeps the one
+        with the fewest vehicles, then the lowest objective, then the one
+        that reached it first.
+
+        When the candidates probe different vehicle counts, "first" still
+        returns the smallest feasible count: a feasible result only stops
+        the candidates with more vehicles, and the ones with fewer run to
+        the end.
+        """
+        if pick not in ("first", "best"):
+            raise ValueError(f"Unknown pick policy: {pick}")
+
+        def rank(result):
+            return (result["num_vehicles"], result["objective"], result.get("best_solution_s") or 0.0)
+
+        by_count = len({c["num_vehicles"] for c in candidates}) > 1
+        self._stop_event.clear()
+        self._stop_above.value = 0
+        futures = {self._executor.submit(_solve_candidate, c, per_attempt_time_s, hint_routes): c
+                   for c in candidates}
+        results = []
+        winner = None
+        for future in as_completed(futures):
+            if future.cancelled():
+                continue
+            result = future.result()
+            results.append(result)
+            if pick != "first" or not result["feasible"]:
+                continue
+            if by_count:
+                if winner is None or rank(result) < rank(winner):
+                    winner = result
+                    self._stop_above.value = winner["num_vehicles"]
+                    for other, candidate in futures.items():
+                        if candidate["num_vehicles"] > winner["num_vehicles"]:
+                            other.cancel()
+            elif winner is None:
+                winner = result
+                self._stop_event.set()
+                for other in futures:
+                    other.cancel()
+
+        if pick == "best":
+            feasible = [r for r in results if r["feasible"]]
+            if feasible:
+                winner = min(feasible, key=rank)
+        return winner, results
+
+def make_candidates(num_vehicles, count, strategies=PARALLEL_STRATEGIES):
+    """Build `count` strategy/seed combinations for one vehicle count."""
+    candidates = []
+    seed = 0
+    while len(candidates) < count:
+        for strategy in strategies:
+            if len(candidates) == count:
+                break
+            candidates.append({"num_vehicles": num_vehicles, "strategy": strategy, "seed": seed})
+        seed += 1
+    return candidates
+
+def _result_to_probe(result):
+    """Strip the routes from a worker result for the probe report."""
+    return {k: v for k, v in result.items() if k != "routes"}
+
+def search_fleet_size_parallel(data, min_vehicles, max_vehicles, per_attempt_time_s,
+                               workers, pick="first", progress=None, early_stop=None,
+                               solver_options=None, deadline=None):
+    """Sweep vehicle counts `workers` at a time, one count per process.
+
+    Args:
+        progress: Optional callable(dict), as in search_fleet_size
+        early_stop: Optional early termination rules (see solve_with_vehicles)
+        solver_options: Optional first_solution_strategy / metaheuristic of every solve
+        deadline: Optional time.perf_counter() value the search must end by (see search_fleet_size)
+
+    Returns:
+        (all_routes, probes) like search_fleet_size
+    """
+    probes = []
+    report = progress or (lambda update: None)
+    with ParallelSolver(data, workers, early_stop) as solver:
+        for batch_start in range(min_vehicles, max_vehicles + 1, workers):
+            counts = range(batch_start, min(batch_start + workers, max_vehicles + 1))
+            time_limit_s = attempt_time_left(per_attempt_time_s, deadline)
+            if time_limit_s is None:
+                print(f"\n⚠ Time budget used up after {len(probes)} probe(s)")
+                break
+            print(f"\nAttempting solves with {counts[0]}-{counts[-1]} vehicles in parallel...")
+            report({"num_vehicles": counts[0]})
+            solver_options = solver_options or {}
+            candidates = [{"num_vehicles": k,
+                           "strategy": solver_options.get("first_solution_strategy", DEFAULT_FIRST_SOLUTION_STRATEGY),
+                           "metaheuristic": solver_options.get("metaheuristic", DEFAULT_METAHEURISTIC),
+                           "seed": 0}
+                          for k in counts]
+            with stage("solve_attempt", num_vehicles=counts[0], parallel=len(counts)):
+                winner, results = solver.run(candidates, time_limit_s, pick=pick)
+            probes.extend(_result_to_probe(r) for r in results)
+            report({"probes": len(probes)})
+            if winner is not None:
+                report({"best_num_vehicles": winner["num_vehicles"], "best_objective": winner["objective"]})
+                return winner["routes"], probes
+    return None, probes
+
+def race_strategies(solver, per_attempt_time_s, pick="best"):
+    """Build a solve_attempt for search_fleet_size that races strategies/seeds per probe."""
+    def solve_attempt(num_vehicles, hint_routes, time_limit_s=None):
+        candidates = make_candidates(num_vehicles, solver.workers)
+        winner, results = solver.run(candidates, time_limit_s or per_attempt_time_s, pick=pick,
+                                     hint_routes=hint_routes)
+        if winner is None:
+            # Reported as an early stop only if every candidate gave up on its first solution
+            reasons = {r["stop_reason"] for r in results}
+            info = {"candidates": len(results)}
+            if reasons == {"no_first_solution"}:
+                info["stop_reason"] = "no_first_solution"
+            return None, None, info
+        return winner["routes"], winner["objective"], {
+            "strategy": winner["strategy"],
+            "seed": winner["seed"],
+            "candidates": len(results),
+            "stop_reason": winner["stop_reason"],
+        }
+    return solve_attempt
+
+# --- Solver portfolio ---
+# parallel_mode="portfolio" races strategy / metaheuristic / seed combinations
+# for every probe and appends the outcome to a history file, from which the
+# usual winner for a problem size can be looked up (learned_default).
+PORTFOLIO = [
+    {"strategy": "PARALLEL_CHEAPEST_INSERTION", "metaheuristic": "GUIDED_LOCAL_SEARCH", "seed": 0},
+    {"strategy": "SAVINGS", "metaheuristic": "GUIDED_LOCAL_SEARCH", "seed": 0},
+    {"strategy": "PATH_CHEAPEST_ARC", "metaheuristic": "GUIDED_LOCAL_SEARCH", "seed": 0},
+    {"strategy": "PARALLEL_CHEAPEST_INSERTION", "metaheuristic": "SIMULATED_ANNEALING", "seed": 0},
+    {"strategy": "SAVINGS", "metaheuristic": "TABU_SEARCH", "seed": 0},
+    {"strategy": "PATH_CHEAPEST_ARC", "metaheuristic": "TABU_SEARCH", "seed": 0},
+]
+PORTFOLIO_HISTORY = "portfolio_history.jsonl"
+
+def parse_portfolio(specs):
+    """Portfolio entries from "STRATEGY:METAHEURISTIC[:SEED]" strings.
+
+    Raises:
+        ValueError: For unknown OR-Tools strategy or metaheuristic names
+    """
+    portfolio = []
+    for spec in specs:
+        strategy, metaheuristic, *seed = spec.upper().split(":")
+        if not hasattr(routing_enums_pb2.FirstSolutionStrategy, strategy):
+            raise ValueError(f"Unknown first solution strategy: {strategy}")
+        if not hasattr(routing_enums_pb2.LocalSearchMetaheuristic, metaheuristic):
+            raise ValueError(f"Unknown metaheuristic: {metaheuristic}")
+        portfolio.append({"strategy": strategy, "metaheuristic": metaheuristic,
+                          "seed": int(seed[0]) if seed else 0})
+    return portfolio
+
+def race_portfolio(solver, per_attempt_time_s, portfolio=PORTFOLIO, history_file=None, data=None):
+    """Build a solve_attempt that races every portfolio entry within one shared budget.
+
+    Entries beyond the worker count run in later waves, so each entry gets
+    per_attempt_time_s divided by the number of waves. The best result wins
+    (fewest vehicles, lowest objective, earliest to reach it).
+
+    Args:
+        history_file: Optional .jsonl file the outcome of every feasible probe is appended to
+        data: Data model of the probes, for the history records
+    """
+    waves = math.ceil(len(portfolio) / solver.workers)
+
+    def solve_attempt(num_vehicles, hint_routes, time_limit_s=None):
+        candidates = [{"num_vehicles": num_vehicles, **entry} for entry in portfolio]
+        winner, results = solver.run(candidates, (time_limit_s or per_attempt_time_s) / waves,
+                                     pick="best", hint_routes=hint_routes)
+        if winner is None:
+            return None, None, {"candidates": len(results)}
+        if history_file is not None:
+            record_portfolio_result(history_file, data, winner, results)
+        return winner["routes"], winner["objective"], {
+            "strategy": winner["strategy"],
+            "metaheuristic": winner["metaheuristic"],
+            "seed": winner["seed"],
+            "candidates": len(results),
+            "stop_reason": winner["stop_reason"],
+        }
+    return solve_attempt
+
+def _portfolio_entry(result):
+    return {key: result[key] for key in ("strategy", "metaheuristic", "seed")}
+
+def record_portfolio_result(history_file, data, winner, results):
+    """Append the outcome of one portfolio race to the history file."""
+    record = {
+        "time": round(time.time(), 3),
+        "site_id": data.get("site_id") if data else None,
+        "num_nodes": len(data["distance_matrix"]) if data else None,
+        "num_vehicles": winner["num_vehicles"],
+        "winner": _portfolio_entry(winner),
+        "objective": winner["objective"],
+        "candidates": [
+            {**_portfolio_entry(r), "objective": r["objective"],
+             "best_solution_s": r.get("best_solution_s"), "wall_time_s": round(r["wall_time_s"], 3)}
+            for r in results
+        ],
+    }
+    history_file = Path(history_file)
+    history_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(history_file, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+def read_portfolio_history(history_file):
+    """Records of a portfolio history file; unreadable lines are skipped."""
+    records = []
+    try:
+        with open(history_file) as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return [r for r in records if r.get("winner") and r.get("num_nodes")]
+
+def _size_bucket(num_nodes):
+    """Problem sizes are compared on a log2 scale (100 and 130 nodes share a bucket)."""
+    return round(math.log2(max(num_nodes, 1)))
+
+def learned_default(history_file, num_nodes):
+    """Strategy/metaheuristic pair that won most often for problems of this size.
+
+    Uses the history records of the nearest size bucket that has any.
+
+    Returns:
+        Dict with "strategy", "metaheuristic", "wins" and "races", or None
+        if the history is empty
+    """
+    records = read_portfolio_history(history_file)
+    if not records:
+        return None
+    target = _size_bucket(num_nodes)
+    nearest = min({_size_bucket(r["num_nodes"]) for r in records}, key=lambda b: (abs(b - target), b))
+    races = [r for r in records if _size_bucket(r["num_nodes"]) == nearest]
+    wins = Counter((r["winner"]["strategy"], r["winner"]["metaheuristic"]) for r in races)
+    (strategy, metaheuristic), count = wins.most_common(1)[0]
+    return {"strategy": strategy, "metaheuristic": metaheuristic, "wins": count, "races": len(races)}
+
+def print_portfolio_report(history_file):
+    """Print how often each strategy/metaheuristic pair won, per problem size."""
+    records = read_portfolio_history(history_file)
+    print(f"\n=== Portfolio history: {len(records)} race(s) ({history_file}) ===")
+    by_bucket = {}
+    for r in records:
+        by_bucket.setdefault(_size_bucket(r["num_nodes"]), []).append(r)
+    for bucket in sorted(by_bucket):
+        races = by_bucket[bucket]
+        print(f"  ~{2 ** bucket} nodes ({len(races)} race(s)):")
+        wins = Counter((r["winner"]["strategy"], r["winner"]["metaheuristic"]) for r in races)
+        for (strategy, metaheuristic), count in wins.most_common():
+            print(f"    {strategy:<30} {metaheuristic:<22} {count:>4} win(s)")
+
+# --- Spatial decomposition ---
+def _planar_coords(data):
+    """Local-node coordinates with longitude scaled so distances are roughly isotropic."""
+    coords = np.asarray(data["points_lat_long"], dtype=np.float64)
+    scale = math.cos(math.radians(float(coords[:, 1].mean())))
+    return np.column_stack((coords[:, 0] * scale, coords[:, 1]))
+
+def _kmeans_labels(coords, k, iterations=50, seed=0):
+    """Plain Lloyd's k-means; returns a cluster label per row of coords."""
+    rng = np.random.default_rng(seed)
+    centers = coords[rng.choice(len(coords), k, replace=False)]
+    labels = np.zeros(len(coords), dtype=np.int64)
+    for _ in range(iterations):
+        dist = ((coords[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        labels = np.argmin(dist, axis=1)
+        new_centers = np.array([
+            coords[labels == c].mean(axis=0) if np.any(labels == c) else centers[c]
+            for c in range(k)
+        ])
+        if np.allclose(new_centers, centers):
+            break
+        centers = new_centers
+    return labels
+
+def partition_photo_nodes(data, num_partitions, method="sweep"):
+    """Split the non-depot local nodes into spatial partitions.
+
+    Args:
+        num_partitions: Number of partitions to create
+        method: "sweep" (equal-size angular sectors around the depot) or
+            "kmeans" (k-means on the waypoint coordinates)
+
+    Returns:
+        List of non-empty arrays of local node indices (depot excluded)
+    """
+    coords = _planar_coords(data)
+    depot = data["depot"]
+    nodes = np.array([n for n in range(len(coords)) if n != depot])
+    num_partitions = max(1, min(num_partitions, len(nodes)))
+
+    if method == "sweep":
+        offsets = coords[nodes] - coords[depot]
+        angles = np.arctan2(offsets[:, 1], offsets[:, 0])
+        order = np.argsort(angles)
+        # Start the sweep at the widest empty sector so no partition straddles it
+        gaps = np.diff(np.concatenate((angles[order], [angles[order][0] + 2 * np.pi])))
+        order = np.roll(order, -(int(np.argmax(gaps)) + 1))
+        parts = np.array_split(nodes[order], num_partitions)
+    elif method == "kmeans":
+        labels = _kmeans_labels(coords[nodes], num_partitions)
+        parts = [nodes[labels == c] for c in range(num_partitions)]
+    else:
+        raise ValueError(f"Unknown partition method: {method}")
+
+    return [part for part in parts if len(part)]
+
+def _subproblem(data, nodes):
+    """Data model for depot + the given local nodes of a parent data model."""
+    sub_nodes = np.concatenate(([data["depot"]], nodes))
+    return {
+        "distance_matrix": np.ascontiguousarray(data["distance_matrix"][np.ix_(sub_nodes, sub_nodes)]),
+        "max_distance": data["max_distance"],
+        "depot": 0,
+    }, sub_nodes
+
+def _solve_partition(nodes, max_vehicles, per_attempt_time_s):
+    """Worker entry point: run a serial fleet search on one partition."""
+    start = time.perf_counter()
+    sub_data, sub_nodes = _subproblem(_worker_state["data"], nodes)
+    est_min = estimate_min_vehicles(sub_data["distance_matrix"], sub_data["max_distance"])
+    routes, probes = search_fleet_size(sub_data, est_min, max_vehicles, per_attempt_time_s,
+                                       early_stop=_worker_state["early_stop"])
+    if routes is not None:
+        # Map partition-local nodes back to the parent model
+        routes = [([int(sub_nodes[n]) for n in route], dist) for route, dist in routes]
+    return {
+        "num_nodes": len(nodes),
+        "routes": routes,
+        "probes": probes,
+        "wall_time_s": time.perf_counter() - start,
+    }
+
+def route_set_stats(all_routes):
+    """Vehicle count and total distance of a solution, ignoring empty routes."""
+    used = [(route, dist) for route, dist in all_routes if len(route) > 2]
+    return {"num_vehicles": len(used), "total_distance": int(sum(dist for _, dist in used))}
+
+def solve_decomposed(data, num_partitions, max_vehicles, per_attempt_time_s,
+                     method="sweep", workers=None, repair_time_s=None, early_stop=None):
+    """Solve each spatial partition independently in parallel, then stitch and repair.
+
+    The joined routes are used as the initial assignment of a short solve on
+    the full problem so nodes can move across partition borders.
+
+    Returns:
+        (all_routes, stats) where stats includes per-partition results
+    """
+    start = time.perf_counter()
+    parts = partition_photo_nodes(data, num_partitions, method)
+    workers = workers or min(len(parts), os.cpu_count() or 1)
+    print(f"\nDecomposing {len(data['distance_matrix']) - 1} waypoints into "
+          f"{len(parts)} '{method}' partitions on {workers} worker(s)...")
+
+    with ParallelSolver(data, workers, early_stop) as solver:
+        futures = [solver.submit(_solve_partition, part, max_vehicles, per_attempt_time_s)
+                   for part in parts]
+        partitions = [f.result() for f in futures]
+    partition_time = time.perf_counter() - start
+
+    failed = [i for i, p in enumerate(partitions) if p["routes"] is None]
+    stats = {
+        "method": method,
+        "partitions": [{k: v for k, v in p.items() if k != "routes"} for p in partitions],
+        "partition_wall_time_s": partition_time,
+    }
+    if failed:
+        print(f"\n No feasible solution for partition(s) {failed}.")
+        return None, stats
+
+    joined = [(route, dist) for p in partitions for route, dist in p["routes"] if len(route) > 2]
+    stats["stitched"] = route_set_stats(joined)
+
+    # Cross-partition repair: warm-start the full problem from the stitched routes.
+    # Partitions often leave a short route behind, so first try to absorb it.
+    repair_start = time.perf_counter()
+    repair_time_s = repair_time_s or per_attempt_time_s
+    repaired = None
+    if len(joined) > 1 and routes_to_hint(joined, len(joined) - 1,
+                                          data["distance_matrix"], data["max_distance"]):
+        repaired, _ = solve_with_vehicles(data, len(joined) - 1, repair_time_s, hint_routes=joined,
+                                          early_stop=early_stop)
+    if repaired is None:
+        repaired, _ = solve_with_vehicles(data, len(joined), repair_time_s, hint_routes=joined,
+                                          early_stop=early_stop)
+    all_routes = repaired if repaired is not None else joined
+    stats["repair_wall_time_s"] = time.perf_counter() - repair_start
+    stats["repaired"] = route_set_stats(all_routes)
+    stats["wall_time_s"] = time.perf_counter() - start
+    return all_routes, stats
+
+def print_decomposition_report(stats, baseline=None):
+    """Print partition results and, if given, the gap against a monolithic solve.
+
+    Args:
+        baseline: Optional dict with "num_vehicles", "total_distance" and
+            "wall_time_s" of the monolithic solve
+    """
+    print(f"\n=== Decomposition ({stats['method']}, {len(stats['partitions'])} partitions) ===")
+    for i, p in enumerate(stats["partitions"]):
+        solves = sum(probe.get("candidates", 1) for probe in p["probes"])
+        print(f"  Partition {i + 1}: {p['num_nodes']} waypoints, {solves} solve(s), {p['wall_time_s']:.1f} s")
+    if "repaired" not in stats:
+        return
+    stitched, repaired = stats["stitched"], stats["repaired"]
+    print(f"  Stitched: {stitched['num_vehicles']} vehicles, {stitched['total_distance']} ft")
+    print(f"  Repaired: {repaired['num_vehicles']} vehicles, {repaired['total_distance']} ft "
+          f"({stats['repair_wall_time_s']:.1f} s repair)")
+    print(f"  Total wall time: {stats['wall_time_s']:.1f} s")
+    if baseline is not None:
+        gap = 100.0 * (repaired["total_distance"] - baseline["total_distance"]) / max(baseline["total_distance"], 1)
+        print(f"  Monolithic: {baseline['num_vehicles']} vehicles, {baseline['total_distance']} ft"
+              + (f", {baseline['wall_time_s']:.1f} s" if baseline.get("wall_time_s") else ""))
+        print(f"  Cost gap: {gap:+.2f}% distance, "
+              f"{repaired['num_vehicles'] - baseline['num_vehicles']:+d} vehicles")
+        if baseline.get("wall_time_s"):
+            print(f"  Speedup: {baseline['wall_time_s'] / stats['wall_time_s']:.1f}x")
+
 def reconstruct_path(start, end, predecessors):
     """Reconstruct actual waypoint sequence from start to end using predecessor matrix.
     
     Args:
         start: Starting waypoint index
         end: Ending waypoint index
-        predecessors: Predecessor matrix from Dijkstra
+        predecessors: Predecessor matrix from Dijkstra (may be memory-mapped)
         
     Returns:
         List of waypoint indices forming the complete path
@@ -113,8 +1140,11 @@ def reconstruct_path(start, end, predecessors):
     if start == end:
         return [start]
     
+    # Only the start row is needed; read it once instead of per hop
+    row = np.asarray(predecessors[start])
+
     # Check if path exists (convention: -9999 means no path/predecessor)
-    if predecessors[start][end] == -9999 or predecessors[start][end] < 0:
+    if row[end] == -9999 or row[end] < 0:
         return [start, end]  # Direct connection or fallback
     
     # Reconstruct path backwards from end to start
@@ -122,7 +1152,7 @@ def reconstruct_path(start, end, predecessors):
     current = end
     while current != start:
         path.append(current)
-        prev = predecessors[start][current]
+        prev = row[current]
         if prev < 0 or prev == current:  # Safety check for cycles
             break
         current = int(prev)
@@ -130,103 +1160,364 @@ def reconstruct_path(start, end, predecessors):
     
     return list(reversed(path))
 
-def expand_route_with_paths(route, predecessors, index_map):
+PATH_CACHE_SIZE = 65536
+
+class PathCache:
+    """Bounded LRU of reconstructed (start, end) path segments.
+
+    Segments are int32 arrays of GLOBAL waypoint indices, start and end included.
+    A cache is only valid for the predecessor matrix it was filled from.
+    """
+
+    def __init__(self, maxsize=PATH_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.segments = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        segment = self.segments.get(key)
+        if segment is None:
+            self.misses += 1
+            return None
+        self.segments.move_to_end(key)
+        self.hits += 1
+        return segment
+
+    def put(self, key, segment):
+        self.segments[key] = segment
+        self.segments.move_to_end(key)
+        while len(self.segments) > self.maxsize:
+            self.segments.popitem(last=False)
+
+def reconstruct_paths(starts, ends, predecessors):
+    """Reconstruct many start -> end paths at once, one predecessor hop per step.
+
+    Every pair still being walked advances together with a single fancy-indexed
+    read of the predecessor matrix, so the Python loop runs once per hop of the
+    longest path instead of once per hop of every path. Same conventions as
+    reconstruct_path(): a negative predecessor falls back to [start, end].
+
+    Args:
+        starts: GLOBAL start waypoint indices
+        ends: GLOBAL end waypoint indices (same length as starts)
+        predecessors: Predecessor matrix from Dijkstra (may be memory-mapped)
+
+    Returns:
+        (flat, offsets): int32 concatenation of all paths, and offsets such that
+        path k is flat[offsets[k]:offsets[k + 1]]
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+
+    # hops[0] holds the start, hops[1] the end, later rows the nodes walked back
+    # towards the start; -1 marks pairs that are already finished
+    hops = [starts, np.where(starts != ends, ends, -1)]
+    current = ends.copy()
+    active = np.flatnonzero(starts != ends)
+    if len(active):
+        active = active[np.asarray(predecessors[starts[active], ends[active]]) >= 0]
+
+    for _ in range(predecessors.shape[0]):
+        if not len(active):
+            break
+        prev = np.asarray(predecessors[starts[active], current[active]]).astype(np.int64)
+        # Stop at the start, and on missing predecessors or self-loops (safety check)
+        keep = (prev != starts[active]) & (prev >= 0) & (prev != current[active])
+        active, prev = active[keep], prev[keep]
+        row = np.full(len(starts), -1, dtype=np.int64)
+        row[active] = prev
+        current[active] = prev
+        hops.append(row)
+
+    # Walked nodes come out end-first; reverse them so each column reads
+    # start, -1 padding, ..., end and the padding can simply be dropped
+    table = np.vstack([hops[0][None, :], np.vstack(hops[1:])[::-1]]).T
+    valid = table >= 0
+    flat = table[valid].astype(np.int32)
+    offsets = np.zeros(len(starts) + 1, dtype=np.int64)
+    np.cumsum(valid.sum(axis=1), out=offsets[1:])
+    return flat, offsets
+
+def expand_routes(routes, predecessors, index_map, cache=None):
+    """Expand high-level routes into detailed waypoint sequences in one pass.
+
+    All legs of all routes are reconstructed together; legs already in the
+    cache (and legs repeated across routes) are only reconstructed once.
+
+    Args:
+        routes: List of LOCAL waypoint index sequences [depot, wp1, ..., depot]
+        predecessors: Predecessor matrix (uses GLOBAL indices)
+        index_map: Dictionary mapping local indices to global indices
+        cache: Optional PathCache shared between calls
+
+    Returns:
+        (flat, offsets): int32 GLOBAL waypoint indices of all expanded routes,
+        route i being flat[offsets[i]:offsets[i + 1]]
+    """
+    lookup = np.array([index_map[i] for i in range(len(index_map))], dtype=np.int64)
+    global_routes = [lookup[np.asarray(route, dtype=np.int64)] for route in routes]
+
+    # Collect the distinct legs that are not cached yet
+    segments = {}
+    for path in global_routes:
+        for key in zip(path[:-1].tolist(), path[1:].tolist()):
+            if key not in segments:
+                segments[key] = cache.get(key) if cache is not None else None
+    missing = [key for key, segment in segments.items() if segment is None]
+    if missing:
+        starts, ends = zip(*missing)
+        flat, offsets = reconstruct_paths(starts, ends, predecessors)
+        for k, key in enumerate(missing):
+            segments[key] = flat[offsets[k]:offsets[k + 1]]
+            if cache is not None:
+                cache.put(key, segments[key])
+
+    # Join the legs, dropping the duplicated waypoint at each junction
+    parts = []
+    lengths = np.zeros(len(global_routes), dtype=np.int64)
+    for i, path in enumerate(global_routes):
+        if len(path) == 1:
+            legs = [path.astype(np.int32)]
+        else:
+            keys = zip(path[:-1].tolist(), path[1:].tolist())
+            legs = [segment if j == 0 else segment[1:] for j, segment in enumerate(segments[key] for key in keys)]
+        parts.extend(legs)
+        lengths[i] = sum(len(leg) for leg in legs)
+
+    offsets = np.zeros(len(global_routes) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    flat = np.concatenate(parts).astype(np.int32, copy=False) if parts else np.zeros(0, dtype=np.int32)
+    return flat, offsets
+
+def expand_route_with_paths(route, predecessors, index_map, cache=None):
     """Expand a high-level route into detailed waypoint sequence.
     
     Args:
         route: List of LOCAL waypoint indices [depot, wp1, wp2, ..., depot]
         predecessors: Predecessor matrix (uses GLOBAL indices)
         index_map: Dictionary mapping local indices to global indices
+        cache: Optional PathCache shared between calls
         
     Returns:
         List of all GLOBAL waypoint indices including intermediate nodes
     """
-    full_path = []
-    
-    for i in range(len(route) - 1):
-        # Convert local indices to global for predecessor lookup
-        start_global = index_map[route[i]]
-        end_global = index_map[route[i+1]]
-        
-        # Get the full path segment in global indices
-        segment = reconstruct_path(start_global, end_global, predecessors)
-        
-        # Add segment, avoiding duplicate waypoints at junctions
-        if i == 0:
-            full_path.extend(segment)
-        else:
-            full_path.extend(segment[1:])  # Skip first (already added)
-    
-    return full_path
-
-def plot_polygon_on_ax(ax, polygon=None):
-    """Helper to plot polygon boundary on an existing axis."""
-    if polygon is not None:
-        gdf_poly = gpd.GeoDataFrame(geometry=[polygon], crs="EPSG:4326")
-        gdf_poly.boundary.plot(ax=ax, color='blue', linewidth=2, label='Boundary', zorder=1)
-
-# --- Visualize the problem ---
-try:
-    navigable_coords = points_lat_long[:num_navigable]
-    asset_coords = points_lat_long[asset_indexes[0]:asset_indexes[1]+1]
-
-    fig, ax = plt.subplots(figsize=(12, 10))
-
-    # Plot polygon boundary
-    plot_polygon_on_ax(ax, POLYGON)
-
-    # Plot navigable waypoints and assets
-    ax.scatter(navigable_coords[:, 0], navigable_coords[:, 1],
-               c='red', s=10, alpha=0.5, label=f'Navigable waypoints ({num_navigable})')
-    ax.scatter(asset_coords[:, 0], asset_coords[:, 1],
-               c='green', s=50, marker='s', alpha=0.7, label=f'Assets ({num_assets})')
-
-    ax.set_xlabel('Longitude')
-    ax.set_ylabel('Latitude')
-    ax.set_title('Drone Inspection Area')
-    ax.legend()
-    ax.grid(True, alpha=0.3)
-    plt.tight_layout()
-    plt.show()
-except Exception as e:
-    print(f"Visualization error: {e}")
+    flat, _ = expand_routes([route], predecessors, index_map, cache)
+    return flat.tolist()
+
+# --- Incremental re-optimization ---
+def reoptimize_incremental(data, old_routes, old_route_nodes, time_budget_s=10, on_solution=None,
+                           early_stop=None):
+    """Repair a previous solution after waypoints were added or removed.
+
+    Old routes are translated to the new data model, removed waypoints are
+    dropped, added ones are placed by cheapest insertion (opening new routes
+    when nothing fits), and the result warm-starts a short OR-Tools solve.
+
+    Args:
+        old_routes: List of (route, distance) tuples in the old local indices
+        old_route_nodes: Global index of every old local index
+        time_budget_s: Time limit for the repair solve
+        on_solution / early_stop: See solve_with_vehicles
+
+    Returns:
+        (all_routes, stats); all_routes is None if no feasible plan was reached
+    """
+    start = time.perf_counter()
+    matrix, max_distance = data["distance_matrix"], data["max_distance"]
+
+    # Global -> new local index; the depot is always local 0
+    new_local = {}
+    for local, global_ in enumerate(data["route_nodes"]):
+        if local != data["depot"]:
+            new_local.setdefault(int(global_), local)
+
+    routes, kept, removed = [], set(), 0
+    for route, _ in old_routes:
+        inner = []
+        for node in route[1:-1]:
+            local = new_local.get(int(old_route_nodes[node]))
+            if local is None or local in kept:
+                removed += 1
+                continue
+            kept.add(local)
+            inner.append(local)
+        if inner:
+            routes.append(inner)
+
+    added = [local for local in new_local.values() if local not in kept]
+    pending = added
+    while pending:
+        if insert_nodes_cheapest(routes, pending, matrix, max_distance):
+            break
+        # Open a new route for the first node that fits nowhere, then retry the rest
+        placed = set(n for inner in routes for n in inner)
+        pending = [n for n in pending if n not in placed]
+        routes.append([pending[0]])
+        pending = pending[1:]
+
+    hint = []
+    for inner in routes:
+        path = [0] + inner + [0]
+        hint.append((path, int(sum(matrix[a][b] for a, b in zip(path[:-1], path[1:])))))
+
+    print(f"\nIncremental repair: {len(added)} added, {removed} removed, "
+          f"{len(hint)} routes, {time_budget_s:g} s budget")
+    tag = {"attempt": "repair", "num_vehicles": len(hint)}
+    all_routes, objective = solve_with_vehicles(
+        data, len(hint), time_budget_s, hint_routes=hint,
+        on_solution=on_solution and (lambda record: on_solution({**tag, **record})),
+        early_stop=early_stop)
+    if all_routes is None:
+        # Fall back to the insertion result if the repair solve found nothing,
+        # unless the old routes no longer fit the distance limit
+        if any(dist > max_distance for _, dist in hint):
+            return None, {"added": len(added), "removed": removed}
+        all_routes = hint
+    stats = {
+        "added": len(added),
+        "removed": removed,
+        "objective": objective,
+        "wall_time_s": time.perf_counter() - start,
+        **route_set_stats(all_routes),
+    }
+    print(f" Repair done in {stats['wall_time_s']:.1f} s: {stats['num_vehicles']} vehicles, "
+          f"{stats['total_distance']} ft")
+    return all_routes, stats
 
 # --- Caching utilities ---
-def cache_save(key, result, cache_dir="cache"):
-    """Save result to cache with atomic write to prevent corruption."""
+# Solutions are stored as compressed npz files of int32 route arrays, keyed by
+# a hash of everything that determines the plan.
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+NEAR_MATCH_MIN_OVERLAP = 0.8
+
+def solution_cache_key(label, data, solver_config):
+    """Content-addressed cache key for a data model and solver configuration.
+
+    The hash covers the local distance matrix, the global waypoint indices it
+    was built from, the distance limit and the solver configuration, so any
+    change to the inputs produces a new key.
+    """
+    h = hashlib.sha256()
+    h.update(np.ascontiguousarray(data["distance_matrix"], dtype=np.int32).tobytes())
+    h.update(np.asarray(data["route_nodes"], dtype=np.int64).tobytes())
+    h.update(str(int(data["max_distance"])).encode())
+    h.update(json.dumps(solver_config, sort_keys=True).encode())
+    return f"{label}_{h.hexdigest()[:20]}"
+
+def cache_save(key, result, cache_dir="cache", max_bytes=CACHE_MAX_BYTES):
+    """Save a solution to cache with atomic write to prevent corruption.
+
+    Args:
+        result: Dict with "all_routes" (list of (route, distance)), "route_nodes"
+            and optional "meta" (JSON-serializable)
+        max_bytes: Cache size limit; least recently used entries are evicted
+    """
     Path(cache_dir).mkdir(exist_ok=True)
-    cache_file = Path(cache_dir) / f"{key}.pkl"
-    temp_file = Path(cache_dir) / f"{key}.pkl.tmp"
+    cache_file = Path(cache_dir) / f"{key}.npz"
+    temp_file = Path(cache_dir) / f"{key}.npz.tmp"
 
+    routes = [np.asarray(route, dtype=np.int32) for route, _ in result["all_routes"]]
+    offsets = np.zeros(len(routes) + 1, dtype=np.int32)
+    offsets[1:] = np.cumsum([len(r) for r in routes])
     try:
         with open(temp_file, "wb") as f:
-            pickle.dump(result, f)
-        shutil.move(str(temp_file), str(cache_file))
-        print(f"✓ Solution cached to: {cache_file}")
+            np.savez_compressed(
+                f,
+                routes=np.concatenate(routes) if routes else np.zeros(0, dtype=np.int32),
+                offsets=offsets,
+                distances=np.array([dist for _, dist in result["all_routes"]], dtype=np.int64),
+                route_nodes=np.asarray(result["route_nodes"], dtype=np.int32),
+                meta=np.array(json.dumps(result.get("meta", {}))),
+            )
+        os.replace(temp_file, cache_file)
+        print(f"✓ Solution cached to: {cache_file} ({cache_file.stat().st_size / 1024:.1f} KB)")
     except Exception as e:
         print(f"✗ Cache save failed: {e}")
         if temp_file.exists():
             temp_file.unlink()
+        return
+    cache_evict(cache_dir, max_bytes, keep=(key,))
+
+def _read_cache_file(cache_file):
+    """Decode one npz cache entry."""
+    with np.load(cache_file, allow_pickle=False) as npz:
+        flat, offsets, distances = npz["routes"], npz["offsets"], npz["distances"]
+        all_routes = [(flat[offsets[i]:offsets[i + 1]].tolist(), int(distances[i]))
+                      for i in range(len(distances))]
+        return {
+            "all_routes": all_routes,
+            "route_nodes": npz["route_nodes"].tolist(),
+            "meta": json.loads(str(npz["meta"])),
+        }
 
 def cache_load(key, cache_dir="cache"):
     """Load cached result with error handling."""
-    cache_file = Path(cache_dir) / f"{key}.pkl"
+    cache_file = Path(cache_dir) / f"{key}.npz"
     if not cache_file.exists():
         return None
 
     try:
-        with open(cache_file, "rb") as f:
-            result = pickle.load(f)
+        result = _read_cache_file(cache_file)
+        os.utime(cache_file)  # mark as recently used for LRU eviction
         print(f"✓ Loaded cached solution from: {cache_file}")
         return result
-    except (EOFError, Exception) as e:
+    except Exception as e:
         print(f"✗ Corrupted cache detected ({e}). Deleting and re-solving...")
         try:
             cache_file.unlink()
-        except:
+        except OSError:
             pass
         return None
 
+def cache_evict(cache_dir="cache", max_bytes=CACHE_MAX_BYTES, keep=()):
+    """Delete least recently used entries until the cache fits in max_bytes.
+
+    Args:
+        keep: Keys that are never evicted, such as the entry just saved;
+            they still count towards max_bytes
+    """
+    files = list(Path(cache_dir).glob("*.npz"))
+    total = sum(f.stat().st_size for f in files)
+    entries = sorted((f for f in files if f.stem not in keep), key=lambda f: f.stat().st_mtime)
+    while entries and total > max_bytes:
+        oldest = entries.pop(0)
+        total -= oldest.stat().st_size
+        oldest.unlink()
+        print(f"✓ Evicted cached solution: {oldest.name}")
+
+def cache_find_near(data, cache_dir="cache", min_overlap=NEAR_MATCH_MIN_OVERLAP, solver_config=None):
+    """Find the cached solution whose waypoint set best overlaps the data model's.
+
+    Only entries for the same site and distance limit are considered, and
+    with solver_config only those solved with exactly that configuration.
+
+    Returns:
+        (key, result) of the best match with Jaccard overlap >= min_overlap, or (None, None)
+    """
+    current = set(int(n) for n in data["route_nodes"])
+    best_key, best_overlap = None, min_overlap
+    for cache_file in Path(cache_dir).glob("*.npz"):
+        try:
+            with np.load(cache_file, allow_pickle=False) as npz:
+                meta = json.loads(str(npz["meta"]))
+                if (meta.get("site_id") != data.get("site_id")
+                        or meta.get("max_distance") != data["max_distance"]):
+                    continue
+                if solver_config is not None and meta.get("solver_config") != solver_config:
+                    continue
+                nodes = set(npz["route_nodes"].tolist())
+        except Exception:
+            continue
+        overlap = len(current & nodes) / max(len(current | nodes), 1)
+        if overlap >= best_overlap:
+            best_key, best_overlap = cache_file.stem, overlap
+
+    if best_key is None:
+        return None, None
+    print(f"✓ Near-match cached solution '{best_key}' ({best_overlap:.0%} waypoint overlap)")
+    return best_key, cache_load(best_key, cache_dir)
+
 def clear_cache(cache_dir="cache"):
     """Delete all cached solutions."""
     cache_path = Path(cache_dir)
@@ -234,315 +1525,674 @@ def clear_cache(cache_dir="cache"):
         shutil.rmtree(cache_path)
         print(f"✓ Cache cleared: {cache_dir}")
 
-def create_data_model(subset_size=None):
-    """Stores data for the problem restricted to depot + photo waypoints.
-    
+# --- Benchmarks ---
+def benchmark_transit_evaluators(data, num_vehicles, time_limit_s=10):
+    """Compare the Python callback and native matrix transit evaluators.
+
+    Runs the same search with each evaluator for time_limit_s seconds and
+    reports model build time and search throughput. Local search iterations
+    are counted as accepted neighbors. For the matrix evaluator, the one-off
+    conversion of the matrix to Python lists is timed separately from the
+    build ("convert_s"), since later builds on the same data reuse it.
+
+    Returns:
+        Dict of stats per evaluator ("callback", "matrix")
+    """
+    results = {}
+    for transit in ("callback", "matrix"):
+        print(f"\nBenchmarking '{transit}' transit evaluator ({num_vehicles} vehicles, {time_limit_s} s)...")
+        convert_s = 0.0
+        if transit == "matrix":
+            data.pop("transit_matrix", None)
+            convert_start = time.perf_counter()
+            transit_matrix(data)
+            convert_s = time.perf_counter() - convert_start
+        build_start = time.perf_counter()
+        manager, routing, _ = build_routing_model(data, num_vehicles, transit=transit)
+        build_s = time.perf_counter() - build_start
+
+        solution = routing.SolveWithParameters(make_search_parameters(time_limit_s))
+        solver = routing.solver()
+        search_s = max(solver.WallTime() / 1000.0, 1e-9)
+        results[transit] = {
+            "convert_s": convert_s,
+            "build_s": build_s,
+            "search_s": search_s,
+            "branches": solver.Branches(),
+            "solutions": solver.Solutions(),
+            "accepted_neighbors": solver.AcceptedNeighbors(),
+            "branches_per_s": solver.Branches() / search_s,
+            "iterations_per_s": solver.AcceptedNeighbors() / search_s,
+            "objective": solution.ObjectiveValue() if solution else None,
+        }
+
+    print(f"\n=== Transit Evaluator Benchmark ({len(data['distance_matrix'])} nodes) ===")
+    print(f"{'':<10}{'convert s':>10}{'build s':>10}{'branches/s':>14}{'LS iters/s':>14}"
+          f"{'solutions':>11}{'objective':>12}")
+    for transit, r in results.items():
+        print(f"{transit:<10}{r['convert_s']:>10.2f}{r['build_s']:>10.2f}{r['branches_per_s']:>14.0f}"
+              f"{r['iterations_per_s']:>14.1f}{r['solutions']:>11}{str(r['objective']):>12}")
+    if results["callback"]["iterations_per_s"] > 0:
+        speedup = results["matrix"]["iterations_per_s"] / results["callback"]["iterations_per_s"]
+        print(f"Speedup (LS iterations/s): {speedup:.2f}x")
+    return results
+
+def benchmark_lod(mission_paths_file):
+    """Payload size and build time of the map geometry at each simplification level.
+
+    Builds the coordinates-only waypoint rows the dashboard requests from
+    /missions/<id> for every mission and level. Map render time scales with the
+    number of points drawn; the dashboard logs the actual Plotly render time per
+    redraw in development builds.
+
+    Returns:
+        List of dicts per level: tolerance_ft, waypoints, json_bytes, gzip_bytes, build_s
+    """
+    import gzip
+    from mission_format import LOD_TOLERANCES_FT, load_missions, lod_indices, mission_waypoints
+
+    bundle = load_missions(mission_paths_file)
+    fields = ("waypoint_index", "longitude", "latitude")
+    results = []
+    for tolerance in LOD_TOLERANCES_FT:
+        build_start = time.perf_counter()
+        missions = [mission_waypoints(bundle, i, lod_indices(bundle, i, tolerance), fields)
+                    for i in range(len(bundle["total_distance_ft"]))]
+        payload = json.dumps(missions, separators=(",", ":")).encode()
+        build_s = time.perf_counter() - build_start
+        results.append({
+            "tolerance_ft": tolerance,
+            "waypoints": sum(len(m) for m in missions),
+            "json_bytes": len(payload),
+            "gzip_bytes": len(gzip.compress(payload, 6)),
+            "build_s": build_s,
+        })
+
+    print(f"\n=== Level-of-Detail Benchmark ({len(bundle['total_distance_ft'])} missions) ===")
+    print(f"{'tolerance ft':>12}{'waypoints':>11}{'JSON KB':>10}{'gzip KB':>10}{'build ms':>10}")
+    for r in results:
+        print(f"{r['tolerance_ft']:>12.0f}{r['waypoints']:>11}{r['json_bytes'] / 1024:>10.1f}"
+              f"{r['gzip_bytes'] / 1024:>10.1f}{r['build_s'] * 1000:>10.1f}")
+    return results
+
+def solve_fleet(data, max_vehicles, per_attempt_time_s, fleet_search="bracket",
+                workers=1, parallel_mode="counts", parallel_pick="first",
+                min_vehicles=None, progress=None, on_solution=None, early_stop=None,
+                solver_options=None, portfolio=None, portfolio_history=None, deadline=None):
+    """Monolithic solve: fleet-size search over the whole data model.
+
     Args:
-        subset_size: If provided, use only first subset_size photo waypoints (for testing)
+        parallel_mode: With workers > 1, "counts", "strategies" or "portfolio"
+            (race the portfolio entries for every probe, see race_portfolio)
+        min_vehicles: Optional lower bound of the search; the estimate is used if higher
+        progress / on_solution: Optional callables(dict), see search_fleet_size;
+            on_solution only sees serial solves (workers=1)
+        early_stop: Optional early termination rules (see solve_with_vehicles)
+        solver_options: Optional first_solution_strategy / metaheuristic of
+            serial and "counts" solves
+        portfolio / portfolio_history: Entries and history file of "portfolio" mode
+        deadline: Optional time.perf_counter() value the search must end by (see search_fleet_size)
+
+    Returns:
+        (all_routes, probes); all_routes is None if nothing feasible was found
     """
-    data = {}
+    est_min = estimate_min_vehicles(data["distance_matrix"], data["max_distance"])
+    print(f"Estimated minimum vehicles required: {est_min}")
+    if min_vehicles is not None and min_vehicles > est_min:
+        est_min = min_vehicles
+        print(f"Starting the fleet search at {est_min} vehicles")
 
-    # Generate all photo node indices from the range
-    # Check if photo_indexes[1] is within valid bounds
-    max_valid_index = distance_matrix.shape[0] - 1
-    end_index = min(photo_indexes[1], max_valid_index)
-    
-    # If photo_indexes[1] equals the array size, it's likely exclusive end
-    if photo_indexes[1] == distance_matrix.shape[0]:
-        photo_nodes = np.arange(photo_indexes[0], photo_indexes[1])
-    else:
-        # Otherwise it's inclusive end
-        photo_nodes = np.arange(photo_indexes[0], end_index + 1)
-    
-    # Apply subset if requested
-    if subset_size is not None and subset_size < len(photo_nodes):
-        photo_nodes = photo_nodes[:subset_size]
-        print(f"Using subset of {subset_size} photo waypoints for testing")
+    if workers > 1 and parallel_mode == "counts":
+        return search_fleet_size_parallel(
+            data, est_min, max_vehicles, per_attempt_time_s, workers, pick=parallel_pick,
+            progress=progress, early_stop=early_stop, solver_options=solver_options, deadline=deadline)
+    if workers > 1 and parallel_mode == "portfolio":
+        with ParallelSolver(data, workers, early_stop) as solver:
+            return search_fleet_size(
+                data, est_min, max_vehicles, per_attempt_time_s, mode=fleet_search,
+                solve_attempt=race_portfolio(solver, per_attempt_time_s, portfolio or PORTFOLIO,
+                                             portfolio_history, data),
+                progress=progress, deadline=deadline)
+    if workers > 1 and parallel_mode == "strategies":
+        with ParallelSolver(data, workers, early_stop) as solver:
+            return search_fleet_size(
+                data, est_min, max_vehicles, per_attempt_time_s, mode=fleet_search,
+                solve_attempt=race_strategies(solver, per_attempt_time_s, pick=parallel_pick),
+                progress=progress, deadline=deadline)
+    return search_fleet_size(data, est_min, max_vehicles, per_attempt_time_s, mode=fleet_search,
+                             progress=progress, on_solution=on_solution, early_stop=early_stop,
+                             solver_options=solver_options, deadline=deadline)
 
-    # Include depot (index 0) + photo waypoints
-    route_nodes = np.concatenate(([0], photo_nodes))
+# --- Export ---
+EXPORT_FORMATS = ("json", "npz")
+EXPORT_MANIFEST = "export_manifest.json"
 
-    # Restrict distance matrix to these nodes
-    sub_distance_matrix = distance_matrix[np.ix_(route_nodes, route_nodes)].astype(np.int32)
-    data["distance_matrix"] = sub_distance_matrix
-    data["num_waypoints"] = len(route_nodes)
+def write_export_manifest(output_dir, files, write_time_s, cache_key=None):
+    """Record the files of an export with their sizes and write times.
 
-    # Depot is still first node
-    data["depot"] = 0
-    data["max_distance"] = int(max_distance_per_trip)
+    The generation counter increases with every export into output_dir, so
+    readers can tell that the files changed without comparing their contents.
+    cache_key, when known, identifies the solution the files were built from.
+    """
+    manifest_file = Path(output_dir) / EXPORT_MANIFEST
+    try:
+        generation = json.loads(manifest_file.read_text()).get("generation", 0) + 1
+    except (FileNotFoundError, ValueError):
+        generation = 1
+    manifest = {
+        "generation": generation,
+        "exported_at": time.time(),
+        "write_time_s": round(write_time_s, 4),
+        "files": files,
+    }
+    if cache_key is not None:
+        manifest["cache_key"] = cache_key
+    temp_file = manifest_file.with_name(manifest_file.name + ".tmp")
+    temp_file.write_text(json.dumps(manifest, indent=2))
+    os.replace(temp_file, manifest_file)
+    return manifest
 
-    # Save points coordinates for plotting (subset coordinates)
-    data["points_lat_long"] = points_lat_long[route_nodes]
+# --- Optimizer API ---
+def _solution_label(subset_size):
+    """Cache key prefix of a solve of the full photo set or a subset."""
+    return f"solution_subset_{subset_size}" if subset_size is not None else "solution_full"
 
-    # Map local indices back to original indices
-    data["index_map"] = {local: global_ for local, global_ in enumerate(route_nodes)}
+class DroneOptimizer:
+    """Route optimizer for one site: the input arrays of data_dir plus solve/export/plot.
 
-    return data
+    Input files are only opened on first use, and the distance and
+    predecessor matrices are memory-mapped.
 
-def export_mission_data(all_routes, data, output_dir="output"):
-    """Export complete mission data in JSON format.
-    
-    Returns 4 JSON files:
-    1. photo_points.json - All photo waypoint locations
-    2. asset_points.json - All asset locations
-    3. polygon_boundary.json - Flight boundary as coordinate array
-    4. mission_paths.json - All drone routes with full waypoint sequences
-    
     Args:
-        all_routes: List of (route, distance) tuples from solver
-        data: Data model containing index_map
-        output_dir: Directory to save JSON files
+        data_dir: Directory holding the .npy inputs and polygon_lon_lat.wkt
+        max_distance_per_trip: Per-mission distance limit in feet
+        cache_dir: Solution cache directory (default: <data_dir>/cache)
+        output_dir: Export directory (default: <data_dir>/output)
     """
-    import json
-    from pathlib import Path
-    
-    # Create output directory
-    Path(output_dir).mkdir(exist_ok=True)
-    
-    # ============================================
-    # 1. PHOTO POINTS JSON
-    # ============================================
-    photo_points = []
-    photo_start = photo_indexes[0]
-    photo_end = photo_indexes[1]
-    
-    # Handle exclusive vs inclusive end index
-    if photo_end == distance_matrix.shape[0]:
-        photo_range = range(photo_start, photo_end)
-    else:
-        photo_range = range(photo_start, photo_end + 1)
-    
-    for idx in photo_range:
-        if idx < len(points_lat_long):
-            lon, lat = points_lat_long[idx]
-            photo_points.append({
-                "waypoint_index": int(idx),
-                "longitude": float(lon),
-                "latitude": float(lat),
-                "type": "photo"
-            })
-    
-    with open(f"{output_dir}/photo_points.json", 'w') as f:
-        json.dump({
-            "type": "photo_waypoints",
-            "count": len(photo_points),
-            "points": photo_points
-        }, f, indent=2)
-    
-    print(f"✓ Photo points exported: {len(photo_points)} points")
-    
-    # ============================================
-    # 2. ASSET POINTS JSON
-    # ============================================
-    asset_points = []
-    asset_start = asset_indexes[0]
-    asset_end = asset_indexes[1]
-    
-    for idx in range(asset_start, min(asset_end + 1, len(points_lat_long))):
-        lon, lat = points_lat_long[idx]
-        asset_points.append({
-            "asset_index": int(idx),
-            "longitude": float(lon),
-            "latitude": float(lat),
-            "type": "asset"
-        })
-    
-    with open(f"{output_dir}/asset_points.json", 'w') as f:
-        json.dump({
-            "type": "electrical_assets",
-            "count": len(asset_points),
-            "points": asset_points
-        }, f, indent=2)
-    
-    print(f"✓ Asset points exported: {len(asset_points)} points")
-    
-    # ============================================
-    # 3. POLYGON BOUNDARY JSON
-    # ============================================
-    polygon_coords = []
-    
-    if POLYGON is not None:
-        # Extract coordinates from the polygon
-        # Handle both Polygon and MultiPolygon
-        from shapely.geometry import Polygon, MultiPolygon
-        
-        if isinstance(POLYGON, Polygon):
-            # Single polygon - get exterior coordinates
-            coords = list(POLYGON.exterior.coords)
-            polygon_coords = [[float(lon), float(lat)] for lon, lat in coords]
-        elif isinstance(POLYGON, MultiPolygon):
-            # Multiple polygons - include all parts
-            for poly in POLYGON.geoms:
-                coords = list(poly.exterior.coords)
-                polygon_coords.append([[float(lon), float(lat)] for lon, lat in coords])
-    
-    with open(f"{output_dir}/polygon_boundary.json", 'w') as f:
-        json.dump({
-            "type": "flight_boundary",
-            "coordinate_system": "EPSG:4326",
-            "coordinates": polygon_coords,
-            "note": "Coordinates in [longitude, latitude] format"
-        }, f, indent=2)
+
+    def __init__(self, data_dir=".", max_distance_per_trip=DEFAULT_MAX_DISTANCE_PER_TRIP,
+                 cache_dir=None, output_dir=None):
+        self.data_dir = Path(data_dir)
+        self.max_distance_per_trip = max_distance_per_trip
+        self.cache_dir = Path(cache_dir) if cache_dir else self.data_dir / "cache"
+        self.output_dir = Path(output_dir) if output_dir else self.data_dir / "output"
+        self.data = None
+        self.all_routes = None
+        self.from_cache = False
+        self.cache_key = None
+        self.path_cache = PathCache()
+        self._expanded = None
+
+    # --- Input data (loaded on first access) ---
+    @functools.cached_property
+    def distance_matrix(self):
+        return load_array(self.data_dir, "distance_matrix")
+
+    @functools.cached_property
+    def segment_distance_matrix(self):
+        """Distances for the export: the float distance_matrix.npy when it exists.
+
+        The compact store holds whole feet, which is all the solver needs,
+        but the exported segment distances keep the preprocessed precision.
+        """
+        source = self.data_dir / "distance_matrix.npy"
+        if isinstance(self.distance_matrix, np.ndarray) or not source.exists():
+            return self.distance_matrix
+        return np.load(source, mmap_mode="r")
+
+    @functools.cached_property
+    def predecessors(self):
+        return load_array(self.data_dir, "predecessors")
+
+    @functools.cached_property
+    def points_lat_long(self):
+        return load_array(self.data_dir, "points_lat_long")
+
+    @functools.cached_property
+    def asset_indexes(self):
+        return load_array(self.data_dir, "asset_indexes")
+
+    @functools.cached_property
+    def photo_indexes(self):
+        return load_array(self.data_dir, "photo_indexes")
+
+    @functools.cached_property
+    def waypoint_indexes(self):
+        return load_array(self.data_dir, "waypoint_indexes")
+
+    @functools.cached_property
+    def polygon(self):
+        return load_polygon(self.data_dir / "polygon_lon_lat.wkt")
+
+    @functools.cached_property
+    def geofence(self):
+        """The polygon prepared for route validation, or None without a polygon."""
+        return Geofence(self.polygon) if self.polygon is not None else None
+
+    @property
+    def portfolio_history(self):
+        """Winners of portfolio races on this site (see learned_default)."""
+        return self.cache_dir / PORTFOLIO_HISTORY
+
+    @property
+    def num_navigable(self):
+        return self.distance_matrix.shape[0]
+
+    def describe(self):
+        """Print the shapes and index ranges of the input data."""
+        print("=== Loading Data ===")
+        print(f"distance_matrix: {self.distance_matrix.shape}")
+        print(f"asset_indexes: {self.asset_indexes}")
+        print(f"photo_indexes: {self.photo_indexes}")
+        print(f"points_lat_long: {self.points_lat_long.shape}")
+        print(f"predecessors: {self.predecessors.shape}")
+        print(f"waypoint_indexes: {self.waypoint_indexes}")
+
+        num_assets = self.asset_indexes[1] - self.asset_indexes[0] + 1
+        num_photos = self.photo_indexes[1] - self.photo_indexes[0] + 1
+        print(f"\n=== Data Structure ===")
+        print(f"Total points in coordinate list: {self.points_lat_long.shape[0]}")
+        print(f"Navigable waypoints (in distance matrix): {self.num_navigable}")
+        print(f"Photo waypoints: {num_photos} (indices {self.photo_indexes[0]} to {self.photo_indexes[1]})")
+        print(f"Asset points: {num_assets} (indices {self.asset_indexes[0]} to {self.asset_indexes[1]})")
+        print(f"Note: Assets are NOT in distance matrix - they're reference points only")
+
+    @timed("create_data_model")
+    def create_data_model(self, subset_size=None, add_nodes=None, remove_nodes=None):
+        """Stores data for the problem restricted to depot + photo waypoints.
     
-    print(f"✓ Polygon boundary exported")
+        Args:
+            subset_size: If provided, use only first subset_size photo waypoints (for testing)
+            add_nodes: Extra global waypoint indices to visit
+            remove_nodes: Global photo waypoint indices to drop
+        """
+        data = {}
+
+        # Generate all photo node indices from the range
+        # Check if photo_indexes[1] is within valid bounds
+        max_valid_index = self.distance_matrix.shape[0] - 1
+        end_index = min(self.photo_indexes[1], max_valid_index)
     
-    # ============================================
-    # 4. MISSION PATHS JSON
-    # ============================================
-    missions = []
+        # If photo_indexes[1] equals the array size, it's likely exclusive end
+        if self.photo_indexes[1] == self.distance_matrix.shape[0]:
+            photo_nodes = np.arange(self.photo_indexes[0], self.photo_indexes[1])
+        else:
+            # Otherwise it's inclusive end
+            photo_nodes = np.arange(self.photo_indexes[0], end_index + 1)
     
-    for vehicle_id, (route, total_dist) in enumerate(all_routes):
-        # Expand route to include all intermediate waypoints
-        expanded = expand_route_with_paths(route, predecessors, data["index_map"])
-        coords = points_lat_long[expanded]
-        
-        # Build waypoint sequence
-        waypoints = []
-        cumulative_dist = 0
-        
-        for seq in range(len(expanded)):
-            wp_idx = expanded[seq]
-            lon, lat = coords[seq]
-            
-            # Calculate segment distance
-            if seq < len(expanded) - 1:
-                wp_current = expanded[seq]
-                wp_next = expanded[seq + 1]
-                
-                # Check if both waypoints are in the navigable range
-                if wp_current < distance_matrix.shape[0] and wp_next < distance_matrix.shape[0]:
-                    segment_dist = distance_matrix[wp_current][wp_next]
-                else:
-                    # For non-navigable waypoints (like assets), estimate from coordinates
-                    coord_current = points_lat_long[wp_current]
-                    coord_next = points_lat_long[wp_next]
-                    # Simple Euclidean distance (you could use haversine for better accuracy)
-                    dx = (coord_next[0] - coord_current[0]) * 364000  # rough lon to feet
-                    dy = (coord_next[1] - coord_current[1]) * 364000  # rough lat to feet
-                    segment_dist = int(np.sqrt(dx**2 + dy**2))
-            else:
-                segment_dist = 0
-
-            cumulative_dist += segment_dist            
-            # Determine waypoint type
-            if wp_idx == 0:
-                wp_type = "depot"
-            elif photo_indexes[0] <= wp_idx <= photo_indexes[1]:
-                wp_type = "photo"
-            elif asset_indexes[0] <= wp_idx <= asset_indexes[1]:
-                wp_type = "asset"
+        # Apply subset if requested
+        if subset_size is not None and subset_size < len(photo_nodes):
+            photo_nodes = photo_nodes[:subset_size]
+            print(f"Using subset of {subset_size} photo waypoints for testing")
+
+        # Apply waypoint edits
+        if remove_nodes is not None and len(remove_nodes):
+            photo_nodes = photo_nodes[~np.isin(photo_nodes, remove_nodes)]
+        if add_nodes is not None and len(add_nodes):
+            add_nodes = np.asarray(add_nodes, dtype=photo_nodes.dtype)
+            if add_nodes.max() > max_valid_index:
+                raise ValueError(f"Added waypoints must be navigable (index <= {max_valid_index})")
+            photo_nodes = np.concatenate((photo_nodes, add_nodes[~np.isin(add_nodes, photo_nodes)]))
+
+        # Include depot (index 0) + photo waypoints
+        route_nodes = np.concatenate(([0], photo_nodes))
+
+        # Restrict distance matrix to these nodes; on the memmap this only reads
+        # the selected rows, and only the selected columns are copied out
+        sub_distance_matrix = self.distance_matrix[np.ix_(route_nodes, route_nodes)].astype(np.int32)
+        data["distance_matrix"] = sub_distance_matrix
+        data["num_waypoints"] = len(route_nodes)
+
+        # Depot is still first node
+        data["depot"] = 0
+        data["max_distance"] = int(self.max_distance_per_trip)
+
+        # Save points coordinates for plotting (subset coordinates)
+        data["points_lat_long"] = self.points_lat_long[route_nodes]
+
+        # Map local indices back to original indices
+        data["route_nodes"] = route_nodes
+        data["site_id"] = hashlib.sha1(np.ascontiguousarray(self.points_lat_long).tobytes()).hexdigest()[:16]
+        data["index_map"] = {local: global_ for local, global_ in enumerate(route_nodes)}
+
+        return data
+
+    def expanded_routes(self, all_routes=None, data=None):
+        """Expanded GLOBAL waypoint paths of a solution, computed once per solution.
+
+        Returns:
+            (flat, offsets) as returned by expand_routes(); mission i is
+            flat[offsets[i]:offsets[i + 1]]
+        """
+        all_routes = self.all_routes if all_routes is None else all_routes
+        data = self.data if data is None else data
+        if self._expanded is not None and self._expanded[0] is all_routes and self._expanded[1] is data:
+            return self._expanded[2]
+        with stage("path_expansion"):
+            expanded = expand_routes([route for route, _ in all_routes], self.predecessors,
+                                     data["index_map"], self.path_cache)
+        self._expanded = (all_routes, data, expanded)
+        return expanded
+
+    def validate_geofence(self, all_routes=None, data=None):
+        """Check that every segment of the expanded missions stays inside the polygon.
+
+        Returns:
+            Report dict (see geofence.Geofence.check), or None without a polygon
+        """
+        if self.geofence is None:
+            return None
+        expanded, offsets = self.expanded_routes(all_routes, data)
+        coords = self.points_lat_long[expanded]
+        with stage("geofence"):
+            return self.geofence.check(coords[:, 0], coords[:, 1], offsets)
+
+    def prepare_solve(self, subset_size=None, max_vehicles=60, per_attempt_time_s=30,
+                      fleet_search="bracket", workers=1, parallel_mode="counts", parallel_pick="first",
+                      decompose=None, num_partitions=None, add_nodes=None, remove_nodes=None,
+                      min_vehicles=None, early_stop=None, strategy=None, metaheuristic=None,
+                      portfolio=None, time_budget_s=None):
+        """Data model and solution cache keys of a solve() call, without solving.
+
+        strategy="learned" is resolved here from the portfolio history, so
+        solver_config holds the strategy and metaheuristic actually used.
+
+        Returns:
+            (data, solver_config, cache_key, base_cache_key); base_cache_key is
+            the key of the same solve without decomposition
+        """
+        data = self.create_data_model(subset_size=subset_size, add_nodes=add_nodes, remove_nodes=remove_nodes)
+        label = _solution_label(subset_size)
+
+        # Everything that changes the resulting plan goes into the cache key
+        solver_config = {
+            "max_vehicles": max_vehicles,
+            "per_attempt_time_s": per_attempt_time_s,
+            "fleet_search": fleet_search,
+            "parallel_mode": parallel_mode if workers > 1 else None,
+            "parallel_pick": parallel_pick if workers > 1 else None,
+            "decompose": decompose,
+            "num_partitions": num_partitions,
+        }
+        # Only when set, so keys of earlier solves stay valid
+        if min_vehicles is not None:
+            solver_config["min_vehicles"] = min_vehicles
+        if time_budget_s is not None:
+            solver_config["time_budget_s"] = time_budget_s
+        if early_stop:
+            solver_config["early_stop"] = dict(sorted(early_stop.items()))
+        if strategy == "learned":
+            learned = learned_default(self.portfolio_history, len(data["distance_matrix"]))
+            if learned is None:
+                print("⚠ No portfolio history yet, using the default strategy")
+                strategy = None
             else:
-                wp_type = "intermediate"
-            
-            waypoints.append({
-                "sequence": seq,
-                "waypoint_index": int(wp_idx),
-                "longitude": float(lon),
-                "latitude": float(lat),
-                "waypoint_type": wp_type,
-                "segment_distance_ft": float(segment_dist),
-                "cumulative_distance_ft": float(cumulative_dist)
-            })
-        
-        # Calculate statistics
-        photo_count = sum(1 for wp in waypoints if wp["waypoint_type"] == "photo")
-        
-        missions.append({
-            "mission_id": vehicle_id + 1,
-            "total_distance_ft": float(total_dist),
-            "total_distance_km": float(total_dist) / 3280.84,
-            "total_distance_miles": float(total_dist) / 5280.0,
-            "num_waypoints": len(waypoints),
-            "num_photo_points": photo_count,
-            "depot_index": 0,
-            "waypoints": waypoints
-        })
-    
-    # Summary statistics
-    summary = {
-        "total_missions": len(missions),
-        "total_distance_ft": sum(m["total_distance_ft"] for m in missions),
-        "total_distance_km": sum(m["total_distance_km"] for m in missions),
-        "total_distance_miles": sum(m["total_distance_miles"] for m in missions),  
-        "total_waypoints": sum(m["num_waypoints"] for m in missions),
-        "total_photo_points_visited": sum(m["num_photo_points"] for m in missions),
-        "max_distance_per_mission_ft": max_distance_per_trip,
-        "depot_coordinates": {
-            "longitude": float(points_lat_long[0][0]),
-            "latitude": float(points_lat_long[0][1])
+                print(f"✓ Learned strategy: {learned['strategy']} + {learned['metaheuristic']} "
+                      f"({learned['wins']} of {learned['races']} races)")
+                strategy, metaheuristic = learned["strategy"], metaheuristic or learned["metaheuristic"]
+        if strategy not in (None, DEFAULT_FIRST_SOLUTION_STRATEGY):
+            solver_config["strategy"] = strategy
+        if metaheuristic not in (None, DEFAULT_METAHEURISTIC):
+            solver_config["metaheuristic"] = metaheuristic
+        if workers > 1 and parallel_mode == "portfolio":
+            solver_config["portfolio"] = portfolio or PORTFOLIO
+        cache_key = solution_cache_key(label, data, solver_config)
+        base_cache_key = solution_cache_key(
+            label, data, {**solver_config, "decompose": None, "num_partitions": None})
+        return data, solver_config, cache_key, base_cache_key
+
+    @timed("solve")
+    def solve(self, subset_size=None, max_vehicles=60, per_attempt_time_s=30,
+              fleet_search="bracket", workers=1, parallel_mode="counts", parallel_pick="first",
+              decompose=None, num_partitions=None, compare_monolithic=False,
+              incremental_from=None, add_nodes=None, remove_nodes=None, repair_time_s=10,
+              warm_start=True, min_vehicles=None, progress=None, on_solution=None,
+              early_stop=None, strategy=None, metaheuristic=None, portfolio=None, time_budget_s=None,
+              deadline=None):
+        """Searches for the smallest feasible number of vehicles, using the cache when possible.
+
+        Args:
+            subset_size: If provided, use only the first subset_size photo waypoints
+            fleet_search: "bracket" (exponential probe + bisection) or "linear"
+                (try every count from the estimate upwards)
+            workers: Number of solver processes; 1 solves serially
+            parallel_mode: With workers > 1, "counts" solves several vehicle counts
+                at once, "strategies" races first-solution strategies and seeds for
+                each count probed by fleet_search, "portfolio" races the portfolio
+                entries and records the winners (see race_portfolio)
+            parallel_pick: "first" feasible result or "best" (fewest vehicles, lowest cost)
+            decompose: None for a single VRP, or "sweep"/"kmeans" to solve spatial
+                partitions in parallel and stitch them together
+            num_partitions: Partition count for decompose (default: one per ~500 waypoints)
+            compare_monolithic: With decompose, also report the gap against the
+                monolithic solution (cached, or solved on the spot)
+            incremental_from: Cache key of a previous solution to repair instead of
+                solving from scratch when the current key misses. Repairs keep
+                the previous fleet size and are cached under a repair key of
+                their own (see self.cache_key), never the requested key
+            add_nodes / remove_nodes: Global waypoint indices added to / dropped from the photo set
+            repair_time_s: Time budget of the incremental repair solve
+            warm_start: On a cache miss, repair the closest cached solution for the
+                same site and solver configuration (see cache_find_near) instead
+                of solving from scratch; cached like incremental_from repairs
+            min_vehicles: Lower bound of the fleet search, if above the estimate
+            progress: Optional callable(dict) receiving the solve stage and the
+                fleet search progress (see search_fleet_size)
+            on_solution: Optional callable(dict) receiving every improving solution
+                of serial solves, e.g. a SolverLog
+            early_stop: Optional dict of early termination rules for every solve
+                attempt: plateau_window_s, plateau_min_improvement and
+                first_solution_timeout_s (see solve_with_vehicles)
+            strategy / metaheuristic: OR-Tools FirstSolutionStrategy and
+                LocalSearchMetaheuristic names of serial and "counts" solves;
+                strategy="learned" picks the pair that won most portfolio races
+                for this problem size
+            portfolio: Entries raced in "portfolio" mode (default PORTFOLIO)
+            time_budget_s: Optional wall time limit of the whole solve. Repair and
+                fleet search attempts are cut to the time left, and the search
+                stops with its best plan so far when it runs out (see
+                search_fleet_size); decomposed solves are not limited
+            deadline: Optional time.perf_counter() value the solve must end by,
+                instead of time_budget_s from now. Not part of the cache key, so
+                a caller that spent part of its budget already passes the time
+                left here and keeps time_budget_s at the configured value
+
+        Returns:
+            List of (route, distance) tuples, or None if no feasible solution was found
+        """
+        if deadline is None and time_budget_s is not None:
+            deadline = time.perf_counter() + time_budget_s
+        report = progress or (lambda update: None)
+        data, solver_config, cache_key, base_cache_key = self.prepare_solve(
+            subset_size, max_vehicles, per_attempt_time_s, fleet_search, workers, parallel_mode,
+            parallel_pick, decompose, num_partitions, add_nodes, remove_nodes, min_vehicles, early_stop,
+            strategy, metaheuristic, portfolio, time_budget_s)
+        self.data, self.all_routes, self.from_cache = data, None, False
+        self.cache_key = cache_key
+        fleet_options = {
+            "solver_options": {
+                "first_solution_strategy": solver_config.get("strategy", DEFAULT_FIRST_SOLUTION_STRATEGY),
+                "metaheuristic": solver_config.get("metaheuristic", DEFAULT_METAHEURISTIC),
+            },
+            "portfolio": solver_config.get("portfolio"),
+            "portfolio_history": self.portfolio_history,
+            "min_vehicles": min_vehicles,
+            "early_stop": early_stop,
+            "deadline": deadline,
         }
-    }
-    
-    with open(f"{output_dir}/mission_paths.json", 'w') as f:
-        json.dump({
-            "type": "drone_mission_paths",
-            "summary": summary,
-            "missions": missions
-        }, f, indent=2)
-    
-    print(f"✓ Mission paths exported: {len(missions)} missions")
-    
-    # ============================================
-    # SUMMARY
-    # ============================================
-    print(f"\n{'='*50}")
-    print(f"EXPORT COMPLETE - All files saved to '{output_dir}/'")
-    print(f"{'='*50}")
-    print(f"  1. photo_points.json      - {len(photo_points)} photo waypoints")
-    print(f"  2. asset_points.json      - {len(asset_points)} electrical assets")
-    print(f"  3. polygon_boundary.json  - Flight boundary coordinates")
-    print(f"  4. mission_paths.json     - {len(missions)} drone missions")
-    print(f"{'='*50}")
-    print(f"Total distance: {summary['total_distance_km']:.2f} km ({summary['total_distance_miles']:.2f} miles)")
-    print(f"Total waypoints: {summary['total_waypoints']}")
-    print(f"{'='*50}\n")
-    
-    return {
-        "photo_points": photo_points,
-        "asset_points": asset_points,
-        "polygon_coords": polygon_coords,
-        "missions": missions,
-        "summary": summary
-    }
 
-def main(use_subset=False, subset_size=500, max_vehicles=60, per_attempt_time_s=30):
-    """Iteratively increases the number of vehicles until a feasible solution is found."""
-    
-    # Create data model with optional subset
-    if use_subset:
-        data = create_data_model(subset_size=subset_size)
-        cache_key = f"solution_subset_{subset_size}"
-    else:
-        data = create_data_model(subset_size=None)
-        cache_key = "solution_full"
-    
-    # Try to load cached solution
-    cached_result = cache_load(cache_key)
-    if cached_result is not None:
-        print("Using cached solution!")
-        all_routes = cached_result
-        
-        # Visualize cached solution
+        # Try to load cached solution
+        cached_result = cache_load(cache_key, self.cache_dir)
+        if cached_result is not None:
+            print("Using cached solution!")
+            report({"stage": "cached"})
+            self.all_routes, self.from_cache = cached_result["all_routes"], True
+            return self.all_routes
+
+        # Repair an explicit previous plan, or the closest cached plan solved with
+        # the same configuration. A repair keeps the old plan's fleet size and
+        # never runs this configuration's fleet search, so it is cached under a
+        # repair key of its own and the requested key is left to a real solve
+        previous, previous_key = None, incremental_from
+        if incremental_from:
+            previous = cache_load(incremental_from, self.cache_dir)
+            if previous is None:
+                print(f"⚠ No cached solution '{incremental_from}', solving from scratch")
+        elif warm_start:
+            previous_key, previous = cache_find_near(data, self.cache_dir, solver_config=solver_config)
+
+        save_key, save_config = cache_key, solver_config
+        if previous is not None:
+            save_config = {"repair_of": previous_key, "repair_time_s": repair_time_s}
+            save_key = solution_cache_key(_solution_label(subset_size), data, save_config)
+            cached_repair = cache_load(save_key, self.cache_dir)
+            if cached_repair is not None:
+                print(f"Using cached repair of '{previous_key}'!")
+                report({"stage": "cached"})
+                self.cache_key = save_key
+                self.all_routes, self.from_cache = cached_repair["all_routes"], True
+                return self.all_routes
+            print(f"Repairing '{previous_key}'; the plan is cached as '{save_key}'")
+
+        all_routes = None
+        if previous is not None:
+            report({"stage": "repairing"})
+            all_routes, _ = reoptimize_incremental(
+                data, previous["all_routes"], previous["route_nodes"],
+                attempt_time_left(repair_time_s, deadline) or MIN_ATTEMPT_TIME_S,
+                on_solution=on_solution, early_stop=early_stop)
+            if all_routes is None:
+                print("⚠ Warm start could not be repaired, solving from scratch")
+                save_key, save_config = cache_key, solver_config
+
+        if all_routes is None and decompose:
+            num_partitions = num_partitions or max(workers, math.ceil((data["num_waypoints"] - 1) / 500))
+            report({"stage": "decomposing"})
+            all_routes, stats = solve_decomposed(
+                data, num_partitions, max_vehicles, per_attempt_time_s, method=decompose,
+                workers=workers if workers > 1 else None, early_stop=early_stop)
+
+            baseline = None
+            if compare_monolithic and all_routes is not None:
+                baseline_routes, baseline_time = None, None
+                cached_baseline = cache_load(base_cache_key, self.cache_dir)
+                if cached_baseline is not None:
+                    baseline_routes = cached_baseline["all_routes"]
+                if baseline_routes is None:
+                    print("\nRunning monolithic solve for comparison...")
+                    baseline_start = time.perf_counter()
+                    baseline_routes, _ = solve_fleet(
+                        data, max_vehicles, per_attempt_time_s, fleet_search,
+                        workers, parallel_mode, parallel_pick, **fleet_options)
+                    baseline_time = time.perf_counter() - baseline_start
+                if baseline_routes is not None:
+                    baseline = {**route_set_stats(baseline_routes), "wall_time_s": baseline_time}
+            print_decomposition_report(stats, baseline)
+        elif all_routes is None:
+            report({"stage": "solving"})
+            search_start = time.perf_counter()
+            all_routes, probes = solve_fleet(
+                data, max_vehicles, per_attempt_time_s, fleet_search,
+                workers, parallel_mode, parallel_pick, progress=progress,
+                on_solution=on_solution, **fleet_options)
+            print_probe_report(probes, time.perf_counter() - search_start)
+
+        if all_routes is None:
+            print(f"\n No feasible solution found up to {max_vehicles} vehicles.")
+            return None
+
+        num_vehicles = len(all_routes)
+        data["num_vehicles"] = num_vehicles
+        print(f" Feasible solution found with {num_vehicles} vehicles.")
+        for vehicle_id, (route, route_distance) in enumerate(all_routes):
+            print(f"  Route #{vehicle_id + 1}: {len(route)} waypoints, {route_distance:.1f} m")
+
+        # Cache the solution
+        self.cache_key = save_key
+        cache_save(save_key, {
+            "all_routes": all_routes,
+            "route_nodes": data["route_nodes"],
+            "meta": {
+                "site_id": data["site_id"],
+                "max_distance": data["max_distance"],
+                "solver_config": save_config,
+                **route_set_stats(all_routes),
+            },
+        }, self.cache_dir)
+
+        self.all_routes = all_routes
+        return all_routes
+
+    def clear_cache(self):
+        """Delete all cached solutions of this site."""
+        clear_cache(self.cache_dir)
+
+    # --- Plotting (matplotlib/geopandas are only imported here) ---
+    def _plot_polygon_on_ax(self, ax):
+        """Helper to plot polygon boundary on an existing axis."""
+        import geopandas as gpd
+
+        if self.polygon is not None:
+            gdf_poly = gpd.GeoDataFrame(geometry=[self.polygon], crs="EPSG:4326")
+            gdf_poly.boundary.plot(ax=ax, color='blue', linewidth=2, label='Boundary', zorder=1)
+
+    def plot_problem(self):
+        """Plot the flight boundary, navigable waypoints and assets."""
+        import matplotlib.pyplot as plt
+
         try:
+            navigable_coords = self.points_lat_long[:self.num_navigable]
+            asset_coords = self.points_lat_long[self.asset_indexes[0]:self.asset_indexes[1]+1]
+            num_assets = self.asset_indexes[1] - self.asset_indexes[0] + 1
+
             fig, ax = plt.subplots(figsize=(12, 10))
-            plot_polygon_on_ax(ax, POLYGON)
+
+            # Plot polygon boundary
+            self._plot_polygon_on_ax(ax)
+
+            # Plot navigable waypoints and assets
+            ax.scatter(navigable_coords[:, 0], navigable_coords[:, 1],
+                       c='red', s=10, alpha=0.5, label=f'Navigable waypoints ({self.num_navigable})')
+            ax.scatter(asset_coords[:, 0], asset_coords[:, 1],
+                       c='green', s=50, marker='s', alpha=0.7, label=f'Assets ({num_assets})')
+
+            ax.set_xlabel('Longitude')
+            ax.set_ylabel('Latitude')
+            ax.set_title('Drone Inspection Area')
+            ax.legend()
+            ax.grid(True, alpha=0.3)
+            plt.tight_layout()
+            plt.show()
+        except Exception as e:
+            print(f"Visualization error: {e}")
+
+    def plot(self, all_routes=None, data=None):
+        """Plot every mission route, expanded with intermediate waypoints."""
+        import matplotlib.pyplot as plt
+
+        all_routes = self.all_routes if all_routes is None else all_routes
+        data = self.data if data is None else data
+        try:
+            fig, ax = plt.subplots(figsize=(12, 10))
+            self._plot_polygon_on_ax(ax)
 
             # Background waypoints and assets
-            navigable_coords = points_lat_long[:num_navigable]
-            asset_coords = points_lat_long[asset_indexes[0]:asset_indexes[1]+1]
+            navigable_coords = self.points_lat_long[:self.num_navigable]
+            asset_coords = self.points_lat_long[self.asset_indexes[0]:self.asset_indexes[1]+1]
             ax.scatter(navigable_coords[:, 0], navigable_coords[:, 1],
                       c='lightgray', s=5, alpha=0.3, label='All waypoints', zorder=1)
             ax.scatter(asset_coords[:, 0], asset_coords[:, 1],
                       c='green', s=60, marker='s', alpha=0.7, label='Assets', zorder=2)
 
             # Plot each vehicle route with different color
-            colors = plt.cm.get_cmap('tab10', len(all_routes))
+            colors = plt.get_cmap('tab10', len(all_routes))
+            expanded, offsets = self.expanded_routes(all_routes, data)
             for i, (route, dist) in enumerate(all_routes):
-                # Expand route with intermediate waypoints using predecessors
-                expanded_route = expand_route_with_paths(route, predecessors, data["index_map"])
+                # Route with intermediate waypoints, in global indices
+                expanded_route = expanded[offsets[i]:offsets[i + 1]]
                 
                 # Get coordinates using global indices
-                coords = points_lat_long[expanded_route]
+                coords = self.points_lat_long[expanded_route]
                 
                 ax.plot(coords[:, 0], coords[:, 1], '-', linewidth=1.5,
                         color=colors(i), alpha=0.8, label=f'Route {i+1} ({dist/1000:.1f} km)')
@@ -551,9 +2201,10 @@ def main(use_subset=False, subset_size=500, max_vehicles=60, per_attempt_time_s=
                 ax.scatter(coords[-1, 0], coords[-1, 1],
                           color=colors(i), marker='X', s=80, zorder=4)
 
+            cached = " (Cached)" if self.from_cache else ""
             ax.set_xlabel('Longitude')
             ax.set_ylabel('Latitude')
-            ax.set_title('All Drone Missions Overview (Cached) - With Path Decoding')
+            ax.set_title(f'All Drone Missions Overview{cached} - With Path Decoding')
             ax.legend(loc='best', fontsize=8)
             ax.grid(True, alpha=0.3)
             plt.tight_layout()
@@ -562,115 +2213,374 @@ def main(use_subset=False, subset_size=500, max_vehicles=60, per_attempt_time_s=
             print(f"Visualization failed: {e}")
             import traceback
             traceback.print_exc()
-        export_data = export_mission_data(all_routes, data, output_dir="output")
 
-        return all_routes
-        
-    est_min = estimate_min_vehicles(data["distance_matrix"], data["max_distance"])
-    print(f"Estimated minimum vehicles required: {est_min}")
+    def mission_bundle(self, all_routes=None, data=None):
+        """Columnar per-waypoint data of all expanded missions (see mission_format).
 
-    for num_vehicles in range(est_min, max_vehicles + 1):
-        print(f"\nAttempting solve with {num_vehicles} vehicle(s)...")
-        data["num_vehicles"] = num_vehicles
+        Returns:
+            Dict with flat arrays waypoint_index, longitude, latitude, type_code,
+            segment_distance_ft and lod_tolerance_ft, per-mission offsets and total_distance_ft, and meta
+        """
+        all_routes = self.all_routes if all_routes is None else all_routes
+        data = self.data if data is None else data
+        expanded, offsets = self.expanded_routes(all_routes, data)
+        expanded = expanded.astype(np.int64)
+        coords = self.points_lat_long[expanded]
+        num_navigable = self.distance_matrix.shape[0]
 
-        manager, routing, _ = build_routing_model(data, num_vehicles)
+        # Segment k runs from waypoint k to k + 1; the last waypoint of each mission has none
+        segment_dist = np.zeros(len(expanded), dtype=np.float64)
+        has_next = np.ones(len(expanded), dtype=bool)
+        has_next[offsets[1:] - 1] = False
+        current = np.flatnonzero(has_next)
+        wp_current, wp_next = expanded[current], expanded[current + 1]
 
-        search_parameters = pywrapcp.DefaultRoutingSearchParameters()
-        search_parameters.first_solution_strategy = (
-            routing_enums_pb2.FirstSolutionStrategy.PARALLEL_CHEAPEST_INSERTION)
-        search_parameters.local_search_metaheuristic = (
-            routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH)
-        search_parameters.time_limit.seconds = per_attempt_time_s
-        search_parameters.log_search = False
-
-        solution = routing.SolveWithParameters(search_parameters)
-
-        if solution:
-            print(f" Feasible solution found with {num_vehicles} vehicles.")
-            all_routes = []
-
-            for vehicle_id in range(num_vehicles):
-                index = routing.Start(vehicle_id)
-                route = []
-                route_distance = 0
-
-                while not routing.IsEnd(index):
-                    node = manager.IndexToNode(index)
-                    route.append(node)
-                    previous_index = index
-                    index = solution.Value(routing.NextVar(index))
-                    route_distance += routing.GetArcCostForVehicle(previous_index, index, vehicle_id)
-
-                route.append(manager.IndexToNode(index))
-                all_routes.append((route, route_distance))
-                print(f"  Route #{vehicle_id + 1}: {len(route)} waypoints, {route_distance:.1f} m")
-
-            # Cache the solution
-            cache_save(cache_key, all_routes)
-
-            # --- Visualization for all routes ---
-            try:
-                fig, ax = plt.subplots(figsize=(12, 10))
-                plot_polygon_on_ax(ax, POLYGON)
-
-                # Background waypoints and assets
-                navigable_coords = points_lat_long[:num_navigable]
-                asset_coords = points_lat_long[asset_indexes[0]:asset_indexes[1]+1]
-                ax.scatter(navigable_coords[:, 0], navigable_coords[:, 1],
-                          c='lightgray', s=5, alpha=0.3, label='All waypoints', zorder=1)
-                ax.scatter(asset_coords[:, 0], asset_coords[:, 1],
-                          c='green', s=60, marker='s', alpha=0.7, label='Assets', zorder=2)
-
-                # Plot each vehicle route with different color
-                colors = plt.cm.get_cmap('tab10', len(all_routes))
-                for i, (route, dist) in enumerate(all_routes):
-                    # Expand route with intermediate waypoints using predecessors
-                    expanded_route = expand_route_with_paths(route, predecessors, data["index_map"])
-                    
-                    # Get coordinates using global indices
-                    coords = points_lat_long[expanded_route]
-                    
-                    ax.plot(coords[:, 0], coords[:, 1], '-', linewidth=1.5,
-                            color=colors(i), alpha=0.8, label=f'Route {i+1} ({dist/1000:.1f} km)')
-                    ax.scatter(coords[0, 0], coords[0, 1],
-                              color=colors(i), marker='*', s=100, zorder=4)
-                    ax.scatter(coords[-1, 0], coords[-1, 1],
-                              color=colors(i), marker='X', s=80, zorder=4)
-
-                ax.set_xlabel('Longitude')
-                ax.set_ylabel('Latitude')
-                ax.set_title('All Drone Missions Overview - With Path Decoding')
-                ax.legend(loc='best', fontsize=8)
-                ax.grid(True, alpha=0.3)
-                plt.tight_layout()
-                plt.show()
-            except Exception as e:
-                print(f"Visualization failed: {e}")
-                import traceback
-                traceback.print_exc()
-            export_data = export_mission_data(all_routes, data, output_dir="output")
-            return all_routes
+        # Both waypoints navigable: read the distance matrix
+        navigable = (wp_current < num_navigable) & (wp_next < num_navigable)
+        segment_dist[current[navigable]] = self.segment_distance_matrix[wp_current[navigable], wp_next[navigable]]
+
+        # For non-navigable waypoints (like assets), estimate from coordinates
+        # with a simple Euclidean distance (rough degrees to feet)
+        other = current[~navigable]
+        delta = (coords[other + 1] - coords[other]) * 364000
+        segment_dist[other] = np.sqrt((delta ** 2).sum(axis=1)).astype(np.int64)
+
+        # Determine waypoint types (codes index mission_format.WAYPOINT_TYPES)
+        type_code = np.select(
+            [
+                expanded == 0,
+                (expanded >= self.photo_indexes[0]) & (expanded <= self.photo_indexes[1]),
+                (expanded >= self.asset_indexes[0]) & (expanded <= self.asset_indexes[1]),
+            ],
+            [WAYPOINT_TYPES.index(name) for name in ("depot", "photo", "asset")],
+            default=WAYPOINT_TYPES.index("intermediate"),
+        ).astype(np.uint8)
+
+        return {
+            "waypoint_index": expanded,
+            "longitude": coords[:, 0],
+            "latitude": coords[:, 1],
+            "type_code": type_code,
+            "segment_distance_ft": segment_dist,
+            "lod_tolerance_ft": simplification_tolerances(coords[:, 0], coords[:, 1], offsets),
+            "offsets": offsets,
+            "total_distance_ft": np.array([float(dist) for _, dist in all_routes], dtype=np.float64),
+            "meta": {
+                "max_distance_per_mission_ft": data["max_distance"],
+                "depot_coordinates": {
+                    "longitude": float(self.points_lat_long[0][0]),
+                    "latitude": float(self.points_lat_long[0][1])
+                }
+            },
+        }
+
+    @timed("export")
+    def export(self, all_routes=None, data=None, output_dir=None, formats=EXPORT_FORMATS,
+               validate_geofence=True):
+        """Export complete mission data as JSON and/or columnar npz files.
+    
+        Writes, per format:
+        1. photo_points - All photo waypoint locations
+        2. asset_points - All asset locations
+        3. polygon_boundary.json - Flight boundary as coordinate array
+        4. mission_paths - All drone routes with full waypoint sequences
+        plus export_manifest.json with the size and write time of every file.
+    
+        Args:
+            all_routes: List of (route, distance) tuples from solver (default: last solve)
+            data: Data model containing index_map (default: last solve)
+            output_dir: Directory to save the files (default: <data_dir>/output)
+            formats: Any of "json" (indent=2 files) and "npz" (see mission_format)
+            validate_geofence: Check every exported segment against the polygon
+                and report the missions that leave it
+
+        Returns:
+            Dict with the plan summary, the export manifest and the geofence report
+        """
+        # The solution cache key is only known for the plan of the last solve
+        cache_key = self.cache_key if all_routes is None and data is None else None
+        all_routes = self.all_routes if all_routes is None else all_routes
+        data = self.data if data is None else data
+        output_dir = self.output_dir if output_dir is None else Path(output_dir)
+        export_start = time.perf_counter()
+        files = {}
+
+        def write_json(name, payload):
+            start = time.perf_counter()
+            path = Path(output_dir) / name
+            with open(path, 'w') as f:
+                json.dump(payload, f, indent=2)
+            files[name] = {"bytes": path.stat().st_size, "write_time_s": round(time.perf_counter() - start, 4)}
+
+        def write_npz(name, save, *args):
+            start = time.perf_counter()
+            nbytes = save(Path(output_dir) / name, *args)
+            files[name] = {"bytes": nbytes, "write_time_s": round(time.perf_counter() - start, 4)}
+    
+        # Create output directory
+        Path(output_dir).mkdir(exist_ok=True)
+    
+        # ============================================
+        # 1. PHOTO POINTS
+        # ============================================
+        photo_start = self.photo_indexes[0]
+        photo_end = self.photo_indexes[1]
+    
+        # Handle exclusive vs inclusive end index
+        if photo_end == self.distance_matrix.shape[0]:
+            photo_range = np.arange(photo_start, photo_end)
         else:
-            print(f"\n No solution found with {num_vehicles} vehicles. Retrying...")
+            photo_range = np.arange(photo_start, photo_end + 1)
+        photo_range = photo_range[photo_range < len(self.points_lat_long)]
+        photo_coords = self.points_lat_long[photo_range]
 
-    print(f"\n No feasible solution found up to {max_vehicles} vehicles.")
-    return None
+        if "json" in formats:
+            write_json("photo_points.json",
+                       points_json("photo", photo_range, photo_coords[:, 0], photo_coords[:, 1]))
+        if "npz" in formats:
+            write_npz("photo_points.npz", save_points, "photo", photo_range, photo_coords)
+    
+        print(f"✓ Photo points exported: {len(photo_range)} points")
+    
+        # ============================================
+        # 2. ASSET POINTS
+        # ============================================
+        asset_range = np.arange(self.asset_indexes[0], min(self.asset_indexes[1] + 1, len(self.points_lat_long)))
+        asset_coords = self.points_lat_long[asset_range]
 
-if __name__ == "__main__":
-    print("Choose mode:")
-    print("1. Test with 500 waypoints (fast, ~1 min)")
-    print("2. Full optimization with all waypoints (slow, ~5-10 min)")
-    print("3. Clear cache and re-solve")
+        if "json" in formats:
+            write_json("asset_points.json",
+                       points_json("asset", asset_range, asset_coords[:, 0], asset_coords[:, 1]))
+        if "npz" in formats:
+            write_npz("asset_points.npz", save_points, "asset", asset_range, asset_coords)
+    
+        print(f"✓ Asset points exported: {len(asset_range)} points")
+    
+        # ============================================
+        # 3. POLYGON BOUNDARY JSON
+        # ============================================
+        polygon_coords = []
+    
+        if self.polygon is not None:
+            # Extract coordinates from the polygon
+            # Handle both Polygon and MultiPolygon
+            from shapely.geometry import Polygon, MultiPolygon
+        
+            if isinstance(self.polygon, Polygon):
+                # Single polygon - get exterior coordinates
+                coords = list(self.polygon.exterior.coords)
+                polygon_coords = [[float(lon), float(lat)] for lon, lat in coords]
+            elif isinstance(self.polygon, MultiPolygon):
+                # Multiple polygons - include all parts
+                for poly in self.polygon.geoms:
+                    coords = list(poly.exterior.coords)
+                    polygon_coords.append([[float(lon), float(lat)] for lon, lat in coords])
+    
+        # Small enough to always stay JSON
+        write_json("polygon_boundary.json", {
+            "type": "flight_boundary",
+            "coordinate_system": "EPSG:4326",
+            "coordinates": polygon_coords,
+            "note": "Coordinates in [longitude, latitude] format"
+        })
+    
+        print(f"✓ Polygon boundary exported")
+    
+        # ============================================
+        # 4. MISSION PATHS
+        # ============================================
+        bundle = self.mission_bundle(all_routes, data)
+        summary = missions_summary(bundle)
+
+        if "json" in formats:
+            write_json("mission_paths.json", missions_to_json(bundle))
+        if "npz" in formats:
+            write_npz("mission_paths.npz", save_missions, bundle)
+    
+        print(f"✓ Mission paths exported: {len(all_routes)} missions")
+
+        # Checks the exported coordinates, including the straight-line fallback legs
+        geofence = None
+        if validate_geofence and self.geofence is not None:
+            with stage("geofence"):
+                geofence = self.geofence.check(bundle["longitude"], bundle["latitude"], bundle["offsets"])
+            print_geofence_report(geofence)
+
+        manifest = write_export_manifest(output_dir, files, time.perf_counter() - export_start,
+                                         cache_key=cache_key)
+    
+        # ============================================
+        # SUMMARY
+        # ============================================
+        print(f"\n{'='*50}")
+        print(f"EXPORT COMPLETE - All files saved to '{output_dir}/' (generation {manifest['generation']})")
+        print(f"{'='*50}")
+        for name, info in files.items():
+            print(f"  {name:<24} {info['bytes'] / 1024:>10.1f} KB  {info['write_time_s']:.3f} s")
+        print(f"{'='*50}")
+        print(f"Total distance: {summary['total_distance_km']:.2f} km ({summary['total_distance_miles']:.2f} miles)")
+        print(f"Total waypoints: {summary['total_waypoints']}")
+        print(f"Export time: {manifest['write_time_s']:.2f} s")
+        print(f"{'='*50}\n")
+    
+        return {
+            "summary": summary,
+            "manifest": manifest,
+            "geofence": geofence,
+        }
 
-    TEST_MODE = False
-    CLEAR_CACHE = False
+# --- Command line ---
+def parse_args(argv=None):
+    """Command-line options of terminal.py."""
+    parser = argparse.ArgumentParser(description="Optimize drone inspection routes for one site.")
+    parser.add_argument("--data-dir", default=".", help="directory with the .npy inputs and polygon (default: .)")
+    parser.add_argument("--output-dir", default=None, help="export directory (default: <data-dir>/output)")
+    parser.add_argument("--cache-dir", default=None, help="solution cache directory (default: <data-dir>/cache)")
+    parser.add_argument("--subset", type=int, default=None, metavar="N",
+                        help="only route the first N photo waypoints (quick test runs)")
+    parser.add_argument("--max-distance", type=int, default=DEFAULT_MAX_DISTANCE_PER_TRIP,
+                        help="maximum distance per mission in feet")
+    parser.add_argument("--min-vehicles", type=int, default=None,
+                        help="start the fleet search here instead of at the estimate")
+    parser.add_argument("--max-vehicles", type=int, default=60)
+    parser.add_argument("--time-limit", type=int, default=30, help="seconds per solve attempt")
+    parser.add_argument("--time-budget", type=float, default=None, metavar="SECONDS",
+                        help="wall time limit of the whole fleet search; attempts are cut to the time left")
+    parser.add_argument("--plateau-window", type=float, default=None, metavar="SECONDS",
+                        help="end an attempt when the objective has not improved for this long")
+    parser.add_argument("--plateau-improvement", type=float, default=DEFAULT_PLATEAU_MIN_IMPROVEMENT * 100,
+                        metavar="PERCENT", help="smallest improvement that restarts the plateau window")
+    parser.add_argument("--first-solution-timeout", type=float, default=None, metavar="SECONDS",
+                        help="treat an attempt as infeasible if it has no solution after this long")
+    parser.add_argument("--fleet-search", choices=["bracket", "linear"], default="bracket")
+    parser.add_argument("--workers", type=int, default=1, help="solver processes")
+    parser.add_argument("--parallel-mode", choices=["counts", "strategies", "portfolio"], default="counts")
+    parser.add_argument("--portfolio", nargs="+", default=None, metavar="STRATEGY:METAHEURISTIC[:SEED]",
+                        help="entries raced by --parallel-mode portfolio (default: built-in portfolio)")
+    parser.add_argument("--strategy", default=None,
+                        help="first solution strategy of serial solves, or 'learned' to use the "
+                             "usual portfolio winner for this problem size")
+    parser.add_argument("--metaheuristic", default=None, help="local search metaheuristic of serial solves")
+    parser.add_argument("--portfolio-report", action="store_true",
+                        help="print the portfolio history of this site and exit")
+    parser.add_argument("--parallel-pick", choices=["first", "best"], default="first")
+    parser.add_argument("--decompose", choices=["sweep", "kmeans"], default=None)
+    parser.add_argument("--partitions", type=int, default=None)
+    parser.add_argument("--compare-monolithic", action="store_true")
+    parser.add_argument("--add-nodes", type=int, nargs="+", default=None, metavar="INDEX")
+    parser.add_argument("--remove-nodes", type=int, nargs="+", default=None, metavar="INDEX")
+    parser.add_argument("--incremental-from", default=None, metavar="CACHE_KEY")
+    parser.add_argument("--repair-time", type=int, default=10, help="seconds for incremental repair")
+    parser.add_argument("--no-warm-start", action="store_true",
+                        help="never repair a near-match cached plan, always solve from scratch")
+    parser.add_argument("--clear-cache", action="store_true", help="delete cached solutions first")
+    parser.add_argument("--solver-log", default=None, metavar="PATH",
+                        help="JSONL log of improving solutions (default: <data-dir>/logs/solver_progress.jsonl)")
+    parser.add_argument("--plot", action="store_true", help="show the problem and route plots")
+    parser.add_argument("--no-export", action="store_true", help="skip writing the output files")
+    parser.add_argument("--no-geofence", action="store_true",
+                        help="skip checking the exported routes against the polygon")
+    parser.add_argument("--format", nargs="+", choices=EXPORT_FORMATS, default=list(EXPORT_FORMATS),
+                        dest="formats", help="export formats (default: json npz)")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="record the traced memory peak of every stage (tracemalloc, slower)")
+    parser.add_argument("--profile", nargs="?", const="", default=None, metavar="PATH",
+                        help="cProfile the solve (default dump: <data-dir>/logs/solve.prof)")
+    parser.add_argument("--stage-log", default=None, metavar="PATH",
+                        help="JSONL log of stage timings per run (default: <data-dir>/logs/stages.jsonl)")
+    parser.add_argument("--benchmark-transit", action="store_true",
+                        help="compare transit evaluators instead of solving")
+    parser.add_argument("--benchmark-lod", action="store_true",
+                        help="report map payload size per simplification level of the last export")
+    return parser.parse_args(argv)
 
-    if CLEAR_CACHE:
-        clear_cache()
+def early_stop_options(args):
+    """early_stop dict of solve() from the command line, or None if no rule is set."""
+    early_stop = {}
+    if args.plateau_window:
+        early_stop["plateau_window_s"] = args.plateau_window
+        early_stop["plateau_min_improvement"] = args.plateau_improvement / 100
+    if args.first_solution_timeout:
+        early_stop["first_solution_timeout_s"] = args.first_solution_timeout
+    return early_stop or None
 
-    if TEST_MODE:
-        print("\n Running in TEST MODE (500 waypoints)\n")
-        route = main(use_subset=True, subset_size=500)
+def main(argv=None):
+    """Command-line entry point."""
+    args = parse_args(argv)
+    if args.trace_memory:
+        stages.enable_memory_tracing()
+    optimizer = DroneOptimizer(args.data_dir, max_distance_per_trip=args.max_distance,
+                               cache_dir=args.cache_dir, output_dir=args.output_dir)
+    optimizer.describe()
+
+    if args.clear_cache:
+        optimizer.clear_cache()
+
+    if args.benchmark_transit:
+        bench_data = optimizer.create_data_model(subset_size=args.subset)
+        benchmark_transit_evaluators(
+            bench_data, estimate_min_vehicles(bench_data["distance_matrix"], bench_data["max_distance"]),
+            time_limit_s=args.time_limit)
+        return None
+
+    if args.benchmark_lod:
+        benchmark_lod(optimizer.output_dir / "mission_paths.npz")
+        return None
+
+    if args.portfolio_report:
+        print_portfolio_report(optimizer.portfolio_history)
+        return None
+
+    if args.plot:
+        optimizer.plot_problem()
+
+    if args.subset is not None:
+        print(f"\n Running in TEST MODE ({args.subset} waypoints)\n")
     else:
         print("\n Running FULL OPTIMIZATION (all waypoints)\n")
-        route = main(use_subset=False)
\ No newline at end of file
+
+    solver_log = SolverLog(args.solver_log or Path(args.data_dir) / "logs" / "solver_progress.jsonl")
+    profile_path = args.profile or Path(args.data_dir) / "logs" / "solve.prof"
+    with profile(profile_path) if args.profile is not None else contextlib.nullcontext():
+        all_routes = optimizer.solve(
+            subset_size=args.subset,
+            max_vehicles=args.max_vehicles,
+            per_attempt_time_s=args.time_limit,
+            fleet_search=args.fleet_search,
+            workers=args.workers,
+            parallel_mode=args.parallel_mode,
+            parallel_pick=args.parallel_pick,
+            decompose=args.decompose,
+            num_partitions=args.partitions,
+            compare_monolithic=args.compare_monolithic,
+            incremental_from=args.incremental_from,
+            add_nodes=args.add_nodes,
+            remove_nodes=args.remove_nodes,
+            repair_time_s=args.repair_time,
+            warm_start=not args.no_warm_start,
+            min_vehicles=args.min_vehicles,
+            on_solution=solver_log,
+            early_stop=early_stop_options(args),
+            strategy=args.strategy and (args.strategy if args.strategy == "learned" else args.strategy.upper()),
+            metaheuristic=args.metaheuristic and args.metaheuristic.upper(),
+            portfolio=parse_portfolio(args.portfolio) if args.portfolio else None,
+            time_budget_s=args.time_budget,
+        )
+    solver_log.close()
+    print_convergence_report(solver_log.records)
+
+    if all_routes is not None:
+        if args.plot:
+            optimizer.plot()
+        if not args.no_export:
+            optimizer.export(formats=args.formats, validate_geofence=not args.no_geofence)
+
+    print_stage_report(stages)
+    stage_log = stages.write(args.stage_log or Path(args.data_dir) / "logs" / "stages.jsonl",
+                             data_dir=str(args.data_dir), subset=args.subset, cache_key=optimizer.cache_key,
+                             from_cache=optimizer.from_cache, feasible=all_routes is not None)
+    print(f"✓ Stage timings appended to {stage_log}")
+    return all_routes
+
+if __name__ == "__main__":
+    main()
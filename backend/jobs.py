@@ -0,0 +1,349 @@
+"""Background optimization jobs for the Flask server.
+
+Jobs run DroneOptimizer.solve + export in a process pool. Each job exports
+into its own staging directory; when it finishes, the server process moves
+the files into the output directory and rewrites export_manifest.json last,
+so readers never see a half-written export. Progress is shared with the
+server through a multiprocessing.Manager dict; the improving solutions of
+each job are appended to logs/<job id>.jsonl (see terminal.SolverLog).
+"""
+from concurrent.futures import ProcessPoolExecutor
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+
+OPTIMIZER_DIR = Path(__file__).parent / 'drone-optimizer'
+if str(OPTIMIZER_DIR) not in sys.path:
+    sys.path.insert(0, str(OPTIMIZER_DIR))
+
+# Every job is a full solve, so by default they run one at a time
+JOB_WORKERS = 1
+# Finished jobs kept for GET /jobs/<id>
+MAX_FINISHED_JOBS = 100
+
+# name -> (type, default, minimum); None defaults are optional
+JOB_PARAMS = {
+    'subset': (int, None, 1),
+    'max_distance': (int, None, 1),
+    'time_limit': (int, 30, 1),
+    'min_vehicles': (int, None, 1),
+    'max_vehicles': (int, 60, 1),
+}
+
+def parse_job_params(payload):
+    """Validate the JSON body of POST /jobs.
+
+    Returns:
+        Dict with every key of JOB_PARAMS
+
+    Raises:
+        ValueError: For unknown, mistyped or out-of-range parameters
+    """
+    from terminal import DEFAULT_MAX_DISTANCE_PER_TRIP
+
+    payload = payload or {}
+    if not isinstance(payload, dict):
+        raise ValueError('Expected a JSON object')
+    unknown = sorted(set(payload) - set(JOB_PARAMS))
+    if unknown:
+        raise ValueError(f"Unknown parameters: {', '.join(unknown)}")
+
+    params = {}
+    for name, (kind, default, minimum) in JOB_PARAMS.items():
+        value = payload.get(name, default)
+        if value is None:
+            params[name] = None
+            continue
+        if isinstance(value, bool) or not isinstance(value, kind):
+            raise ValueError(f'{name} must be an integer')
+        if value < minimum:
+            raise ValueError(f'{name} must be >= {minimum}')
+        params[name] = value
+    if params['max_distance'] is None:
+        params['max_distance'] = DEFAULT_MAX_DISTANCE_PER_TRIP
+    if params['min_vehicles'] is not None and params['min_vehicles'] > params['max_vehicles']:
+        raise ValueError('min_vehicles must be <= max_vehicles')
+    return params
+
+def _solve_options(params):
+    """DroneOptimizer.solve keyword arguments of a job."""
+    return {
+        'subset_size': params['subset'],
+        'max_vehicles': params['max_vehicles'],
+        'per_attempt_time_s': params['time_limit'],
+        'min_vehicles': params['min_vehicles'],
+    }
+
+def run_job(job_id, params, data_dir, cache_dir, staging_dir, progress, log_path=None):
+    """Worker entry point: solve and export one job into staging_dir.
+
+    Returns:
+        Dict with "feasible", and for feasible plans the cache key, the plan
+        summary, the exported files, the geofence report and the stage timings
+    """
+    from instrumentation import stages
+    from terminal import DroneOptimizer, SolverLog
+
+    # Workers are reused across jobs; time only this one
+    stages.reset()
+    state = {'stage': 'loading', 'started_at': time.time()}
+
+    def report(update):
+        state.update(update)
+        # Manager dicts only see assignments, not in-place changes
+        progress[job_id] = dict(state)
+
+    report({})
+    optimizer = DroneOptimizer(data_dir, max_distance_per_trip=params['max_distance'],
+                               cache_dir=cache_dir, output_dir=staging_dir)
+    solver_log = SolverLog(log_path, run_id=job_id)
+    try:
+        all_routes = optimizer.solve(**_solve_options(params), progress=report, on_solution=solver_log)
+    finally:
+        solver_log.close()
+    if all_routes is None:
+        report({'stage': 'infeasible'})
+        return {'feasible': False, 'cache_key': optimizer.cache_key, 'stages': stages.summary()}
+
+    report({'stage': 'exporting'})
+    export = optimizer.export()
+    report({'stage': 'exported'})
+    return {
+        'feasible': True,
+        'cache_key': optimizer.cache_key,
+        'from_cache': optimizer.from_cache,
+        'summary': export['summary'],
+        'files': export['manifest']['files'],
+        'write_time_s': export['manifest']['write_time_s'],
+        'geofence': export['geofence'],
+        'stages': stages.summary(),
+    }
+
+class JobManager:
+    """Queue of optimization jobs with atomic publishing into output_dir.
+
+    Args:
+        data_dir: Site input directory (see DroneOptimizer)
+        output_dir: Directory the server reads exports from
+        publish_lock: Lock held while files in output_dir are replaced; readers of
+            several files take it too
+        workers: Number of jobs solved at the same time
+    """
+
+    def __init__(self, data_dir, output_dir, publish_lock=None, workers=JOB_WORKERS):
+        self.data_dir = Path(data_dir)
+        self.output_dir = Path(output_dir)
+        self.cache_dir = self.data_dir / 'cache'
+        self.staging_root = self.output_dir.with_name(self.output_dir.name + '.staging')
+        self.log_dir = self.data_dir / 'logs'
+        self.publish_lock = publish_lock or threading.Lock()
+        self.workers = workers
+        self.jobs = {}
+        self._active = {}
+        self._keys = {}
+        self._lock = threading.Lock()
+        self._pool = None
+        self._manager = None
+        self._progress = None
+
+    def _start(self):
+        """Start the worker pool and the progress manager on first use."""
+        if self._pool is None:
+            # The server is multi-threaded, so workers are spawned rather than forked
+            ctx = multiprocessing.get_context('spawn')
+            self._manager = ctx.Manager()
+            self._progress = self._manager.dict()
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._manager.shutdown()
+            self._pool = self._manager = self._progress = None
+
+    # --- Deduplication ---
+    def input_signature(self):
+        """Size and modification time of every site input file.
+
+        The solution key hashes the input arrays, so a memoized key is only
+        valid while none of them changed.
+        """
+        from matrix_store import STORE_DIR
+
+        files = sorted([*self.data_dir.glob('*.npy'), *self.data_dir.glob('*.wkt'),
+                        *(self.data_dir / STORE_DIR).glob('*/meta.json')])
+        signature = []
+        for path in files:
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            signature.append((str(path.relative_to(self.data_dir)), stat.st_size, stat.st_mtime_ns))
+        return tuple(signature)
+
+    def solution_key(self, params):
+        """Solution cache key of a job, as DroneOptimizer.solve computes it."""
+        key = json.dumps(params, sort_keys=True)
+        signature = self.input_signature()
+        memo = self._keys.get(key)
+        if memo is None or memo[0] != signature:
+            from terminal import DroneOptimizer
+
+            optimizer = DroneOptimizer(self.data_dir, max_distance_per_trip=params['max_distance'],
+                                       cache_dir=self.cache_dir, output_dir=self.output_dir)
+            memo = self._keys[key] = (signature, optimizer.prepare_solve(**_solve_options(params))[2])
+        return memo[1]
+
+    def published_manifest(self):
+        try:
+            return json.loads((self.output_dir / 'export_manifest.json').read_text())
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    # --- Jobs ---
+    def submit(self, params):
+        """Start a job, or return an equivalent one.
+
+        A job with the same parameters that is still queued or running is
+        returned as is. If the published export already holds the solution
+        for these parameters, a finished job is returned without solving.
+
+        Returns:
+            (job snapshot, created) where created is False for deduplicated jobs
+        """
+        params_key = json.dumps(params, sort_keys=True)
+        with self._lock:
+            if params_key in self._active:
+                return self.get(self._active[params_key]), False
+
+        cache_key = self.solution_key(params)
+        manifest = self.published_manifest()
+        now = time.time()
+        job = {
+            'id': uuid.uuid4().hex[:12],
+            'params': params,
+            'cache_key': cache_key,
+            'submitted_at': now,
+            'started_at': None,
+            'finished_at': None,
+            'progress': {},
+            'result': None,
+            'error': None,
+        }
+
+        with self._lock:
+            if params_key in self._active:
+                return self.get(self._active[params_key]), False
+            if manifest.get('cache_key') == cache_key:
+                job.update(status='done', started_at=now, finished_at=now, result={
+                    'feasible': True,
+                    'cache_key': cache_key,
+                    'deduplicated': True,
+                    'generation': manifest.get('generation'),
+                })
+                self._remember(job)
+                return self.get(job['id']), False
+
+            self._start()
+            staging_dir = self.staging_root / job['id']
+            staging_dir.mkdir(parents=True, exist_ok=True)
+            job['status'] = 'queued'
+            self._remember(job)
+            self._active[params_key] = job['id']
+            future = self._pool.submit(run_job, job['id'], params, str(self.data_dir),
+                                       str(self.cache_dir), str(staging_dir), self._progress,
+                                       str(self.solver_log_path(job['id'])))
+        future.add_done_callback(lambda f: self._finish(job, params_key, staging_dir, f))
+        return self.get(job['id']), True
+
+    def _remember(self, job):
+        """Add a job, dropping the oldest finished ones beyond MAX_FINISHED_JOBS."""
+        self.jobs[job['id']] = job
+        finished = [j for j in self.jobs.values() if j['status'] in ('done', 'failed')]
+        for old in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            del self.jobs[old['id']]
+            self.solver_log_path(old['id']).unlink(missing_ok=True)
+
+    def _finish(self, job, params_key, staging_dir, future):
+        """Done callback: publish the staged export and record the outcome."""
+        try:
+            result = future.result()
+            if result['feasible']:
+                result['generation'] = self.publish(staging_dir, result)['generation']
+            status, error = 'done', None
+        except Exception as e:
+            result, status, error = None, 'failed', f'{type(e).__name__}: {e}'
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+        with self._lock:
+            progress = self._progress.pop(job['id'], {}) if self._progress is not None else {}
+            job['progress'] = {**job['progress'], **progress}
+            job['started_at'] = job['progress'].pop('started_at', job['started_at'])
+            job.update(status=status, result=result, error=error, finished_at=time.time())
+            self._active.pop(params_key, None)
+
+    def publish(self, staging_dir, result):
+        """Move a staged export into output_dir; the manifest is written last.
+
+        The files are replaced one at a time, all under publish_lock. Readers
+        that take the same lock while they read (see server.artifact_snapshot)
+        see either the whole previous export or the whole new one.
+
+        Returns:
+            The new export manifest
+        """
+        from terminal import write_export_manifest
+
+        self.output_dir.mkdir(exist_ok=True)
+        with self.publish_lock:
+            for name in result['files']:
+                os.replace(Path(staging_dir) / name, self.output_dir / name)
+            return write_export_manifest(self.output_dir, result['files'], result['write_time_s'],
+                                         cache_key=result['cache_key'])
+
+    def get(self, job_id):
+        """Snapshot of a job with live progress and elapsed time; None if unknown."""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        snapshot = {**job, 'progress': dict(job['progress'])}
+        if job['status'] in ('queued', 'running') and self._progress is not None:
+            live = self._progress.get(job_id)
+            if live:
+                snapshot['status'] = 'running'
+                snapshot['progress'].update(live)
+        snapshot['started_at'] = snapshot['progress'].pop('started_at', snapshot['started_at'])
+        if snapshot['started_at'] is not None:
+            end = snapshot['finished_at'] or time.time()
+            snapshot['elapsed_s'] = round(end - snapshot['started_at'], 3)
+        else:
+            snapshot['elapsed_s'] = 0.0
+        return snapshot
+
+    def solver_log_path(self, job_id):
+        return self.log_dir / f'{job_id}.jsonl'
+
+    def read_solver_log(self, job_id, offset=0):
+        """Complete records appended to a job's solver log since byte offset.
+
+        Returns:
+            (records, new offset); a partially written last line is left for the next call
+        """
+        try:
+            with open(self.solver_log_path(job_id), 'rb') as f:
+                f.seek(offset)
+                chunk = f.read()
+        except FileNotFoundError:
+            return [], offset
+        complete = chunk[:chunk.rfind(b'\n') + 1]
+        return [json.loads(line) for line in complete.splitlines() if line], offset + len(complete)
+
+    def list(self):
+        return [self.get(job_id) for job_id in list(self.jobs)]
@@ -0,0 +1,97 @@
+"""Prometheus metrics of the Flask server.
+
+Histograms are kept in process memory and rendered in the Prometheus text
+exposition format (version 0.0.4) on GET /metrics, so no client library is
+needed. Counts are per server process; with several workers, scrape each one.
+"""
+from collections import OrderedDict
+import bisect
+import threading
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Request latency buckets, seconds
+LATENCY_BUCKETS_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Response body buckets, bytes (after compression)
+SIZE_BUCKETS_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Histogram:
+    """Cumulative histogram with one series per label combination.
+
+    Args:
+        name: Metric name
+        help: Description shown in the exposition
+        buckets: Ascending upper bounds; +Inf is added automatically
+        labelnames: Names of the labels passed to observe()
+    """
+
+    def __init__(self, name, help, buckets, labelnames=()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        self._series = OrderedDict()
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0}
+            series['counts'][bisect.bisect_left(self.buckets, value)] += 1
+            series['sum'] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = [(key, list(s['counts']), s['sum']) for key, s in self._series.items()]
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = _labels(self.labelnames, key, [('le', _number(bound))])
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            labels = _labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_number(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return '\n'.join(lines)
+
+class Registry:
+    """Named metrics rendered together."""
+
+    def __init__(self):
+        self.metrics = OrderedDict()
+
+    def histogram(self, name, help, buckets, labelnames=()):
+        self.metrics[name] = Histogram(name, help, buckets, labelnames)
+        return self.metrics[name]
+
+    def render(self):
+        return '\n'.join(metric.render() for metric in self.metrics.values()) + '\n'
+
+registry = Registry()
+
+request_latency = registry.histogram(
+    'gridwatch_http_request_duration_seconds',
+    'Time from request start until the response headers are ready.',
+    LATENCY_BUCKETS_S, ('method', 'endpoint', 'status'))
+
+response_size = registry.histogram(
+    'gridwatch_http_response_size_bytes',
+    'Response body size as sent, after compression; streamed responses are not counted.',
+    SIZE_BUCKETS_BYTES, ('method', 'endpoint'))
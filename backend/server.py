@@ -1,54 +1,470 @@
-from flask import Flask, jsonify
+from flask import Flask, Response, g, jsonify, request, stream_with_context
 from flask_cors import CORS
+import gzip
+import hashlib
 import json
+import sys
+import threading
+import time
+import zlib
 from pathlib import Path
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+OPTIMIZER_DIR = Path(__file__).parent / 'drone-optimizer'
+sys.path.insert(0, str(OPTIMIZER_DIR))
+import mission_format
+import jobs
+import metrics
+
 app = Flask(__name__)
 CORS(app)
 
-OUTPUT_DIR = Path(__file__).parent / 'drone-optimizer' / 'output'
+OUTPUT_DIR = OPTIMIZER_DIR / 'output'
+MISSION_DATA_ARTIFACTS = ['mission_paths', 'asset_points', 'photo_points', 'polygon_boundary']
+
+def load_artifact(name, raw=False):
+    """Load an exported artifact, preferring the columnar npz over the JSON file.
+
+    With raw=True, mission paths stored as npz are returned as the columnar
+    bundle instead of the JSON structure.
+    """
+    npz_file = OUTPUT_DIR / f'{name}.npz'
+    if npz_file.exists():
+        if name == 'mission_paths':
+            bundle = mission_format.load_missions(npz_file)
+            return bundle if raw else mission_format.missions_to_json(bundle)
+        return mission_format.points_to_json(npz_file)
+    with open(OUTPUT_DIR / f'{name}.json', 'r') as file:
+        return json.load(file)
+
+# --- Response cache ---
+# Parsed and serialized responses stay in memory until the export changes.
+# The version of a response is the export generation (export_manifest.json)
+# plus the mtime and size of every file it was built from. Responses are
+# built from a snapshot: the version and the parsed artifacts are read
+# together under the lock jobs publish with, so a cached body always holds
+# the data of the version it is stored under.
+RESPONSE_CACHE_MAX_ENTRIES = 256
+
+_parsed_cache = {}
+_response_cache = {}
+_response_cache_lock = threading.RLock()
+
+def artifact_files(name):
+    """Files an artifact is read from (the npz if present, else the JSON)."""
+    npz_file = OUTPUT_DIR / f'{name}.npz'
+    return [npz_file] if npz_file.exists() else [OUTPUT_DIR / f'{name}.json']
+
+def files_version(files):
+    """Cache version of a set of source files; None if any is missing."""
+    version = []
+    for path in [OUTPUT_DIR / 'export_manifest.json', *files]:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            if path.name == 'export_manifest.json':
+                continue
+            return None
+        version.append((path.name, stat.st_mtime_ns, stat.st_size))
+    return tuple(version)
+
+def parsed_artifact(name, raw=False):
+    """Parsed artifact, reloaded only when its source files change."""
+    version = files_version(artifact_files(name))
+    entry = _parsed_cache.get((name, raw))
+    if entry is None or entry[0] != version:
+        entry = (version, load_artifact(name, raw))
+        _parsed_cache[(name, raw)] = entry
+    return entry[1]
+
+def artifact_snapshot(names, raw=()):
+    """Version and parsed artifacts of a set of names, read together.
+
+    Taken under the publish lock, so an export published by a job is either
+    entirely before or entirely after the snapshot.
+
+    Args:
+        names: Artifact names
+        raw: Names to load raw (mission paths as the columnar bundle, see load_artifact)
+
+    Returns:
+        (version, {name: parsed artifact}); version is that of files_version
+    """
+    with _response_cache_lock:
+        version = files_version([path for name in names for path in artifact_files(name)])
+        return version, {name: parsed_artifact(name, raw=name in raw) for name in names}
+
+# --- Compression ---
+# Compressed variants are built once per export generation and kept with the
+# cached response, so repeated requests never compress again.
+COMPRESS_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+def negotiate_encoding():
+    """Best content coding the client accepts: 'br', 'gzip' or None."""
+    if brotli is not None and request.accept_encodings['br']:
+        return 'br'
+    if request.accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, GZIP_LEVEL, mtime=0)
+
+def cached_response(key, names, build, raw=(), snapshot=None):
+    """Serve a JSON response from memory, with ETag/Last-Modified and 304 support.
+
+    Args:
+        key: Cache key of the response
+        names: Artifact names the response is built from
+        build: Callable({name: parsed artifact}) returning the JSON-serializable payload
+        raw: Names passed to build raw (see artifact_snapshot)
+        snapshot: Optional (version, artifacts) the caller already read with
+            artifact_snapshot; the response is then built from those
+    """
+    files = [path for name in names for path in artifact_files(name)]
+    version = snapshot[0] if snapshot is not None else files_version(files)
+    entry = _response_cache.get(key)
+    if entry is None or entry['version'] != version:
+        with _response_cache_lock:
+            if snapshot is None:
+                snapshot = artifact_snapshot(names, raw)
+            version, artifacts = snapshot
+            entry = _response_cache.get(key)
+            if entry is None or entry['version'] != version:
+                body = app.json.dumps(build(artifacts), separators=(',', ':')).encode()
+                entry = {
+                    'version': version,
+                    'body': body,
+                    'encoded': {},
+                    'etag': hashlib.sha1(body).hexdigest()[:20],
+                    'last_modified': max(path.stat().st_mtime for path in files),
+                }
+                _response_cache.pop(key, None)
+                _response_cache[key] = entry
+                # Per-mission responses vary with the query; drop the oldest entries
+                while len(_response_cache) > RESPONSE_CACHE_MAX_ENTRIES:
+                    _response_cache.pop(next(iter(_response_cache)))
+
+    encoding = negotiate_encoding() if len(entry['body']) >= COMPRESS_MIN_BYTES else None
+    if encoding is None:
+        response = Response(entry['body'], mimetype='application/json')
+        response.set_etag(entry['etag'])
+    else:
+        if encoding not in entry['encoded']:
+            with _response_cache_lock:
+                if encoding not in entry['encoded']:
+                    entry['encoded'][encoding] = compress(entry['body'], encoding)
+        response = Response(entry['encoded'][encoding], mimetype='application/json')
+        response.headers['Content-Encoding'] = encoding
+        response.set_etag(f"{entry['etag']}-{encoding}")
+    response.vary.add('Accept-Encoding')
+    response.last_modified = entry['last_modified']
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+# --- Metrics ---
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_metrics(response):
+    """Observe latency and body size per route (the rule, not the URL, to bound label values)."""
+    start = g.get('request_start')
+    if start is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.request_latency.observe(time.perf_counter() - start, method=request.method,
+                                        endpoint=endpoint, status=str(response.status_code))
+        if not response.is_streamed:
+            metrics.response_size.observe(response.calculate_content_length() or 0,
+                                          method=request.method, endpoint=endpoint)
+    return response
+
+@app.route('/metrics')
+def get_metrics():
+    """Request latency and response size histograms in Prometheus text format."""
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
 
 @app.route('/')
 def home():
-    return "Drone Optimizer API - Available endpoints: /mission-paths, /asset-points, /photo-points, /polygon-boundary, /mission-data"
+    return "Drone Optimizer API - Available endpoints: /mission-paths, /asset-points, /photo-points, /polygon-boundary, /mission-data, /mission-data/stream, /missions/summary, /missions/<id>, /jobs, /metrics"
 
 @app.route('/mission-paths')
 def get_mission_paths():
-    with open(OUTPUT_DIR / 'mission_paths.json', 'r') as file:
-        return jsonify(json.load(file))
+    return cached_response('mission_paths', ['mission_paths'], lambda a: a['mission_paths'])
 
 @app.route('/asset-points')
 def get_asset_points():
-    with open(OUTPUT_DIR / 'asset_points.json', 'r') as file:
-        return jsonify(json.load(file))
+    return cached_response('asset_points', ['asset_points'], lambda a: a['asset_points'])
 
 @app.route('/photo-points')
 def get_photo_points():
-    with open(OUTPUT_DIR / 'photo_points.json', 'r') as file:
-        return jsonify(json.load(file))
+    return cached_response('photo_points', ['photo_points'], lambda a: a['photo_points'])
 
 @app.route('/polygon-boundary')
 def get_polygon_boundary():
-    with open(OUTPUT_DIR / 'polygon_boundary.json', 'r') as file:
-        return jsonify(json.load(file))
+    return cached_response('polygon_boundary', ['polygon_boundary'], lambda a: a['polygon_boundary'])
 
 @app.route('/mission-data')
 def get_all_mission_data():
-    with open(OUTPUT_DIR / 'mission_paths.json', 'r') as file:
-        mission_paths = json.load(file)
-    with open(OUTPUT_DIR / 'asset_points.json', 'r') as file:
-        asset_points = json.load(file)
-    with open(OUTPUT_DIR / 'photo_points.json', 'r') as file:
-        photo_points = json.load(file)
-    with open(OUTPUT_DIR / 'polygon_boundary.json', 'r') as file:
-        polygon_boundary = json.load(file)
-    
-    return jsonify({
-        'missionPaths': mission_paths,
-        'assetPoints': asset_points,
-        'photoPoints': photo_points,
-        'polygonBoundary': polygon_boundary
-    })
+    def build(artifacts):
+        return {
+            'missionPaths': artifacts['mission_paths'],
+            'assetPoints': artifacts['asset_points'],
+            'photoPoints': artifacts['photo_points'],
+            'polygonBoundary': artifacts['polygon_boundary']
+        }
+    return cached_response('mission_data', MISSION_DATA_ARTIFACTS, build)
+
+# --- Per-mission endpoints ---
+def mission_count(mission_paths):
+    if 'offsets' in mission_paths:
+        return len(mission_paths['total_distance_ft'])
+    return len(mission_paths['missions'])
+
+def mission_info(mission_paths, index):
+    """Statistics of one mission without its waypoints."""
+    if 'offsets' in mission_paths:
+        return mission_format.mission_summary(mission_paths, index)
+    return {key: value for key, value in mission_paths['missions'][index].items() if key != 'waypoints'}
+
+def mission_waypoint_rows(mission_paths, index, step=1, max_points=None,
+                          fields=mission_format.WAYPOINT_FIELDS, tolerance_ft=0.0):
+    """Simplified, decimated and projected waypoints of one mission."""
+    if 'offsets' in mission_paths:
+        positions = mission_format.lod_indices(mission_paths, index, tolerance_ft)
+        positions = positions[mission_format.decimate_indices(len(positions), step, max_points)]
+        return mission_format.mission_waypoints(mission_paths, index, positions, fields)
+    # The JSON export has no simplification levels
+    waypoints = mission_paths['missions'][index]['waypoints']
+    indices = mission_format.decimate_indices(len(waypoints), step, max_points)
+    return [{key: waypoints[i][key] for key in mission_format.WAYPOINT_FIELDS if key in fields}
+            for i in indices.tolist()]
+
+def requested_tolerance_ft(mission_paths):
+    """Simplification tolerance from the tolerance_ft or zoom query parameter."""
+    if 'lod_tolerance_ft' not in mission_paths:
+        return 0.0
+    tolerance = request.args.get('tolerance_ft', type=float)
+    if tolerance is not None:
+        return max(t for t in mission_format.LOD_TOLERANCES_FT if t <= max(tolerance, 0.0))
+    zoom = request.args.get('zoom', type=float)
+    if zoom is not None:
+        return mission_format.zoom_tolerance_ft(zoom, mission_paths['meta']['depot_coordinates']['latitude'])
+    return 0.0
+
+@app.route('/missions/summary')
+def get_missions_summary():
+    def build(artifacts):
+        mission_paths = artifacts['mission_paths']
+        summary = (mission_format.missions_summary(mission_paths) if 'offsets' in mission_paths
+                   else mission_paths['summary'])
+        return {
+            'type': 'drone_mission_summary',
+            'summary': summary,
+            'missions': [mission_info(mission_paths, i) for i in range(mission_count(mission_paths))]
+        }
+    return cached_response('missions_summary', ['mission_paths'], build, raw=['mission_paths'])
+
+@app.route('/missions/<int:mission_id>')
+def get_mission(mission_id):
+    """One mission by mission_id (1-based).
+
+    Query parameters:
+        fields: Comma-separated waypoint fields to return (default: all)
+        decimate: Keep every n-th waypoint (first and last are always kept)
+        max_points: Decimate so that at most this many waypoints are returned
+        zoom: Map zoom level; the route is simplified to about one pixel of error
+        tolerance_ft: Explicit simplification tolerance (rounded down to a precomputed level)
+    """
+    fields = request.args.get('fields')
+    fields = tuple(mission_format.WAYPOINT_FIELDS) if not fields else tuple(fields.split(','))
+    unknown = [name for name in fields if name not in mission_format.WAYPOINT_FIELDS]
+    step = request.args.get('decimate', 1, type=int)
+    max_points = request.args.get('max_points', type=int)
+    if unknown:
+        return jsonify({'error': f"Unknown fields: {', '.join(unknown)}",
+                        'fields': list(mission_format.WAYPOINT_FIELDS)}), 400
+    if step < 1 or (max_points is not None and max_points < 2):
+        return jsonify({'error': 'decimate must be >= 1 and max_points >= 2'}), 400
+
+    # 404 and the simplification level depend on the export, so the snapshot
+    # is read first and the response is built from that same snapshot
+    snapshot = artifact_snapshot(['mission_paths'], raw=['mission_paths'])
+    mission_paths = snapshot[1]['mission_paths']
+    index = mission_id - 1
+    if not 0 <= index < mission_count(mission_paths):
+        return jsonify({'error': f'Mission {mission_id} not found'}), 404
+
+    tolerance_ft = requested_tolerance_ft(mission_paths)
+
+    def build(artifacts):
+        return {
+            **mission_info(mission_paths, index),
+            'lod_tolerance_ft': tolerance_ft,
+            'waypoints': mission_waypoint_rows(mission_paths, index, step, max_points, fields, tolerance_ft)
+        }
+    key = ('mission', mission_id, fields, step, max_points, tolerance_ft)
+    return cached_response(key, ['mission_paths'], build, snapshot=snapshot)
+
+def mission_stream_records(artifacts):
+    """Records of /mission-data/stream: summary, polygon and points first, then one per mission.
+
+    Args:
+        artifacts: Snapshot of MISSION_DATA_ARTIFACTS, mission paths raw (see artifact_snapshot)
+    """
+    mission_paths = artifacts['mission_paths']
+    if 'offsets' in mission_paths:
+        num_missions = len(mission_paths['total_distance_ft'])
+        summary = mission_format.missions_summary(mission_paths)
+        missions = (
+            {**mission_format.mission_summary(mission_paths, i),
+             'waypoints': mission_format.mission_waypoints(mission_paths, i)}
+            for i in range(num_missions)
+        )
+    else:
+        num_missions = len(mission_paths['missions'])
+        summary = mission_paths['summary']
+        missions = iter(mission_paths['missions'])
+
+    yield {'type': 'summary', 'summary': summary}
+    yield {'type': 'polygonBoundary', 'data': artifacts['polygon_boundary']}
+    yield {'type': 'assetPoints', 'data': artifacts['asset_points']}
+    yield {'type': 'photoPoints', 'data': artifacts['photo_points']}
+    for mission in missions:
+        yield {'type': 'mission', 'mission': mission}
+    yield {'type': 'end', 'missions': num_missions}
+
+@app.route('/mission-data/stream')
+def stream_mission_data():
+    """NDJSON variant of /mission-data, one mission per line, gzip-flushed per line."""
+    use_gzip = bool(request.accept_encodings['gzip'])
+    # Every line comes from one export, even if a job publishes mid-stream
+    _, artifacts = artifact_snapshot(MISSION_DATA_ARTIFACTS, raw=['mission_paths'])
+
+    def generate():
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31) if use_gzip else None
+        for record in mission_stream_records(artifacts):
+            line = app.json.dumps(record, separators=(',', ':')).encode() + b'\n'
+            if compressor is None:
+                yield line
+            else:
+                yield compressor.compress(line) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if compressor is not None:
+            yield compressor.flush()
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    if use_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    response.cache_control.no_cache = True
+    return response
+
+# --- Optimization jobs ---
+# Finished jobs publish into OUTPUT_DIR under the response cache lock, and
+# every reader takes its artifacts through artifact_snapshot under the same
+# lock, so no response combines files of two exports.
+job_manager = jobs.JobManager(OPTIMIZER_DIR, OUTPUT_DIR, publish_lock=_response_cache_lock)
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Start an optimization in the background.
+
+    JSON body (all optional): subset, max_distance, time_limit (seconds per
+    solve attempt), min_vehicles and max_vehicles. Identical requests return
+    the running job, or a finished one when the published export already
+    holds that solution.
+    """
+    try:
+        params = jobs.parse_job_params(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e), 'parameters': list(jobs.JOB_PARAMS)}), 400
+    job, created = job_manager.submit(params)
+    response = jsonify(job)
+    response.status_code = 202 if created else 200
+    response.headers['Location'] = f"/jobs/{job['id']}"
+    return response
+
+@app.route('/jobs')
+def list_jobs():
+    return jsonify({'jobs': job_manager.list()})
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    """Status (queued/running/done/failed), progress, elapsed time and result of a job."""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Job {job_id} not found'}), 404
+    return jsonify(job)
+
+# --- Solver progress events ---
+SSE_POLL_S = 0.5
+SSE_KEEPALIVE_S = 15
+
+def sse_message(event, data, event_id=None):
+    """One Server-Sent Events message."""
+    lines = [f'event: {event}']
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append('data: ' + app.json.dumps(data, separators=(',', ':')))
+    return '\n'.join(lines) + '\n\n'
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """Server-Sent Events of a job until it finishes.
+
+    Events:
+        solution: One improving solution (t, objective, span, vehicles, attempt, num_vehicles)
+        progress: Status, progress and elapsed time whenever the progress changes
+        done: Final job snapshot; the stream ends after it
+
+    Reconnecting clients resume after the last received solution (Last-Event-ID).
+    """
+    if job_manager.get(job_id) is None:
+        return jsonify({'error': f'Job {job_id} not found'}), 404
+    offset = request.headers.get('Last-Event-ID', 0, type=int)
+
+    def generate():
+        nonlocal offset
+        last_progress, last_sent = None, time.monotonic()
+        while True:
+            job = job_manager.get(job_id)
+            records, new_offset = job_manager.read_solver_log(job_id, offset)
+            for i, record in enumerate(records):
+                # Only the last message of a batch carries the resume offset
+                yield sse_message('solution', record, new_offset if i == len(records) - 1 else None)
+            offset = new_offset
+            sent = bool(records)
+
+            progress = (job['status'], job['progress'])
+            if progress != last_progress:
+                last_progress = progress
+                yield sse_message('progress', {key: job[key] for key in ('status', 'progress', 'elapsed_s')})
+                sent = True
+            if job['status'] in ('done', 'failed'):
+                yield sse_message('done', job)
+                return
+
+            if sent:
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= SSE_KEEPALIVE_S:
+                yield ': keepalive\n\n'
+                last_sent = time.monotonic()
+            time.sleep(SSE_POLL_S)
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.cache_control.no_cache = True
+    # Tell reverse proxies not to buffer the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
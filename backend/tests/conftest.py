@@ -0,0 +1,59 @@
+"""Shared fixtures: import paths and a small generated site."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+OPTIMIZER_DIR = BACKEND_DIR / 'drone-optimizer'
+for path in (BACKEND_DIR, OPTIMIZER_DIR):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+# Distance limit that fits every synthetic site of SITE_WAYPOINTS waypoints
+SITE_WAYPOINTS = 60
+
+def star_data(num_leaves, leg=100, max_distance=250):
+    """Data model with leaves `leg` from the depot and 2 * leg from each other.
+
+    With the default distance limit a vehicle can visit only one leaf, so the
+    smallest feasible fleet is exactly num_leaves.
+    """
+    n = num_leaves + 1
+    matrix = np.full((n, n), 2 * leg, dtype=np.int64)
+    matrix[0, :] = matrix[:, 0] = leg
+    np.fill_diagonal(matrix, 0)
+    return {'distance_matrix': matrix, 'max_distance': max_distance, 'depot': 0}
+
+@pytest.fixture(scope='session')
+def site(tmp_path_factory):
+    """(site directory, site info) of a generated grid-inspection site."""
+    from benchmark import generate_site
+
+    site_dir = tmp_path_factory.mktemp('site')
+    info = generate_site(site_dir, SITE_WAYPOINTS, seed=0, workers=1)
+    return site_dir, info
+
+@pytest.fixture(scope='session')
+def exported(site, tmp_path_factory):
+    """Output directory of a real solve and export of the generated site."""
+    from terminal import DroneOptimizer
+
+    site_dir, info = site
+    work_dir = tmp_path_factory.mktemp('export')
+    optimizer = DroneOptimizer(site_dir, max_distance_per_trip=info['max_distance_ft'],
+                               cache_dir=work_dir / 'cache', output_dir=work_dir / 'output')
+    assert optimizer.solve(per_attempt_time_s=1, early_stop={'plateau_window_s': 0.2}) is not None
+    optimizer.export()
+    return work_dir / 'output'
+
+@pytest.fixture
+def client(exported, monkeypatch):
+    """Flask test client serving the exported site with empty response caches."""
+    import server
+
+    monkeypatch.setattr(server, 'OUTPUT_DIR', exported)
+    server._response_cache.clear()
+    server._parsed_cache.clear()
+    return server.app.test_client()
@@ -0,0 +1,76 @@
+"""Batch manifests, site sizes and the per-site time budget."""
+import json
+
+import pytest
+
+import batch
+
+def write_manifest(tmp_path, manifest):
+    path = tmp_path / 'sites.json'
+    path.write_text(json.dumps(manifest))
+    return path
+
+@pytest.fixture
+def site_dirs(tmp_path):
+    for name in ('north', 'south'):
+        (tmp_path / 'sites' / name).mkdir(parents=True)
+    return tmp_path / 'sites'
+
+def test_defaults_apply_to_every_site(tmp_path, site_dirs):
+    path = write_manifest(tmp_path, {
+        'defaults': {'max_distance': 20000, 'time_budget_s': 60},
+        'sites': ['sites/north', {'data_dir': 'sites/south', 'name': 's', 'time_budget_s': 90}],
+    })
+    north, south = batch.load_manifest(path)
+    assert north['name'] == 'north'
+    assert north['data_dir'] == str((site_dirs / 'north').resolve())
+    assert (north['max_distance'], north['time_budget_s']) == (20000, 60)
+    assert (south['name'], south['time_budget_s']) == ('s', 90)
+    assert north['max_vehicles'] == batch.SITE_PARAMS['max_vehicles'][1]
+    assert north['subset'] is None
+
+def test_a_plain_list_is_a_site_list(tmp_path, site_dirs):
+    path = write_manifest(tmp_path, ['sites/north'])
+    assert [site['name'] for site in batch.load_manifest(path)] == ['north']
+
+@pytest.mark.parametrize('manifest, message', [
+    ({'sites': [{'data_dir': 'sites/north', 'budget': 5}]}, 'unknown settings budget'),
+    ({'defaults': {'speed': 3}, 'sites': ['sites/north']}, 'defaults: unknown settings'),
+    ({'sites': [{'data_dir': 'sites/north', 'max_distance': '100'}]}, 'max_distance must be'),
+    ({'sites': [{'data_dir': 'sites/north', 'max_vehicles': 2.5}]}, 'max_vehicles must be'),
+    ({'sites': [{'data_dir': 'sites/north', 'subset': True}]}, 'subset must be'),
+    ({'sites': [{'data_dir': 'sites/north', 'time_budget_s': 0}]}, 'time_budget_s must be'),
+    ({'sites': [{'name': 'north'}]}, 'data_dir is required'),
+    ({'sites': ['sites/east']}, 'is not a directory'),
+    ({'sites': ['sites/north', {'data_dir': 'sites/south', 'name': 'north'}]}, "duplicate site name 'north'"),
+    ({'sites': []}, 'lists no sites'),
+])
+def test_malformed_manifests_are_rejected(tmp_path, site_dirs, manifest, message):
+    with pytest.raises(ValueError, match=message):
+        batch.load_manifest(write_manifest(tmp_path, manifest))
+
+def test_site_size_counts_photo_waypoints(site):
+    site_dir, info = site
+    entry = {'data_dir': str(site_dir), 'subset': None}
+    size = batch.site_size(entry)
+    assert size > 10
+    assert batch.site_size({**entry, 'subset': 10}) == 10
+
+def test_solve_site_stays_within_its_budget(site, tmp_path):
+    site_dir, info = site
+    entry = {'name': 'tiny', 'data_dir': str(site_dir), 'max_distance': info['max_distance_ft'],
+             'time_budget_s': 4, 'time_limit': 3, 'max_vehicles': 60, 'min_vehicles': None, 'subset': None}
+    result = batch.solve_site(entry, tmp_path, export=False)
+    assert 'error' not in result
+    # The probes stop at the deadline; allow for process and model setup
+    assert result['wall_time_s'] < entry['time_budget_s'] + 2
+    assert (tmp_path / 'tiny' / 'solve.log').exists()
+
+def test_repeated_batches_reuse_the_cached_solution(site, tmp_path):
+    site_dir, info = site
+    entry = {'name': 'again', 'data_dir': str(site_dir), 'max_distance': info['max_distance_ft'],
+             'time_budget_s': 4, 'time_limit': 1, 'max_vehicles': 60, 'min_vehicles': None, 'subset': None}
+    first = batch.solve_site(entry, tmp_path, export=False)
+    second = batch.solve_site(entry, tmp_path, export=False)
+    assert first['feasible'] and not first['from_cache']
+    assert second['from_cache'] and second['plan'] == first['plan']
@@ -0,0 +1,71 @@
+"""Synthetic sites, per-stage measurements and report comparison."""
+import tracemalloc
+
+import numpy as np
+import pytest
+
+import benchmark
+import instrumentation
+
+@pytest.fixture
+def stage_recorder(monkeypatch):
+    """The process-wide stage recorder, with tracing switched off again afterwards."""
+    monkeypatch.setattr(instrumentation.stages, 'trace_memory', False)
+    yield instrumentation.stages
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+def test_same_arguments_give_the_same_site(tmp_path):
+    first = benchmark.generate_site(tmp_path / 'a', 30, seed=3, workers=1)
+    second = benchmark.generate_site(tmp_path / 'b', 30, seed=3, workers=1)
+    for name in ('points_lat_long', 'distance_matrix', 'predecessors'):
+        assert np.array_equal(np.load(tmp_path / 'a' / f'{name}.npy'), np.load(tmp_path / 'b' / f'{name}.npy'))
+    assert first['num_grid_nodes'] == second['num_grid_nodes']
+
+def test_site_layout(site):
+    site_dir, info = site
+    photo = np.load(site_dir / 'photo_indexes.npy')
+    waypoints = np.load(site_dir / 'waypoint_indexes.npy')
+    assets = np.load(site_dir / 'asset_indexes.npy')
+    num_nodes = info['num_waypoints'] + info['num_grid_nodes']
+    assert photo.tolist() == [0, info['num_waypoints'] - 1]
+    assert waypoints.tolist() == [info['num_waypoints'], num_nodes - 1]
+    assert assets.tolist() == [num_nodes, num_nodes + info['num_assets'] - 1]
+    matrix = np.load(site_dir / 'distance_matrix.npy')
+    assert matrix.shape == (num_nodes, num_nodes)
+    assert info['matrix_bytes'] == num_nodes ** 2 * benchmark.MATRIX_BYTES_PER_PAIR
+    # Every node is reachable from the depot within half the distance limit
+    assert np.isfinite(matrix[0]).all() and 2 * matrix[0].max() < info['max_distance_ft']
+
+def test_large_sites_need_an_explicit_opt_in(tmp_path, monkeypatch):
+    monkeypatch.setattr(benchmark, 'LARGE_SITE_BYTES', 1024)
+    with pytest.raises(ValueError, match='allow_large'):
+        benchmark.generate_site(tmp_path / 'large', 30, workers=1)
+    assert not (tmp_path / 'large' / 'distance_matrix.npy').exists()
+    info = benchmark.generate_site(tmp_path / 'large', 30, workers=1, allow_large=True)
+    assert info['matrix_bytes'] > 1024
+
+def test_every_stage_is_measured(site, stage_recorder):
+    site_dir, info = site
+    result = benchmark.benchmark_site(site_dir, info, 1, trace_memory=True, serve=True)
+    assert result['plan']['num_vehicles'] >= 1
+    assert list(result['stages']) == ['load', 'create_data_model', 'model_build', 'solve',
+                                      'path_expansion', 'geofence', 'export', 'serve']
+    for stage in result['stages'].values():
+        assert stage['time_s'] >= 0 and stage['cpu_s'] >= 0
+        assert stage['peak_traced_bytes'] > 0
+        assert 'rss_change_bytes' in stage
+    assert all(request['bytes'] > 0 for request in result['requests'].values())
+
+def report(solve_s, peak=1000):
+    return {'instances': [{'instance': {'num_waypoints': 100},
+                           'stages': {'solve': {'time_s': solve_s, 'peak_traced_bytes': peak},
+                                      'load': {'time_s': 0.01}}}]}
+
+def test_comparison_flags_slower_stages():
+    rows, regressions = benchmark.compare_reports(report(1.0), report(1.2), threshold_pct=10)
+    assert [row[1] for row in regressions] == ['solve']
+    assert len(rows) == 2
+    # Fast stages are too noisy to flag
+    _, regressions = benchmark.compare_reports(report(0.01), report(0.03), threshold_pct=10)
+    assert regressions == []
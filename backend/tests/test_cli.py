@@ -0,0 +1,46 @@
+"""terminal.py as a module without side effects, and its command line."""
+import json
+import os
+import subprocess
+import sys
+
+import terminal
+from conftest import OPTIMIZER_DIR
+
+def test_import_has_no_side_effects(tmp_path):
+    # An empty working directory: no .npy inputs to load, nothing may be written
+    env = {**os.environ, 'PYTHONPATH': str(OPTIMIZER_DIR)}
+    result = subprocess.run([sys.executable, '-c', 'import terminal'], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == ''
+    assert list(tmp_path.iterdir()) == []
+
+def test_command_line_defaults():
+    args = terminal.parse_args([])
+    assert args.data_dir == '.' and args.output_dir is None and args.cache_dir is None
+    assert args.max_distance == terminal.DEFAULT_MAX_DISTANCE_PER_TRIP
+    assert (args.fleet_search, args.workers, args.time_limit) == ('bracket', 1, 30)
+    assert args.formats == list(terminal.EXPORT_FORMATS)
+    assert terminal.early_stop_options(args) is None
+
+def test_early_stop_options():
+    args = terminal.parse_args(['--plateau-window', '2', '--plateau-improvement', '0.5',
+                                '--first-solution-timeout', '3'])
+    assert terminal.early_stop_options(args) == {
+        'plateau_window_s': 2.0, 'plateau_min_improvement': 0.005, 'first_solution_timeout_s': 3.0}
+
+def test_main_solves_exports_and_reuses_the_cache(site, tmp_path):
+    site_dir, info = site
+    argv = ['--data-dir', str(site_dir), '--output-dir', str(tmp_path / 'output'),
+            '--cache-dir', str(tmp_path / 'cache'), '--max-distance', str(info['max_distance_ft']),
+            '--subset', '10', '--time-limit', '1', '--plateau-window', '0.2',
+            '--solver-log', str(tmp_path / 'solver.jsonl'), '--stage-log', str(tmp_path / 'stages.jsonl')]
+    all_routes = terminal.main(argv)
+    assert all_routes is not None
+    assert sorted(node for route, _ in all_routes for node in route[1:-1]) == list(range(1, 11))
+    assert (tmp_path / 'output' / 'mission_paths.json').exists()
+    assert (tmp_path / 'output' / 'mission_paths.npz').exists()
+    assert terminal.main(argv) == all_routes
+    runs = [json.loads(line) for line in (tmp_path / 'stages.jsonl').read_text().splitlines()]
+    assert [run['from_cache'] for run in runs] == [False, True]
@@ -0,0 +1,62 @@
+"""Spatial partitions and the decomposed solve that stitches them together."""
+import numpy as np
+import pytest
+
+import terminal
+
+CLUSTER_CENTERS = [(0.002, 0.002), (-0.002, 0.002), (-0.002, -0.002), (0.002, -0.002)]
+CLUSTER_SIZE = 5
+EARLY_STOP = {'plateau_window_s': 0.2}
+
+def cluster_data(max_distance=3000):
+    """Depot at the origin and four clusters around it; one vehicle can serve one cluster."""
+    rng = np.random.default_rng(0)
+    points = [(0.0, 0.0)] + [(x + dx, y + dy) for x, y in CLUSTER_CENTERS
+                             for dx, dy in rng.uniform(-0.0002, 0.0002, (CLUSTER_SIZE, 2))]
+    points = np.array(points)
+    # Rough degrees to feet, like the export's estimate for non-navigable waypoints
+    delta = (points[:, None, :] - points[None, :, :]) * 364000
+    matrix = np.sqrt((delta ** 2).sum(axis=2)).astype(np.int64)
+    return {'distance_matrix': matrix, 'points_lat_long': points, 'max_distance': max_distance, 'depot': 0}
+
+def cluster_of(node):
+    return (node - 1) // CLUSTER_SIZE
+
+@pytest.mark.parametrize('method', ['sweep', 'kmeans'])
+def test_partitions_are_the_clusters(method):
+    parts = terminal.partition_photo_nodes(cluster_data(), 4, method)
+    assert sorted(np.concatenate(parts).tolist()) == list(range(1, 1 + 4 * CLUSTER_SIZE))
+    assert all(len({cluster_of(n) for n in part}) == 1 for part in parts)
+    assert sorted(cluster_of(part[0]) for part in parts) == [0, 1, 2, 3]
+
+def test_partition_count_is_capped_by_the_nodes():
+    data = cluster_data()
+    assert len(terminal.partition_photo_nodes(data, 100)) == 4 * CLUSTER_SIZE
+    assert len(terminal.partition_photo_nodes(data, 0)) == 1
+    with pytest.raises(ValueError, match='Unknown partition method'):
+        terminal.partition_photo_nodes(data, 2, 'grid')
+
+def test_subproblem_keeps_the_parent_distances():
+    data = cluster_data()
+    nodes = np.array([3, 7, 12])
+    sub, sub_nodes = terminal._subproblem(data, nodes)
+    assert sub_nodes.tolist() == [0, 3, 7, 12] and sub['depot'] == 0
+    np.testing.assert_array_equal(sub['distance_matrix'], data['distance_matrix'][np.ix_(sub_nodes, sub_nodes)])
+
+def test_decomposed_solve_visits_every_node_once():
+    data = cluster_data()
+    all_routes, stats = terminal.solve_decomposed(data, 4, 8, 1, workers=2, early_stop=EARLY_STOP)
+    visited = [node for route, _ in all_routes for node in route[1:-1]]
+    assert sorted(visited) == list(range(1, len(data['distance_matrix'])))
+    matrix = data['distance_matrix']
+    for route, dist in all_routes:
+        assert route[0] == route[-1] == 0
+        assert dist == sum(matrix[a, b] for a, b in zip(route[:-1], route[1:])) <= data['max_distance']
+    assert [p['num_nodes'] for p in stats['partitions']] == [CLUSTER_SIZE] * 4
+    assert stats['stitched']['num_vehicles'] == stats['repaired']['num_vehicles'] == 4
+
+def test_infeasible_partition_fails_the_solve():
+    # Too short to reach any cluster and back
+    all_routes, stats = terminal.solve_decomposed(cluster_data(max_distance=500), 2, 4, 1, workers=2,
+                                                  early_stop=EARLY_STOP)
+    assert all_routes is None and 'repaired' not in stats
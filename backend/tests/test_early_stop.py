@@ -0,0 +1,57 @@
+"""Plateau and first-solution limits of a single solve attempt."""
+import threading
+
+import pytest
+
+import terminal
+
+@pytest.fixture(scope='module')
+def site_data(site):
+    site_dir, info = site
+    return terminal.DroneOptimizer(site_dir, max_distance_per_trip=info['max_distance_ft']).create_data_model()
+
+def solve(data, time_limit_s, **kwargs):
+    stats = {}
+    routes, _ = terminal.solve_with_vehicles(data, 6, time_limit_s, stats=stats, **kwargs)
+    return routes, stats
+
+def test_plateau_ends_the_attempt_early(site_data):
+    routes, stats = solve(site_data, 20, early_stop={'plateau_window_s': 0.3})
+    assert routes is not None
+    assert stats['stop_reason'] == 'plateau'
+    # Stopped one window after the last real improvement, not at the time limit
+    assert stats['solve_time_s'] < 10
+    assert stats['solve_time_s'] >= stats['best_solution_s'] + 0.3 - 0.05
+
+def test_without_rules_the_attempt_runs_to_its_limit(site_data):
+    routes, stats = solve(site_data, 1)
+    assert routes is not None and stats['stop_reason'] == 'time_limit'
+    assert stats['solve_time_s'] >= 0.99
+
+def test_small_improvements_do_not_restart_the_plateau(site_data):
+    records = []
+    _, stats = solve(site_data, 20, on_solution=records.append,
+                     early_stop={'plateau_window_s': 0.3, 'plateau_min_improvement': 0.5})
+    assert stats['stop_reason'] == 'plateau'
+    # Nothing halves the first objective, so the window runs from the first solution
+    assert stats['solve_time_s'] < stats['first_solution_s'] + 0.3 + 0.5
+    assert records[-1]['objective'] > records[0]['objective'] * 0.5
+
+def test_no_first_solution_in_time_is_infeasible(site_data):
+    routes, stats = solve(site_data, 20, early_stop={'first_solution_timeout_s': 1e-6})
+    assert routes is None
+    assert stats['stop_reason'] == 'no_first_solution' and stats['first_solution_s'] is None
+
+def test_stop_event_ends_the_attempt(site_data):
+    stop = threading.Event()
+    stop.set()
+    _, stats = solve(site_data, 20, stop_event=stop)
+    assert stats['stop_reason'] == 'stopped' and stats['solve_time_s'] < 5
+
+def test_probe_report_counts_early_stops(capsys):
+    probes = [{'num_vehicles': k, 'feasible': k > 3, 'objective': 1, 'wall_time_s': 1.0, 'stop_reason': reason}
+              for k, reason in [(3, 'no_first_solution'), (4, 'plateau'), (5, 'plateau'), (6, 'time_limit')]]
+    terminal.print_probe_report(probes)
+    out = capsys.readouterr().out
+    assert 'Early stops: 2 plateau, 1 no_first_solution' in out
+    assert out.count('(stopped: ') == 3
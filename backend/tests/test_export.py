@@ -0,0 +1,76 @@
+"""Vectorized export against the per-waypoint loop it replaced."""
+import json
+
+import numpy as np
+import pytest
+
+import terminal
+
+def reference_missions(all_routes, data, optimizer):
+    """mission_paths.json missions built one waypoint at a time, like the original export."""
+    distance_matrix = np.load(optimizer.data_dir / 'distance_matrix.npy')
+    points, photo, asset = optimizer.points_lat_long, optimizer.photo_indexes, optimizer.asset_indexes
+    missions = []
+    for vehicle_id, (route, total_dist) in enumerate(all_routes):
+        expanded = [data['index_map'][route[0]]]
+        for start, end in zip(route[:-1], route[1:]):
+            expanded += terminal.reconstruct_path(data['index_map'][start], data['index_map'][end],
+                                                  optimizer.predecessors)[1:]
+        waypoints, cumulative = [], 0
+        for seq, wp in enumerate(expanded):
+            segment = distance_matrix[wp][expanded[seq + 1]] if seq < len(expanded) - 1 else 0
+            cumulative += segment
+            if wp == 0:
+                wp_type = 'depot'
+            elif photo[0] <= wp <= photo[1]:
+                wp_type = 'photo'
+            elif asset[0] <= wp <= asset[1]:
+                wp_type = 'asset'
+            else:
+                wp_type = 'intermediate'
+            lon, lat = points[wp]
+            waypoints.append({'sequence': seq, 'waypoint_index': int(wp), 'longitude': float(lon),
+                              'latitude': float(lat), 'waypoint_type': wp_type,
+                              'segment_distance_ft': float(segment), 'cumulative_distance_ft': float(cumulative)})
+        missions.append({'mission_id': vehicle_id + 1, 'total_distance_ft': float(total_dist),
+                         'num_waypoints': len(waypoints),
+                         'num_photo_points': sum(wp['waypoint_type'] == 'photo' for wp in waypoints),
+                         'depot_index': 0, 'waypoints': waypoints})
+    return missions
+
+@pytest.fixture
+def optimizer(site, tmp_path):
+    site_dir, info = site
+    return terminal.DroneOptimizer(site_dir, max_distance_per_trip=info['max_distance_ft'],
+                                   cache_dir=tmp_path / 'cache', output_dir=tmp_path / 'output')
+
+def test_exported_missions_match_the_per_waypoint_loop(optimizer, tmp_path):
+    data = optimizer.create_data_model()
+    last = len(data['route_nodes']) - 1
+    all_routes = [([0, 1, 2, 3, 0], 900), ([0, last, 0], 400), ([0, 4, 0], 300)]
+    optimizer.export(all_routes, data, formats=['json'], validate_geofence=False)
+    exported = json.loads((tmp_path / 'output' / 'mission_paths.json').read_text())['missions']
+    expected = reference_missions(all_routes, data, optimizer)
+    assert len(exported) == len(expected)
+    for mission, reference in zip(exported, expected):
+        for key, value in reference.items():
+            if key != 'waypoints':
+                assert mission[key] == value
+        assert len(mission['waypoints']) == len(reference['waypoints'])
+        for waypoint, reference_waypoint in zip(mission['waypoints'], reference['waypoints']):
+            assert waypoint == pytest.approx(reference_waypoint)
+    types = {waypoint['waypoint_type'] for mission in expected for waypoint in mission['waypoints']}
+    assert types == {'depot', 'photo', 'intermediate'}
+
+@pytest.mark.parametrize('kind, index_field', [('photo', 'waypoint_index'), ('asset', 'asset_index')])
+def test_exported_points_match_the_source_coordinates(optimizer, tmp_path, kind, index_field):
+    optimizer.export([([0, 1, 0], 100)], optimizer.create_data_model(), formats=['json'],
+                     validate_geofence=False)
+    exported = json.loads((tmp_path / 'output' / f'{kind}_points.json').read_text())
+    first, last = getattr(optimizer, f'{kind}_indexes')
+    indexes = [point[index_field] for point in exported['points']]
+    assert exported['count'] == len(indexes) and indexes[0] == first
+    assert indexes == list(range(first, first + len(indexes)))
+    for point in exported['points']:
+        lon, lat = optimizer.points_lat_long[point[index_field]]
+        assert (point['longitude'], point['latitude'], point['type']) == (lon, lat, kind)
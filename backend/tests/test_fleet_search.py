@@ -0,0 +1,117 @@
+"""Fleet-size search: the smallest feasible vehicle count, serially and in parallel."""
+import time
+
+import pytest
+
+from conftest import star_data
+import terminal
+
+NUM_LEAVES = 4
+EARLY_STOP = {'plateau_window_s': 0.2}
+
+@pytest.mark.parametrize('mode', ['bracket', 'linear'])
+def test_serial_search_returns_minimal_fleet(mode):
+    routes, probes = terminal.search_fleet_size(star_data(NUM_LEAVES), 1, 8, 2, mode=mode,
+                                                early_stop=EARLY_STOP)
+    assert len(routes) == NUM_LEAVES
+    feasible = [p['num_vehicles'] for p in probes if p['feasible']]
+    assert min(feasible) == NUM_LEAVES
+    assert all(p['num_vehicles'] >= NUM_LEAVES for p in probes if p['feasible'])
+
+@pytest.mark.parametrize('pick', ['first', 'best'])
+def test_parallel_counts_return_smallest_feasible_count(pick):
+    # One batch probes 2..5: only 4 and 5 are feasible, and 4 must win
+    # whichever finishes first
+    routes, probes = terminal.search_fleet_size_parallel(
+        star_data(NUM_LEAVES), 2, 8, 2, workers=4, pick=pick, early_stop=EARLY_STOP)
+    assert len(routes) == NUM_LEAVES
+    assert {p['num_vehicles'] for p in probes} <= {2, 3, 4, 5}
+
+def test_parallel_batch_prefers_fewer_vehicles_over_first_finished():
+    data = star_data(NUM_LEAVES)
+    # Guided local search runs to the time limit; greedy descent returns at
+    # its first local optimum, so the larger counts finish first
+    candidates = [{'num_vehicles': k, 'strategy': terminal.DEFAULT_FIRST_SOLUTION_STRATEGY, 'seed': 0,
+                   'metaheuristic': 'GUIDED_LOCAL_SEARCH' if k <= NUM_LEAVES else 'GREEDY_DESCENT'}
+                  for k in (3, 4, 5, 6)]
+    with terminal.ParallelSolver(data, 4) as solver:
+        winner, results = solver.run(candidates, 1, pick='first')
+    assert winner['num_vehicles'] == NUM_LEAVES
+    by_count = {r['num_vehicles']: r for r in results}
+    assert by_count[5]['feasible'] and by_count[5]['wall_time_s'] < by_count[4]['wall_time_s']
+    # The smaller counts ran to the end instead of being stopped
+    assert not by_count[3]['feasible'] and not by_count[3]['stopped']
+    assert not by_count[4]['stopped']
+
+def test_strategy_race_keeps_first_feasible():
+    data = star_data(NUM_LEAVES)
+    with terminal.ParallelSolver(data, 2) as solver:
+        winner, results = solver.run(terminal.make_candidates(NUM_LEAVES, 2), 1, pick='first')
+    assert winner is not None and winner['num_vehicles'] == NUM_LEAVES
+    assert winner is results[0]
+
+def test_deadline_stops_the_search():
+    start = time.perf_counter()
+    routes, probes = terminal.search_fleet_size(star_data(NUM_LEAVES), 1, 8, 30,
+                                                deadline=time.perf_counter() + 1.5)
+    assert time.perf_counter() - start < 5
+    # Probe time limits were cut to the time left
+    assert sum(p['wall_time_s'] for p in probes) < 3
+
+def test_expired_deadline_runs_no_probe():
+    routes, probes = terminal.search_fleet_size(star_data(NUM_LEAVES), 1, 8, 30,
+                                                deadline=time.perf_counter())
+    assert routes is None and probes == []
+
+def test_attempt_time_left():
+    assert terminal.attempt_time_left(30, None) == 30
+    assert terminal.attempt_time_left(30, time.perf_counter() + 5) <= 5
+    assert terminal.attempt_time_left(30, time.perf_counter() + 0.5) is None
+
+def test_probe_report_shows_elapsed_time(capsys):
+    probes = [{'num_vehicles': k, 'feasible': k == 4, 'objective': 1, 'wall_time_s': 4.0} for k in (2, 3, 4, 5)]
+    terminal.print_probe_report(probes, wall_time_s=4.1)
+    header = capsys.readouterr().out.strip().splitlines()[0]
+    assert 'in 4.1 s' in header and '16.0 s summed over probes' in header
+
+# --- Bracket search ---
+def threshold_attempt(smallest_feasible, calls):
+    """A solve_attempt that is feasible from smallest_feasible vehicles up."""
+    def attempt(num_vehicles, hint_routes, time_limit_s):
+        calls.append((num_vehicles, hint_routes))
+        if num_vehicles < smallest_feasible:
+            return None, None, {}
+        return [f'plan of {num_vehicles}'], num_vehicles, {}
+    return attempt
+
+def test_bracket_grows_then_bisects():
+    calls = []
+    routes, probes = terminal.search_fleet_size(star_data(1), 1, 60, 1, solve_attempt=threshold_attempt(13, calls))
+    assert routes == ['plan of 13']
+    assert [k for k, _ in calls] == [1, 2, 4, 8, 16, 12, 14, 13]
+    # Every probe after the first feasible one starts from the best plan so far
+    assert [hint for k, hint in calls if k in (12, 14)] == [['plan of 16']] * 2
+    assert dict(calls)[13] == ['plan of 14']
+    assert [p['hinted'] for p in probes] == [False] * 5 + [True] * 3
+
+def test_bracket_probes_far_fewer_counts_than_linear():
+    bracket, linear = [], []
+    terminal.search_fleet_size(star_data(1), 1, 60, 1, solve_attempt=threshold_attempt(40, bracket))
+    terminal.search_fleet_size(star_data(1), 1, 60, 1, mode='linear', solve_attempt=threshold_attempt(40, linear))
+    assert len(linear) == 40 and len(bracket) <= 12
+
+@pytest.mark.parametrize('min_vehicles, max_vehicles, expected', [(1, 60, 1), (5, 60, 5), (1, 9, 9)])
+def test_bracket_edges(min_vehicles, max_vehicles, expected):
+    calls = []
+    routes, _ = terminal.search_fleet_size(star_data(1), min_vehicles, max_vehicles, 1,
+                                           solve_attempt=threshold_attempt(expected, calls))
+    assert routes == [f'plan of {expected}']
+    assert all(min_vehicles <= k <= max_vehicles for k, _ in calls)
+
+def test_bracket_without_a_feasible_count():
+    calls = []
+    routes, probes = terminal.search_fleet_size(star_data(1), 1, 10, 1, solve_attempt=threshold_attempt(11, calls))
+    assert routes is None and not any(p['feasible'] for p in probes)
+    assert [k for k, _ in calls] == [1, 2, 4, 8, 10]
+    with pytest.raises(ValueError, match='Unknown fleet search mode'):
+        terminal.search_fleet_size(star_data(1), 1, 10, 1, mode='binary', solve_attempt=threshold_attempt(1, []))
@@ -0,0 +1,85 @@
+"""Geofence validation of mission paths against the flight polygon."""
+import numpy as np
+import pytest
+import shapely
+from shapely.geometry import LineString, Polygon
+
+from geofence import Geofence
+
+# U-shaped boundary: a 0.01° square with a notch cut in from the top
+U_SHAPE = Polygon([(0, 0), (0.01, 0), (0.01, 0.01), (0.007, 0.01), (0.007, 0.003),
+                   (0.003, 0.003), (0.003, 0.01), (0, 0.01)])
+
+def check(missions, polygon=U_SHAPE):
+    """Geofence report of missions given as lists of (lon, lat)."""
+    coords = np.array([point for mission in missions for point in mission], dtype=np.float64).reshape(-1, 2)
+    offsets = np.concatenate(([0], np.cumsum([len(mission) for mission in missions])))
+    return Geofence(polygon).check(coords[:, 0], coords[:, 1], offsets)
+
+def test_mission_inside_passes():
+    report = check([[(0.001, 0.001), (0.009, 0.001), (0.009, 0.009), (0.008, 0.002)]])
+    assert report['violations'] == []
+    assert report['num_segments'] == 3
+
+def test_leg_across_the_notch_is_a_crossing():
+    # Both ends are inside, the leg between them is not
+    report = check([[(0.001, 0.001), (0.001, 0.008), (0.009, 0.008), (0.009, 0.001)]])
+    assert report['violations'] == [{'mission_id': 1, 'outside_waypoints': 0,
+                                     'crossing_segments': 1, 'first_violation': 1}]
+
+def test_outside_waypoint_is_reported():
+    report = check([[(0.001, 0.001), (0.005, 0.008), (0.001, 0.001)]])
+    assert report['violations'][0]['outside_waypoints'] == 1
+    assert report['violations'][0]['first_violation'] == 1
+
+def test_waypoints_on_the_boundary_are_inside():
+    report = check([[(0.0, 0.0), (0.003, 0.005), (0.003, 0.003), (0.007, 0.003), (0.01, 0.01)]])
+    assert report['violations'] == []
+
+def test_only_violating_missions_are_listed():
+    missions = [
+        [(0.001, 0.001), (0.002, 0.002)],
+        [],
+        [(0.001, 0.009), (0.009, 0.009)],
+        [(0.008, 0.008), (0.009, 0.009)],
+    ]
+    report = check(missions)
+    assert report['num_missions'] == 4
+    assert [v['mission_id'] for v in report['violations']] == [3]
+    # Segments do not run from one mission into the next
+    assert report['num_segments'] == 3
+
+def test_polygon_with_a_hole():
+    ring = [(0, 0), (0.01, 0), (0.01, 0.01), (0, 0.01)]
+    hole = [(0.004, 0.004), (0.006, 0.004), (0.006, 0.006), (0.004, 0.006)]
+    report = check([[(0.001, 0.005), (0.009, 0.005)]], polygon=Polygon(ring, [hole]))
+    assert report['violations'][0]['crossing_segments'] == 1
+
+def test_matches_a_segment_by_segment_check():
+    rng = np.random.default_rng(0)
+    missions = [[tuple(p) for p in rng.uniform(-0.001, 0.011, size=(rng.integers(2, 12), 2))]
+                for _ in range(40)]
+    report = check(missions)
+    fence = U_SHAPE.buffer(1.0 / 364000)
+    expected = []
+    for mission_id, mission in enumerate(missions, start=1):
+        outside = sum(not fence.covers(shapely.Point(p)) for p in mission)
+        crossing = sum(fence.covers(shapely.Point(a)) and fence.covers(shapely.Point(b))
+                       and not fence.covers(LineString([a, b]))
+                       for a, b in zip(mission[:-1], mission[1:]))
+        if outside or crossing:
+            expected.append((mission_id, outside, crossing))
+    assert [(v['mission_id'], v['outside_waypoints'], v['crossing_segments'])
+            for v in report['violations']] == expected
+
+def test_photo_waypoints_of_a_site_are_inside(site):
+    from terminal import DroneOptimizer
+
+    site_dir, info = site
+    optimizer = DroneOptimizer(site_dir, max_distance_per_trip=info['max_distance_ft'])
+    first, last = optimizer.photo_indexes
+    # points_lat_long holds lon, lat columns
+    points = optimizer.points_lat_long[first:last + 1]
+    report = Geofence(optimizer.polygon).check(points[:, 0], points[:, 1], [0, len(points)])
+    assert report['num_waypoints'] == len(points)
+    assert report['violations'] == []
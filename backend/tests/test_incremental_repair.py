@@ -0,0 +1,74 @@
+"""Incremental repair of a cached plan after waypoints were added or removed."""
+import numpy as np
+
+from conftest import star_data
+import terminal
+
+EARLY_STOP = {'plateau_window_s': 0.2}
+
+def star_model(route_nodes):
+    """Star data model whose local nodes are the given global waypoints."""
+    data = star_data(len(route_nodes) - 1)
+    data['route_nodes'] = np.asarray(route_nodes)
+    return data
+
+def visited(all_routes):
+    return sorted(node for route, _ in all_routes for node in route[1:-1])
+
+# --- Cheapest insertion ---
+def test_nodes_go_to_their_cheapest_position():
+    # Depot and nodes 1 to 3 on a line, 10 ft apart
+    positions = np.arange(4) * 10
+    matrix = np.abs(positions[:, None] - positions[None, :])
+    routes = [[1, 3], []]
+    assert terminal.insert_nodes_cheapest(routes, [2], matrix, 60)
+    assert routes == [[1, 2, 3], []]
+    # Too long for the first route: the empty one takes it
+    routes = [[1, 3], []]
+    assert terminal.insert_nodes_cheapest(routes, [2], matrix, 59)
+    assert routes == [[1, 3], [2]]
+    assert not terminal.insert_nodes_cheapest([[1, 3]], [2], matrix, 59)
+
+def test_hint_dissolves_the_shortest_routes():
+    data = star_data(4, max_distance=1000)
+    routes = [([0, 1, 0], 200), ([0, 2, 3, 0], 400), ([0, 4, 0], 200)]
+    hint = terminal.routes_to_hint(routes, 2, data['distance_matrix'], data['max_distance'])
+    assert len(hint) == 2 and sorted(n for inner in hint for n in inner) == [1, 2, 3, 4]
+    assert terminal.routes_to_hint(routes, 5, data['distance_matrix'], data['max_distance'])[3:] == [[], []]
+    # With one leaf per vehicle the routes cannot be merged
+    assert terminal.routes_to_hint(routes, 2, data['distance_matrix'], 250) is None
+
+# --- Repair ---
+def test_repair_visits_exactly_the_new_waypoints():
+    old = star_model([0, 10, 11, 12, 13])
+    old_routes = [([0, leaf, 0], 200) for leaf in range(1, 5)]
+    # 12 removed, 14 and 15 added
+    new = star_model([0, 10, 11, 13, 14, 15])
+    all_routes, stats = terminal.reoptimize_incremental(new, old_routes, old['route_nodes'], 1,
+                                                        early_stop=EARLY_STOP)
+    assert (stats['added'], stats['removed']) == (2, 1)
+    assert visited(all_routes) == [1, 2, 3, 4, 5]
+    assert all(dist <= new['max_distance'] for _, dist in all_routes)
+    # Each leaf needs its own vehicle, so the added ones opened new routes
+    assert stats['num_vehicles'] == 5
+
+def test_repair_of_an_optimizer_plan_keeps_coverage(site, tmp_path):
+    site_dir, info = site
+    optimizer = terminal.DroneOptimizer(site_dir, max_distance_per_trip=info['max_distance_ft'],
+                                        cache_dir=tmp_path / 'cache', output_dir=tmp_path / 'output')
+    first = optimizer.solve(per_attempt_time_s=1, early_stop=EARLY_STOP)
+    old_key = optimizer.cache_key
+    photo_start, waypoint_start = int(optimizer.photo_indexes[0]), int(optimizer.waypoint_indexes[0])
+    removed, added = [photo_start + 3, photo_start + 7], [waypoint_start, waypoint_start + 1]
+    repaired = optimizer.solve(per_attempt_time_s=1, incremental_from=old_key, remove_nodes=removed,
+                               add_nodes=added, repair_time_s=1, early_stop=EARLY_STOP)
+    assert first is not None and repaired is not None
+    # A repair, cached under a key of its own
+    requested = optimizer.prepare_solve(per_attempt_time_s=1, remove_nodes=removed, add_nodes=added,
+                                        early_stop=EARLY_STOP)[2]
+    assert optimizer.cache_key != requested
+    global_visited = sorted(int(optimizer.data['route_nodes'][n]) for n in visited(repaired))
+    expected = sorted(set(optimizer.data['route_nodes'][1:].tolist()))
+    assert global_visited == expected
+    assert not set(removed) & set(global_visited) and set(added) <= set(global_visited)
+    assert all(dist <= optimizer.data['max_distance'] for _, dist in repaired)
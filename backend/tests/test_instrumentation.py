@@ -0,0 +1,104 @@
+"""Stage timings and memory peaks, and the Prometheus /metrics endpoint."""
+import json
+import re
+import time
+import tracemalloc
+
+import numpy as np
+import pytest
+
+import instrumentation
+import metrics
+
+@pytest.fixture
+def recorder():
+    recorder = instrumentation.StageRecorder()
+    yield recorder
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+def test_stages_nest_and_add_up(recorder):
+    with recorder.stage('solve', num_vehicles=3):
+        with recorder.stage('model_build'):
+            time.sleep(0.02)
+        with recorder.stage('model_build'):
+            time.sleep(0.01)
+    assert [record['stage'] for record in recorder.records] == ['model_build', 'model_build', 'solve']
+    assert recorder.records[-1]['num_vehicles'] == 3
+    summary = recorder.summary()
+    assert list(summary) == ['model_build', 'solve']
+    build = summary['model_build']
+    assert build['count'] == 2 and build['max_time_s'] >= 0.02 and build['time_s'] >= 0.03
+    assert summary['solve']['time_s'] >= build['time_s']
+    assert build['peak_traced_bytes'] is None
+
+def test_memory_peaks_include_the_children(recorder):
+    recorder.enable_memory_tracing()
+    with recorder.stage('export'):
+        with recorder.stage('bundle'):
+            block = np.ones(2 ** 20)
+            del block
+    peaks = {record['stage']: record['peak_traced_bytes'] for record in recorder.records}
+    assert peaks['bundle'] >= 8 * 2 ** 20
+    assert peaks['export'] >= peaks['bundle']
+
+def test_timed_records_every_call(monkeypatch, recorder):
+    monkeypatch.setattr(instrumentation, 'stages', recorder)
+
+    @instrumentation.timed('expand')
+    def expand(n):
+        return n * 2
+
+    assert expand(2) == 4 and expand(3) == 6
+    assert recorder.summary()['expand']['count'] == 2
+
+def test_stage_log_appends_one_line_per_run(recorder, tmp_path):
+    with recorder.stage('load', array='distance_matrix'):
+        pass
+    path = recorder.write(tmp_path / 'logs' / 'stages.jsonl', subset=10)
+    recorder.write(path, subset=20)
+    runs = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [run['subset'] for run in runs] == [10, 20]
+    assert runs[0]['summary']['load']['count'] == 1 and runs[0]['records'][0]['array'] == 'distance_matrix'
+
+# --- /metrics ---
+def test_histogram_exposition_format():
+    histogram = metrics.Histogram('demo_seconds', 'Demo latency.', (0.1, 1.0), ('endpoint',))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, endpoint='/a"b')
+    assert histogram.render().splitlines() == [
+        '# HELP demo_seconds Demo latency.',
+        '# TYPE demo_seconds histogram',
+        'demo_seconds_bucket{endpoint="/a\\"b",le="0.1"} 2',
+        'demo_seconds_bucket{endpoint="/a\\"b",le="1.0"} 3',
+        'demo_seconds_bucket{endpoint="/a\\"b",le="+Inf"} 4',
+        'demo_seconds_sum{endpoint="/a\\"b"} 3.65',
+        'demo_seconds_count{endpoint="/a\\"b"} 4',
+    ]
+
+def series_count(text, metric, **labels):
+    """Value of <metric>_count for the series with exactly these labels, 0 if absent."""
+    wanted = ','.join(f'{name}="{value}"' for name, value in labels.items())
+    match = re.search(rf'^{metric}_count\{{{re.escape(wanted)}\}} (\d+)$', text, re.MULTILINE)
+    return int(match.group(1)) if match else 0
+
+def test_metrics_endpoint_counts_requests_per_route(client):
+    latency = 'gridwatch_http_request_duration_seconds'
+    before = client.get('/metrics').get_data(as_text=True)
+    client.get('/missions/1')
+    client.get('/missions/2')
+    client.get('/missions/999')
+    client.get('/no-such-page')
+    response = client.get('/metrics')
+    assert response.content_type == metrics.CONTENT_TYPE
+    after = response.get_data(as_text=True)
+
+    def delta(**labels):
+        return series_count(after, latency, **labels) - series_count(before, latency, **labels)
+
+    # Labelled by route rule, not by URL
+    assert delta(method='GET', endpoint='/missions/<int:mission_id>', status='200') == 2
+    assert delta(method='GET', endpoint='/missions/<int:mission_id>', status='404') == 1
+    assert delta(method='GET', endpoint='unmatched', status='404') == 1
+    assert '# TYPE gridwatch_http_response_size_bytes histogram' in after
+    assert after.endswith('\n')
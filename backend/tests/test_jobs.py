@@ -0,0 +1,139 @@
+"""Optimization jobs: parameter validation, deduplication and publishing."""
+import json
+import shutil
+
+import numpy as np
+import pytest
+
+import jobs
+
+@pytest.fixture
+def site_copy(site, tmp_path):
+    """A private copy of the generated site whose inputs a test may change."""
+    site_dir, info = site
+    data_dir = tmp_path / 'site'
+    shutil.copytree(site_dir, data_dir)
+    return data_dir, info
+
+@pytest.fixture
+def manager(site_copy, tmp_path):
+    data_dir, _ = site_copy
+    manager = jobs.JobManager(data_dir, tmp_path / 'output')
+    yield manager
+    manager.shutdown()
+
+def job_params(info, **overrides):
+    return jobs.parse_job_params({'max_distance': info['max_distance_ft'], 'time_limit': 1, **overrides})
+
+# --- Parameters ---
+def test_defaults_are_filled_in():
+    params = jobs.parse_job_params({})
+    assert params['time_limit'] == 30 and params['max_vehicles'] == 60
+    assert params['max_distance'] is not None and params['subset'] is None
+
+@pytest.mark.parametrize('payload, message', [
+    ({'speed': 3}, 'Unknown parameters: speed'),
+    ({'time_limit': True}, 'time_limit must be an integer'),
+    ({'subset': 2.5}, 'subset must be an integer'),
+    ({'max_vehicles': 0}, 'max_vehicles must be >= 1'),
+    ({'min_vehicles': 10, 'max_vehicles': 5}, 'min_vehicles must be <= max_vehicles'),
+    ([1, 2], 'Expected a JSON object'),
+])
+def test_invalid_parameters_are_rejected(payload, message):
+    with pytest.raises(ValueError, match=message):
+        jobs.parse_job_params(payload)
+
+# --- Deduplication ---
+def test_solution_key_matches_the_optimizer(manager, site_copy):
+    from terminal import DroneOptimizer
+
+    data_dir, info = site_copy
+    params = job_params(info)
+    optimizer = DroneOptimizer(data_dir, max_distance_per_trip=info['max_distance_ft'])
+    assert manager.solution_key(params) == optimizer.prepare_solve(**jobs._solve_options(params))[2]
+
+def test_solution_key_follows_changed_inputs(manager, site_copy):
+    data_dir, info = site_copy
+    params = job_params(info)
+    before = manager.solution_key(params)
+    assert manager.solution_key(params) == before
+
+    photo = np.load(data_dir / 'photo_indexes.npy')
+    photo[1] -= 2
+    np.save(data_dir / 'photo_indexes.npy', photo)
+    assert manager.solution_key(params) != before
+
+def test_published_solution_is_not_solved_again(manager, site_copy):
+    _, info = site_copy
+    params = job_params(info)
+    manager.output_dir.mkdir()
+    (manager.output_dir / 'export_manifest.json').write_text(
+        json.dumps({'generation': 7, 'cache_key': manager.solution_key(params), 'files': {}}))
+
+    job, created = manager.submit(params)
+    assert not created
+    assert job['status'] == 'done'
+    assert job['result'] == {'feasible': True, 'cache_key': manager.solution_key(params),
+                             'deduplicated': True, 'generation': 7}
+    # Nothing was started
+    assert manager._pool is None
+
+def test_stale_published_solution_is_not_reused(manager, site_copy):
+    data_dir, info = site_copy
+    params = job_params(info)
+    manager.output_dir.mkdir()
+    (manager.output_dir / 'export_manifest.json').write_text(
+        json.dumps({'generation': 1, 'cache_key': manager.solution_key(params), 'files': {}}))
+    photo = np.load(data_dir / 'photo_indexes.npy')
+    photo[1] -= 2
+    np.save(data_dir / 'photo_indexes.npy', photo)
+
+    published = manager.published_manifest()['cache_key']
+    assert manager.solution_key(params) != published
+
+def test_running_job_with_same_parameters_is_returned(manager, site_copy):
+    _, info = site_copy
+    params = job_params(info)
+    job = {'id': 'running1', 'status': 'running', 'params': params, 'progress': {},
+           'started_at': None, 'finished_at': None}
+    manager.jobs[job['id']] = job
+    manager._active[json.dumps(params, sort_keys=True)] = job['id']
+    snapshot, created = manager.submit(params)
+    assert not created and snapshot['id'] == 'running1'
+
+# --- Running and publishing ---
+def test_job_runs_and_publishes_atomically(manager, site_copy, tmp_path):
+    data_dir, info = site_copy
+    params = job_params(info)
+    staging_dir = tmp_path / 'staging'
+    staging_dir.mkdir()
+    progress = {}
+    result = jobs.run_job('job1', params, str(data_dir), str(manager.cache_dir), str(staging_dir),
+                          progress, str(tmp_path / 'job1.jsonl'))
+    assert result['feasible']
+    assert result['cache_key'] == manager.solution_key(params)
+    assert progress['job1']['stage'] == 'exported'
+    assert 'solve' in result['stages']
+    assert {path.name for path in staging_dir.iterdir()} == {*result['files'], 'export_manifest.json'}
+
+    manifest = manager.publish(staging_dir, result)
+    assert manifest['generation'] == 1 and manifest['cache_key'] == result['cache_key']
+    # The exported files were moved; publish writes its own manifest last
+    assert [path.name for path in staging_dir.iterdir()] == ['export_manifest.json']
+    assert {path.name for path in manager.output_dir.iterdir()} == {*result['files'], 'export_manifest.json'}
+    assert manager.published_manifest() == manifest
+
+    # A second publish bumps the generation
+    for name in result['files']:
+        shutil.copy(manager.output_dir / name, staging_dir / name)
+    assert manager.publish(staging_dir, result)['generation'] == 2
+
+def test_solver_log_reads_complete_lines_only(manager):
+    path = manager.solver_log_path('job2')
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b'{"t": 1}\n{"t": 2}\n{"t": ')
+    records, offset = manager.read_solver_log('job2')
+    assert records == [{'t': 1}, {'t': 2}]
+    with open(path, 'ab') as f:
+        f.write(b'3}\n')
+    assert manager.read_solver_log('job2', offset) == ([{'t': 3}], path.stat().st_size)
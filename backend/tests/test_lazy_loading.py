@@ -0,0 +1,57 @@
+"""Memory-mapped matrices and input arrays loaded on first use."""
+import numpy as np
+import pytest
+
+from conftest import star_data
+import terminal
+
+@pytest.fixture
+def optimizer(site):
+    site_dir, info = site
+    return terminal.DroneOptimizer(site_dir, max_distance_per_trip=info['max_distance_ft'])
+
+def test_matrices_are_read_only_memmaps(site):
+    site_dir, _ = site
+    for name in terminal.MMAP_ARRAYS:
+        array = terminal.load_array(site_dir, name)
+        assert isinstance(array, np.memmap) and not array.flags.writeable
+    assert not isinstance(terminal.load_array(site_dir, 'photo_indexes'), np.memmap)
+
+def test_arrays_are_loaded_on_first_access_only(optimizer, monkeypatch):
+    loads = []
+    original = terminal.load_array
+    monkeypatch.setattr(terminal, 'load_array', lambda data_dir, name: loads.append(name) or original(data_dir, name))
+    fresh = terminal.DroneOptimizer(optimizer.data_dir, max_distance_per_trip=optimizer.max_distance_per_trip)
+    assert loads == []
+    fresh.photo_indexes
+    fresh.photo_indexes
+    assert loads == ['photo_indexes']
+
+def test_data_model_matches_the_eager_matrix(optimizer):
+    data = optimizer.create_data_model()
+    eager = np.load(optimizer.data_dir / 'distance_matrix.npy')
+    nodes = data['route_nodes']
+    np.testing.assert_array_equal(data['distance_matrix'], eager[np.ix_(nodes, nodes)].astype(np.int32))
+    assert type(data['distance_matrix']) is np.ndarray
+
+def test_min_vehicle_estimate_reads_row_blocks(monkeypatch):
+    data = star_data(2500)
+    expected = terminal.estimate_min_vehicles(data['distance_matrix'], 250)
+    # Every node's cheapest arc is 100 ft: ceil(2501 * 100 * 1.5 / 250)
+    assert expected == 1501
+    blocks = []
+    original = np.asarray
+    monkeypatch.setattr(terminal.np, 'asarray',
+                        lambda a, *args, **kwargs: blocks.append(len(a)) or original(a, *args, **kwargs))
+    assert terminal.estimate_min_vehicles(data['distance_matrix'], 250) == expected
+    # 2501 rows in three blocks
+    assert blocks == [1024, 1024, 453]
+
+def test_path_reads_one_predecessor_row(optimizer):
+    predecessors = optimizer.predecessors
+    matrix = np.load(optimizer.data_dir / 'distance_matrix.npy')
+    start, end = 0, len(matrix) - 1
+    path = terminal.reconstruct_path(start, end, predecessors)
+    assert path[0] == start and path[-1] == end
+    assert sum(matrix[a, b] for a, b in zip(path[:-1], path[1:])) == pytest.approx(matrix[start, end])
+    assert terminal.reconstruct_path(5, 5, predecessors) == [5]
@@ -0,0 +1,119 @@
+"""Compact tiled storage of the distance and predecessor matrices."""
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+import matrix_store
+
+@pytest.fixture
+def small_tiles(monkeypatch):
+    # A few rows per tile so reads span several tiles
+    monkeypatch.setattr(matrix_store, 'TILE_BYTES', 256)
+
+@pytest.fixture
+def stored_site(site, tmp_path, small_tiles):
+    site_dir, _ = site
+    data_dir = tmp_path / 'site'
+    shutil.copytree(site_dir, data_dir)
+    report = matrix_store.build_store(data_dir)
+    return data_dir, report
+
+def test_dtypes_are_the_narrowest_that_fit():
+    assert matrix_store.distance_dtype(65534) == np.uint16
+    assert matrix_store.distance_dtype(65535) == np.uint32
+    with pytest.raises(ValueError):
+        matrix_store.distance_dtype(2 ** 32)
+    assert matrix_store.predecessor_dtype(32768) == np.int16
+    assert matrix_store.predecessor_dtype(32769) == np.int32
+
+def test_store_uses_several_tiles_and_fewer_bytes(stored_site):
+    _, report = stored_site
+    for entry in report.values():
+        assert entry['num_tiles'] > 1
+        assert entry['bytes'] <= entry['source_bytes']
+
+@pytest.mark.parametrize('name', matrix_store.STORED_MATRICES)
+def test_tiled_reads_match_the_source(stored_site, name):
+    data_dir, _ = stored_site
+    source = np.load(data_dir / f'{name}.npy')
+    tiled = matrix_store.open_stored(data_dir, name)
+    if name == 'distance_matrix':
+        # The solver truncates distances to integers
+        source = source.astype(np.int64)
+    n = source.shape[0]
+    rng = np.random.default_rng(0)
+    rows, cols = rng.integers(0, n, 50), rng.integers(0, n, 50)
+
+    assert tiled.shape == source.shape and len(tiled) == n
+    np.testing.assert_array_equal(tiled[7], source[7])
+    np.testing.assert_array_equal(tiled[-1], source[-1])
+    np.testing.assert_array_equal(tiled[3, 5], source[3, 5])
+    np.testing.assert_array_equal(tiled[rows, cols], source[rows, cols])
+    np.testing.assert_array_equal(tiled[rows[:5, None], cols[None, :5]], source[rows[:5, None], cols[None, :5]])
+    np.testing.assert_array_equal(tiled[np.ix_(rows, cols)], source[np.ix_(rows, cols)])
+    np.testing.assert_array_equal(tiled[2:n - 3], source[2:n - 3])
+    np.testing.assert_array_equal(tiled[4:9, 1:6], source[4:9, 1:6])
+    np.testing.assert_array_equal(tiled.rows(rows, 3), source[rows, 3])
+
+def test_unreachable_distances_become_the_sentinel(tmp_path):
+    matrix = np.array([[0, 10, np.inf], [10, 0, 20.9], [np.inf, 20.9, 0]])
+    meta = matrix_store.write_tiles(matrix, tmp_path / 'm', np.dtype(np.uint16), unreachable=65535)
+    tiled = matrix_store.TiledMatrix(tmp_path / 'm')
+    assert meta['unreachable'] == tiled.unreachable == 65535
+    assert tiled[0, 2] == 65535 and tiled[1, 2] == 20
+
+def test_stale_store_is_ignored(stored_site):
+    data_dir, _ = stored_site
+    assert matrix_store.open_stored(data_dir, 'distance_matrix') is not None
+    source = data_dir / 'distance_matrix.npy'
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert matrix_store.open_stored(data_dir, 'distance_matrix') is None
+    # Without the source .npy the store is used as is
+    source.unlink()
+    assert matrix_store.open_stored(data_dir, 'distance_matrix') is not None
+
+def test_missing_store(tmp_path):
+    assert matrix_store.open_stored(tmp_path, 'distance_matrix') is None
+
+def test_optimizer_gives_the_same_cache_key_from_the_store(site, stored_site):
+    from terminal import DroneOptimizer
+
+    site_dir, info = site
+    data_dir, _ = stored_site
+    plain = DroneOptimizer(site_dir, max_distance_per_trip=info['max_distance_ft'])
+    stored = DroneOptimizer(data_dir, max_distance_per_trip=info['max_distance_ft'])
+    assert isinstance(stored.distance_matrix, matrix_store.TiledMatrix)
+    assert plain.prepare_solve()[2] == stored.prepare_solve()[2]
+
+def test_distances_that_do_not_fit_fail_the_build(tmp_path):
+    matrix = np.array([[0, 70000.0], [70000.0, 0]])
+    with pytest.raises(ValueError, match='does not fit uint16'):
+        matrix_store.write_tiles(matrix, tmp_path / 'm', np.dtype(np.uint16), unreachable=65535)
+    assert not (tmp_path / 'm').exists() and not (tmp_path / 'm.partial').exists()
+
+    # A uint16 source keeps its dtype; a real 65535 ft path would read back as unreachable
+    np.save(tmp_path / 'distance_matrix.npy', np.array([[0, 65535], [65535, 0]], dtype=np.uint16))
+    np.save(tmp_path / 'predecessors.npy', np.array([[-9999, 0], [1, -9999]], dtype=np.int32))
+    with pytest.raises(ValueError, match='65535'):
+        matrix_store.build_store(tmp_path)
+    np.save(tmp_path / 'distance_matrix.npy', np.array([[0, 65534], [65534, 0]], dtype=np.uint16))
+    assert matrix_store.build_store(tmp_path)['distance_matrix']['dtype'] == 'uint16'
+
+def test_export_keeps_the_float_segment_distances(site, stored_site):
+    from terminal import DroneOptimizer
+
+    data_dir, _ = stored_site
+    optimizer = DroneOptimizer(data_dir, max_distance_per_trip=site[1]['max_distance_ft'])
+    data = optimizer.create_data_model()
+    routes = [([0, 1, 2, 0], 0), ([0, 3, 0], 0)]
+    bundle = optimizer.mission_bundle(routes, data)
+    source = np.load(data_dir / 'distance_matrix.npy')
+    flat = bundle['waypoint_index'].astype(np.int64)
+    last = bundle['offsets'][1:] - 1
+    segments = np.setdiff1d(np.arange(len(flat)), last)
+    assert isinstance(optimizer.distance_matrix, matrix_store.TiledMatrix)
+    np.testing.assert_array_equal(bundle['segment_distance_ft'][segments], source[flat[segments], flat[segments + 1]])
+    assert (bundle['segment_distance_ft'] % 1 > 0).any()
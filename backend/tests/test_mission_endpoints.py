@@ -0,0 +1,108 @@
+"""Per-mission endpoints, and readers that never mix two published exports."""
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+import pytest
+
+import jobs
+import mission_format
+import server
+
+def test_summary_lists_every_mission_without_waypoints(client):
+    summary = client.get('/missions/summary').get_json()
+    full = client.get('/mission-data').get_json()['missionPaths']
+    assert summary['summary'] == full['summary']
+    assert len(summary['missions']) == len(full['missions'])
+    for mission, expected in zip(summary['missions'], full['missions']):
+        assert 'waypoints' not in mission
+        assert mission == {key: value for key, value in expected.items() if key != 'waypoints'}
+
+def test_mission_matches_the_full_plan(client):
+    full = client.get('/mission-data').get_json()['missionPaths']['missions']
+    for mission_id in (1, len(full)):
+        mission = client.get(f'/missions/{mission_id}').get_json()
+        assert mission['lod_tolerance_ft'] == 0.0
+        assert mission['waypoints'] == full[mission_id - 1]['waypoints']
+
+def test_fields_are_projected(client):
+    waypoints = client.get('/missions/1?fields=latitude,sequence').get_json()['waypoints']
+    assert [waypoint['sequence'] for waypoint in waypoints] == list(range(len(waypoints)))
+    assert all(set(waypoint) == {'sequence', 'latitude'} for waypoint in waypoints)
+
+@pytest.mark.parametrize('query, limit', [('decimate=3', None), ('max_points=5', 5)])
+def test_decimation_keeps_the_endpoints(client, query, limit):
+    full = client.get('/missions/1?fields=sequence').get_json()['waypoints']
+    decimated = client.get(f'/missions/1?fields=sequence&{query}').get_json()['waypoints']
+    assert decimated[0] == full[0] and decimated[-1] == full[-1]
+    assert len(decimated) < len(full)
+    if limit:
+        assert len(decimated) <= limit
+
+def test_zoomed_out_route_is_simplified(client):
+    full = client.get('/missions/1?fields=sequence').get_json()
+    coarse = client.get('/missions/1?fields=sequence&zoom=10').get_json()
+    assert coarse['lod_tolerance_ft'] > 0
+    assert len(coarse['waypoints']) < len(full['waypoints'])
+    assert coarse['waypoints'][-1] == full['waypoints'][-1]
+
+@pytest.mark.parametrize('url, status', [
+    ('/missions/0', 404),
+    ('/missions/999', 404),
+    ('/missions/1?fields=altitude', 400),
+    ('/missions/1?decimate=0', 400),
+    ('/missions/1?max_points=1', 400),
+])
+def test_invalid_requests(client, url, status):
+    response = client.get(url)
+    assert response.status_code == status
+    assert 'error' in response.get_json()
+
+# --- Publishing ---
+def stage_new_export(output_dir, staging_dir):
+    """A staged export that differs from output_dir in two files."""
+    staging_dir.mkdir()
+    bundle = mission_format.load_missions(output_dir / 'mission_paths.npz')
+    bundle['meta'] = {**bundle['meta'], 'max_distance_per_mission_ft': 1}
+    mission_format.save_missions(staging_dir / 'mission_paths.npz', bundle)
+    with np.load(output_dir / 'photo_points.npz') as npz:
+        coords = np.column_stack([npz['longitude'], npz['latitude']])[:-1]
+        mission_format.save_points(staging_dir / 'photo_points.npz', 'photo', npz['index'][:-1], coords)
+    return {'files': {'mission_paths.npz': {}, 'photo_points.npz': {}}, 'write_time_s': 0.0, 'cache_key': 'new'}
+
+def test_readers_see_whole_exports_only(exported, tmp_path, monkeypatch):
+    output_dir = tmp_path / 'output'
+    shutil.copytree(exported, output_dir)
+    monkeypatch.setattr(server, 'OUTPUT_DIR', output_dir)
+    server._response_cache.clear()
+    server._parsed_cache.clear()
+    client = server.app.test_client()
+    before = client.get('/mission-data').get_json()
+    result = stage_new_export(output_dir, tmp_path / 'staging')
+    manager = jobs.JobManager(tmp_path, output_dir, publish_lock=server._response_cache_lock)
+
+    responses = {}
+    reader = threading.Thread(
+        target=lambda: responses.update(stream=client.get('/mission-data/stream').data,
+                                        data=client.get('/mission-data').get_json()))
+    original_replace = os.replace
+
+    def replace_then_read(src, dst):
+        original_replace(src, dst)
+        # Halfway through the publish: the reader must wait for the rest
+        if not reader.is_alive() and not responses:
+            reader.start()
+            reader.join(0.5)
+            assert reader.is_alive()
+    monkeypatch.setattr(jobs.os, 'replace', replace_then_read)
+    manager.publish(tmp_path / 'staging', result)
+    reader.join(10)
+
+    data = responses['data']
+    assert data['missionPaths']['summary']['max_distance_per_mission_ft'] == 1
+    assert data['photoPoints']['count'] == before['photoPoints']['count'] - 1
+    records = [json.loads(line) for line in responses['stream'].decode().splitlines()]
+    assert records[0]['summary']['max_distance_per_mission_ft'] == 1
+    assert records[3]['data']['count'] == data['photoPoints']['count']
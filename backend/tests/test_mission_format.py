@@ -0,0 +1,127 @@
+"""Level-of-detail simplification, decimation and the columnar mission bundle."""
+import json
+
+import numpy as np
+import pytest
+
+import mission_format
+from mission_format import FEET_PER_DEGREE, LOD_TOLERANCES_FT
+
+LAT0 = 33.7
+
+def to_lon_lat(x_ft, y_ft):
+    """Planar feet back to lon/lat with the projection simplification_tolerances uses."""
+    latitude = LAT0 + np.asarray(y_ft, dtype=np.float64) / FEET_PER_DEGREE
+    lat0 = np.radians(np.mean(latitude))
+    longitude = -117.8 + np.asarray(x_ft, dtype=np.float64) / (FEET_PER_DEGREE * np.cos(lat0))
+    return longitude, latitude
+
+def douglas_peucker(x, y, tolerance):
+    """Reference recursive Douglas-Peucker: sorted positions kept at tolerance."""
+    def deviation(a, b, i):
+        dx, dy = x[b] - x[a], y[b] - y[a]
+        px, py = x[i] - x[a], y[i] - y[a]
+        length_sq = dx * dx + dy * dy
+        t = min(max((px * dx + py * dy) / length_sq, 0.0), 1.0) if length_sq > 0 else 0.0
+        return np.hypot(px - t * dx, py - t * dy)
+
+    keep = {0, len(x) - 1}
+
+    def split(a, b):
+        if b - a < 2:
+            return
+        dists = [deviation(a, b, i) for i in range(a + 1, b)]
+        k = int(np.argmax(dists))
+        if dists[k] > tolerance:
+            keep.add(a + 1 + k)
+            split(a, a + 1 + k)
+            split(a + 1 + k, b)
+
+    split(0, len(x) - 1)
+    return sorted(keep)
+
+def planar(longitude, latitude):
+    lat0 = np.radians(np.mean(latitude))
+    return longitude * FEET_PER_DEGREE * np.cos(lat0), latitude * FEET_PER_DEGREE
+
+def test_straight_line_keeps_only_the_endpoints():
+    longitude, latitude = to_lon_lat(np.linspace(0, 1000, 11), np.zeros(11))
+    significance = mission_format.simplification_tolerances(longitude, latitude, [0, 11])
+    assert np.isinf(significance[[0, -1]]).all()
+    assert (significance[1:-1] < LOD_TOLERANCES_FT[1]).all()
+
+def test_spike_significance_is_its_deviation():
+    longitude, latitude = to_lon_lat([0, 500, 1000], [0, 40, 0])
+    significance = mission_format.simplification_tolerances(longitude, latitude, [0, 3])
+    assert significance[1] == pytest.approx(40, rel=1e-3)
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_levels_match_reference_douglas_peucker(seed):
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(0, 60, size=(200, 2))
+    longitude, latitude = to_lon_lat(np.cumsum(steps[:, 0]), np.cumsum(steps[:, 1]))
+    significance = mission_format.simplification_tolerances(longitude, latitude, [0, 200])
+    x, y = planar(longitude, latitude)
+    for tolerance in LOD_TOLERANCES_FT[1:]:
+        kept = np.flatnonzero(significance > tolerance).tolist()
+        assert kept == douglas_peucker(x, y, tolerance), tolerance
+
+def test_levels_are_nested_and_missions_independent():
+    rng = np.random.default_rng(5)
+    steps = rng.normal(0, 80, size=(150, 2))
+    longitude, latitude = to_lon_lat(np.cumsum(steps[:, 0]), np.cumsum(steps[:, 1]))
+    offsets = np.array([0, 40, 40, 150])
+    significance = mission_format.simplification_tolerances(longitude, latitude, offsets)
+    # Every mission's endpoints are kept, including after an empty mission
+    assert np.isinf(significance[[0, 39, 40, 149]]).all()
+    bundle = {'offsets': offsets, 'lod_tolerance_ft': significance}
+    for mission in (0, 2):
+        previous = None
+        for tolerance in LOD_TOLERANCES_FT:
+            kept = set(mission_format.lod_indices(bundle, mission, tolerance).tolist())
+            if previous is not None:
+                assert kept <= previous
+            previous = kept
+    assert len(mission_format.lod_indices(bundle, 0, 0.0)) == 40
+
+def test_zoom_tolerance_grows_as_the_map_zooms_out():
+    tolerances = [mission_format.zoom_tolerance_ft(zoom, LAT0) for zoom in range(20, 8, -1)]
+    assert tolerances == sorted(tolerances)
+    assert tolerances[0] == 0.0 and tolerances[-1] == LOD_TOLERANCES_FT[-1]
+    assert set(tolerances) <= set(LOD_TOLERANCES_FT)
+
+@pytest.mark.parametrize('num_waypoints, step, max_points, expected', [
+    (10, 1, None, list(range(10))),
+    (10, 3, None, [0, 3, 6, 9]),
+    (11, 3, None, [0, 3, 6, 9, 10]),
+    (101, 1, 11, list(range(0, 101, 10))),
+    (5, 1, 10, [0, 1, 2, 3, 4]),
+    (0, 2, None, []),
+])
+def test_decimation_keeps_first_and_last(num_waypoints, step, max_points, expected):
+    indices = mission_format.decimate_indices(num_waypoints, step, max_points)
+    assert indices.tolist() == expected
+    if max_points:
+        assert len(indices) <= max(max_points, 2)
+
+def test_bundle_round_trip(exported):
+    bundle = mission_format.load_missions(exported / 'mission_paths.npz')
+    missions = mission_format.missions_to_json(bundle)['missions']
+    assert len(missions) == len(bundle['offsets']) - 1
+    for i, mission in enumerate(missions):
+        waypoints = mission['waypoints']
+        assert waypoints[0]['waypoint_type'] == 'depot'
+        assert mission['num_waypoints'] == len(waypoints)
+        # Segments are measured between coordinates, the total comes from the integer solver matrix
+        assert waypoints[-1]['cumulative_distance_ft'] == pytest.approx(mission['total_distance_ft'], rel=0.02)
+        projected = mission_format.mission_waypoints(bundle, i, [0, len(waypoints) - 1], ('sequence', 'latitude'))
+        assert projected == [{'sequence': w['sequence'], 'latitude': w['latitude']}
+                             for w in (waypoints[0], waypoints[-1])]
+
+def test_json_derived_from_npz_matches_the_json_files(exported):
+    bundle = mission_format.load_missions(exported / 'mission_paths.npz')
+    with open(exported / 'mission_paths.json') as f:
+        assert mission_format.missions_to_json(bundle) == json.load(f)
+    for kind in ('photo', 'asset'):
+        with open(exported / f'{kind}_points.json') as f:
+            assert mission_format.points_to_json(exported / f'{kind}_points.npz') == json.load(f)
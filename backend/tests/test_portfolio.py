@@ -0,0 +1,88 @@
+"""Solver portfolio: racing entries, the win history and the learned default."""
+import json
+
+import pytest
+
+from conftest import star_data
+import terminal
+
+FAST = [{'strategy': strategy, 'metaheuristic': 'GREEDY_DESCENT', 'seed': 0}
+        for strategy in ('PARALLEL_CHEAPEST_INSERTION', 'SAVINGS', 'PATH_CHEAPEST_ARC')]
+
+def test_portfolio_specs_are_parsed():
+    assert terminal.parse_portfolio(['savings:tabu_search:3', 'PATH_CHEAPEST_ARC:GUIDED_LOCAL_SEARCH']) == [
+        {'strategy': 'SAVINGS', 'metaheuristic': 'TABU_SEARCH', 'seed': 3},
+        {'strategy': 'PATH_CHEAPEST_ARC', 'metaheuristic': 'GUIDED_LOCAL_SEARCH', 'seed': 0},
+    ]
+    with pytest.raises(ValueError, match='first solution strategy'):
+        terminal.parse_portfolio(['CHEAPEST:TABU_SEARCH'])
+    with pytest.raises(ValueError, match='metaheuristic'):
+        terminal.parse_portfolio(['SAVINGS:ANNEALING'])
+
+class RecordingSolver:
+    """ParallelSolver stand-in that records each race and lets the last entry win."""
+    workers = 2
+
+    def __init__(self):
+        self.races = []
+
+    def run(self, candidates, per_attempt_time_s, pick='first', hint_routes=None):
+        self.races.append((candidates, per_attempt_time_s, pick))
+        results = [{**c, 'routes': [([0, 1, 0], 10)], 'objective': 10 + i, 'feasible': True,
+                    'stop_reason': 'completed', 'best_solution_s': 0.1, 'wall_time_s': 0.2}
+                   for i, c in enumerate(candidates)]
+        return results[-1], results
+
+def test_entries_share_the_attempt_time_in_waves(tmp_path):
+    solver = RecordingSolver()
+    history = tmp_path / 'history.jsonl'
+    attempt = terminal.race_portfolio(solver, 9, FAST, history_file=history, data=star_data(3))
+    routes, objective, info = attempt(3, None, None)
+    candidates, time_limit_s, pick = solver.races[0]
+    # Three entries on two workers run in two waves
+    assert time_limit_s == 4.5 and pick == 'best'
+    assert [c['strategy'] for c in candidates] == [e['strategy'] for e in FAST]
+    assert all(c['num_vehicles'] == 3 for c in candidates)
+    assert (info['strategy'], info['candidates'], objective) == ('PATH_CHEAPEST_ARC', 3, 12)
+
+    record = json.loads(history.read_text())
+    assert record['winner'] == FAST[2] and record['num_nodes'] == 4 and record['num_vehicles'] == 3
+    assert [c['objective'] for c in record['candidates']] == [10, 11, 12]
+
+def test_real_race_returns_a_feasible_winner():
+    data = star_data(3)
+    with terminal.ParallelSolver(data, 2) as solver:
+        routes, objective, info = terminal.race_portfolio(solver, 2, FAST[:2])(3, None, None)
+    # One leaf per vehicle is the only feasible plan
+    assert sorted(route[1] for route, _ in routes if len(route) > 2) == [1, 2, 3]
+    assert sum(dist for _, dist in routes) == 600
+    assert info['candidates'] == 2 and info['strategy'] in {e['strategy'] for e in FAST[:2]}
+
+def write_history(path, winners):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        for num_nodes, strategy, metaheuristic in winners:
+            f.write(json.dumps({'num_nodes': num_nodes, 'winner': {
+                'strategy': strategy, 'metaheuristic': metaheuristic, 'seed': 0}}) + '\n')
+        f.write('not json\n')
+
+def test_learned_default_uses_the_nearest_size(tmp_path):
+    history = tmp_path / 'history.jsonl'
+    assert terminal.learned_default(history, 100) is None
+    write_history(history, [(100, 'SAVINGS', 'TABU_SEARCH'), (120, 'SAVINGS', 'TABU_SEARCH'),
+                            (110, 'PATH_CHEAPEST_ARC', 'GUIDED_LOCAL_SEARCH'),
+                            (1000, 'PATH_CHEAPEST_ARC', 'GUIDED_LOCAL_SEARCH')])
+    assert terminal.learned_default(history, 128) == {
+        'strategy': 'SAVINGS', 'metaheuristic': 'TABU_SEARCH', 'wins': 2, 'races': 3}
+    assert terminal.learned_default(history, 900)['strategy'] == 'PATH_CHEAPEST_ARC'
+    assert len(terminal.read_portfolio_history(history)) == 4
+
+def test_learned_strategy_goes_into_the_solver_config(site, tmp_path):
+    site_dir, info = site
+    optimizer = terminal.DroneOptimizer(site_dir, max_distance_per_trip=info['max_distance_ft'],
+                                        cache_dir=tmp_path / 'cache')
+    num_nodes = len(optimizer.create_data_model()['distance_matrix'])
+    write_history(optimizer.portfolio_history, [(num_nodes, 'SAVINGS', 'TABU_SEARCH')])
+    _, config, key, _ = optimizer.prepare_solve(strategy='learned')
+    assert (config['strategy'], config['metaheuristic']) == ('SAVINGS', 'TABU_SEARCH')
+    assert key == optimizer.prepare_solve(strategy='SAVINGS', metaheuristic='TABU_SEARCH')[2]
@@ -0,0 +1,105 @@
+"""Navigable graph and all-pairs shortest paths of the preprocessing step."""
+import numpy as np
+import pytest
+from shapely.geometry import Polygon
+
+import preprocess
+
+def grid_graph(side, spacing=100.0):
+    """Edges and lengths of a side x side street grid; node i is (i // side, i % side)."""
+    ids = np.arange(side * side).reshape(side, side)
+    edges = np.concatenate((np.column_stack((ids[:-1].ravel(), ids[1:].ravel())),
+                            np.column_stack((ids[:, :-1].ravel(), ids[:, 1:].ravel()))))
+    return edges.astype(np.int32), np.full(len(edges), spacing)
+
+def floyd_warshall(num_nodes, edges, lengths):
+    dist = np.full((num_nodes, num_nodes), np.inf)
+    np.fill_diagonal(dist, 0.0)
+    dist[edges[:, 0], edges[:, 1]] = dist[edges[:, 1], edges[:, 0]] = lengths
+    for k in range(num_nodes):
+        dist = np.minimum(dist, dist[:, k:k + 1] + dist[k:k + 1, :])
+    return dist
+
+@pytest.fixture(params=['scipy', 'python'])
+def dijkstra_impl(request, monkeypatch):
+    if request.param == 'python':
+        monkeypatch.setattr(preprocess, 'dijkstra', None)
+    elif preprocess.dijkstra is None:
+        pytest.skip('scipy not installed')
+    return request.param
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_matrices_match_floyd_warshall(tmp_path, dijkstra_impl, workers):
+    side = 6
+    edges, lengths = grid_graph(side)
+    # A slow street makes some shortest paths detour
+    lengths[0] = 1000.0
+    preprocess.write_shortest_paths(side * side, edges, lengths, tmp_path, workers=workers)
+    dist = np.load(tmp_path / 'distance_matrix.npy')
+    pred = np.load(tmp_path / 'predecessors.npy')
+    assert np.allclose(dist, floyd_warshall(side * side, edges, lengths))
+    assert not list(tmp_path.glob('*.partial.npy'))
+
+    # Following the predecessors back from every target adds up to the distance
+    weight = {(int(a), int(b)): w for (a, b), w in zip(edges, lengths)}
+    weight.update({(b, a): w for (a, b), w in weight.items()})
+    for source, target in [(0, side * side - 1), (1, 0), (7, 30)]:
+        total, node = 0.0, target
+        while node != source:
+            total += weight[(int(pred[source, node]), node)]
+            node = int(pred[source, node])
+        assert total == pytest.approx(dist[source, target])
+    assert pred[3, 3] == preprocess.NO_PREDECESSOR
+
+def test_unreachable_nodes_stay_infinite(tmp_path, dijkstra_impl):
+    edges = np.array([[0, 1], [2, 3]], dtype=np.int32)
+    preprocess.write_shortest_paths(4, edges, np.array([5.0, 7.0]), tmp_path, workers=1)
+    dist = np.load(tmp_path / 'distance_matrix.npy')
+    assert dist[0, 1] == 5.0 and np.isinf(dist[0, 2])
+    assert np.load(tmp_path / 'predecessors.npy')[0, 3] == preprocess.NO_PREDECESSOR
+    assert preprocess.count_unreachable(4, edges) == 2
+
+def test_edges_leaving_the_polygon_are_dropped():
+    # A U-shaped site: the two top corners are only connected around the notch
+    lon_lat = np.array([[0.001, 0.009], [0.009, 0.009], [0.001, 0.001], [0.009, 0.001]])
+    u_shape = Polygon([(0, 0), (0.01, 0), (0.01, 0.01), (0.007, 0.01), (0.007, 0.003),
+                       (0.003, 0.003), (0.003, 0.01), (0, 0.01)])
+    edges, lengths = preprocess.build_graph(lon_lat, u_shape, k=3)
+    assert sorted(map(tuple, edges.tolist())) == [(0, 2), (1, 3), (2, 3)]
+    assert (lengths > 0).all()
+    all_edges, _ = preprocess.build_graph(lon_lat, None, k=3)
+    assert len(all_edges) == 6
+
+def test_neighbor_search_without_scipy_agrees(monkeypatch):
+    xy = np.random.default_rng(0).uniform(0, 1000, (50, 2))
+    expected = preprocess.nearest_neighbors(xy, 4)
+    monkeypatch.setattr(preprocess, 'cKDTree', None)
+    assert np.array_equal(np.sort(preprocess.nearest_neighbors(xy, 4), axis=1), np.sort(expected, axis=1))
+
+def write_site(data_dir, lon_lat, polygon):
+    data_dir.mkdir()
+    # One asset after the navigable points, as in a real site
+    np.save(data_dir / 'points_lat_long.npy', np.vstack((lon_lat, lon_lat[:1])))
+    np.save(data_dir / 'asset_indexes.npy', np.array([len(lon_lat), len(lon_lat)]))
+    (data_dir / 'polygon_lon_lat.wkt').write_text(polygon.wkt)
+
+def test_site_matrices_are_the_graph_shortest_paths(tmp_path):
+    axis = np.linspace(0.0, 0.004, 5)
+    lon_lat = np.array([(x, y) for x in axis for y in axis])
+    square = Polygon([(-0.001, -0.001), (0.005, -0.001), (0.005, 0.005), (-0.001, 0.005)])
+    write_site(tmp_path / 'site', lon_lat, square)
+    stats = preprocess.preprocess_site(tmp_path / 'site', neighbors=4, workers=1)
+    assert stats['num_nodes'] == 25
+    edges, lengths = preprocess.build_graph(lon_lat, square, 4)
+    dist = np.load(tmp_path / 'site' / 'distance_matrix.npy')
+    assert np.allclose(dist, floyd_warshall(25, edges, lengths))
+
+def test_disconnected_graph_is_retried_with_more_neighbors(tmp_path):
+    # Two clusters of three points; two neighbors only connect each cluster
+    lon_lat = np.array([[0.0, 0.0], [0.0001, 0.0], [0.0, 0.0001],
+                        [0.003, 0.003], [0.0031, 0.003], [0.003, 0.0031]])
+    square = Polygon([(-0.001, -0.001), (0.005, -0.001), (0.005, 0.005), (-0.001, 0.005)])
+    write_site(tmp_path / 'site', lon_lat, square)
+    stats = preprocess.preprocess_site(tmp_path / 'site', neighbors=2, workers=1)
+    assert stats['neighbors'] == 4
+    assert np.isfinite(np.load(tmp_path / 'site' / 'distance_matrix.npy')).all()
@@ -0,0 +1,65 @@
+"""In-memory response cache: parsed once, rebuilt when the export changes."""
+import contextlib
+import json
+
+import server
+
+@contextlib.contextmanager
+def new_generation(exported):
+    """Simulate a publish by changing the export generation in the manifest."""
+    manifest = exported / 'export_manifest.json'
+    original = manifest.read_text()
+    try:
+        manifest.write_text(json.dumps({**json.loads(original), 'generation': 'published'}))
+        yield
+    finally:
+        manifest.write_text(original)
+
+def test_artifacts_are_parsed_once(client, monkeypatch):
+    loads = []
+    original = server.load_artifact
+    monkeypatch.setattr(server, 'load_artifact', lambda name, raw=False: loads.append(name) or original(name, raw))
+    for _ in range(3):
+        assert client.get('/mission-data').status_code == 200
+        assert client.get('/photo-points').status_code == 200
+    assert sorted(loads) == sorted(server.MISSION_DATA_ARTIFACTS)
+
+def test_changed_source_file_is_parsed_again(client, exported, monkeypatch):
+    client.get('/asset-points')
+    loads = []
+    original = server.load_artifact
+    monkeypatch.setattr(server, 'load_artifact', lambda name, raw=False: loads.append(name) or original(name, raw))
+    with new_generation(exported):
+        client.get('/asset-points')
+    assert loads == ['asset_points']
+
+def test_publish_before_the_cache_fill_is_not_cached_as_the_new_version(client, exported, monkeypatch):
+    builds = []
+    original_rows = server.mission_waypoint_rows
+    monkeypatch.setattr(server, 'mission_waypoint_rows',
+                        lambda *args, **kwargs: builds.append(1) or original_rows(*args, **kwargs))
+    original_tolerance = server.requested_tolerance_ft
+    with new_generation(exported):
+        published = []
+
+        def publish_after_the_read(mission_paths):
+            # A job publishes between the snapshot and the response cache
+            if not published:
+                published.append(True)
+                manifest = exported / 'export_manifest.json'
+                manifest.write_text(json.dumps({**json.loads(manifest.read_text()), 'generation': 'next'}))
+            return original_tolerance(mission_paths)
+
+        monkeypatch.setattr(server, 'requested_tolerance_ft', publish_after_the_read)
+        client.get('/missions/1')
+        # The body was built from the snapshot before the publish, so the
+        # next request must not be served that body for the new generation
+        client.get('/missions/1')
+    assert len(builds) == 2
+
+def test_response_cache_is_bounded(client, monkeypatch):
+    monkeypatch.setattr(server, 'RESPONSE_CACHE_MAX_ENTRIES', 2)
+    for max_points in (2, 3, 4):
+        assert client.get(f'/missions/1?max_points={max_points}').status_code == 200
+    assert len(server._response_cache) == 2
+    assert [key[4] for key in server._response_cache] == [3, 4]
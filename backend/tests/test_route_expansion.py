@@ -0,0 +1,66 @@
+"""Batch route expansion through the predecessor matrix, and its path cache."""
+import numpy as np
+import pytest
+
+import terminal
+
+@pytest.fixture(scope='module')
+def predecessors(site):
+    site_dir, _ = site
+    return np.load(site_dir / 'predecessors.npy')
+
+def one_by_one(route, predecessors):
+    """Reference expansion: reconstruct_path per leg, junctions not repeated."""
+    path = [route[0]]
+    for start, end in zip(route[:-1], route[1:]):
+        path.extend(terminal.reconstruct_path(start, end, predecessors)[1:])
+    return path
+
+def test_batch_paths_match_single_paths(predecessors):
+    rng = np.random.default_rng(0)
+    n = len(predecessors)
+    starts, ends = rng.integers(0, n, 200), rng.integers(0, n, 200)
+    starts[:3] = ends[:3]
+    flat, offsets = terminal.reconstruct_paths(starts, ends, predecessors)
+    for k, (start, end) in enumerate(zip(starts, ends)):
+        assert flat[offsets[k]:offsets[k + 1]].tolist() == terminal.reconstruct_path(start, end, predecessors)
+
+def test_missing_predecessor_falls_back_to_the_direct_leg():
+    predecessors = np.array([[-9999, 0, 1], [1, -9999, -9999], [1, 2, -9999]])
+    flat, offsets = terminal.reconstruct_paths([0, 1], [2, 2], predecessors)
+    assert np.split(flat, offsets[1:-1])[0].tolist() == [0, 1, 2]
+    assert np.split(flat, offsets[1:-1])[1].tolist() == [1, 2]
+
+def test_routes_expand_like_their_legs(predecessors):
+    n = len(predecessors)
+    index_map = {local: global_ for local, global_ in enumerate([0, 5, n - 1, 17, 30])}
+    routes = [[0, 1, 2, 0], [0, 3, 4, 3, 0], [0]]
+    flat, offsets = terminal.expand_routes(routes, predecessors, index_map)
+    assert flat.dtype == np.int32 and len(offsets) == len(routes) + 1
+    for i, route in enumerate(routes):
+        expected = one_by_one([index_map[node] for node in route], predecessors)
+        assert flat[offsets[i]:offsets[i + 1]].tolist() == expected
+    assert terminal.expand_route_with_paths(routes[0], predecessors, index_map) == flat[:offsets[1]].tolist()
+    empty, empty_offsets = terminal.expand_routes([], predecessors, index_map)
+    assert len(empty) == 0 and empty_offsets.tolist() == [0]
+
+def test_cached_legs_are_not_reconstructed_again(predecessors, monkeypatch):
+    index_map = {0: 0, 1: 5, 2: 9}
+    cache = terminal.PathCache()
+    first = terminal.expand_routes([[0, 1, 2, 0]], predecessors, index_map, cache)
+    assert (cache.hits, cache.misses) == (0, 3)
+    monkeypatch.setattr(terminal, 'reconstruct_paths', lambda *args: pytest.fail('leg reconstructed again'))
+    # Legs are directed; a repeated leg is looked up once per call
+    second, offsets = terminal.expand_routes([[0, 1, 2, 0], [0, 1, 2, 0]], predecessors, index_map, cache)
+    assert second[:offsets[1]].tolist() == second[offsets[1]:].tolist() == first[0].tolist()
+    assert cache.hits == 3
+
+def test_path_cache_evicts_the_least_recently_used_leg():
+    cache = terminal.PathCache(maxsize=2)
+    cache.put((0, 1), np.array([0, 1]))
+    cache.put((1, 2), np.array([1, 2]))
+    assert cache.get((0, 1)) is not None
+    cache.put((2, 3), np.array([2, 3]))
+    assert list(cache.segments) == [(0, 1), (2, 3)]
+    assert cache.get((1, 2)) is None
+    assert (cache.hits, cache.misses) == (1, 1)
@@ -0,0 +1,88 @@
+"""Compressed responses, ETag revalidation and the NDJSON mission stream."""
+import gzip
+import json
+import zlib
+
+import pytest
+
+import server
+
+def test_gzip_body_matches_identity_body(client):
+    plain = client.get('/mission-data')
+    compressed = client.get('/mission-data', headers={'Accept-Encoding': 'gzip'})
+    assert plain.status_code == compressed.status_code == 200
+    assert 'Content-Encoding' not in plain.headers
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert gzip.decompress(compressed.data) == plain.data
+    assert len(compressed.data) < len(plain.data)
+
+@pytest.mark.skipif(server.brotli is None, reason='brotli not installed')
+def test_brotli_preferred_when_accepted(client):
+    response = client.get('/mission-data', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert server.brotli.decompress(response.data) == client.get('/mission-data').data
+
+def test_small_bodies_are_not_compressed(client):
+    response = client.get('/missions/1?fields=sequence&max_points=2', headers={'Accept-Encoding': 'gzip'})
+    assert len(response.data) < server.COMPRESS_MIN_BYTES
+    assert 'Content-Encoding' not in response.headers
+
+def test_matching_etag_returns_304(client):
+    first = client.get('/mission-data', headers={'Accept-Encoding': 'gzip'})
+    etag = first.headers['ETag']
+    again = client.get('/mission-data', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert again.status_code == 304 and again.data == b''
+
+def test_etag_differs_per_encoding(client):
+    plain = client.get('/mission-data').headers['ETag']
+    compressed = client.get('/mission-data', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+    assert plain != compressed
+    # A cached identity body does not validate a gzip request
+    response = client.get('/mission-data', headers={'Accept-Encoding': 'gzip', 'If-None-Match': plain})
+    assert response.status_code == 200
+
+def test_last_modified_revalidation(client):
+    first = client.get('/asset-points')
+    again = client.get('/asset-points', headers={'If-Modified-Since': first.headers['Last-Modified']})
+    assert again.status_code == 304
+
+def test_changed_export_invalidates_the_cached_response(client, exported):
+    first = client.get('/polygon-boundary')
+    version = server._response_cache['polygon_boundary']['version']
+    manifest = exported / 'export_manifest.json'
+    original = manifest.read_text()
+    try:
+        manifest.write_text(json.dumps({**json.loads(original), 'generation': 'changed'}))
+        again = client.get('/polygon-boundary', headers={'If-None-Match': first.headers['ETag']})
+        # The entry is rebuilt for the new generation; same content keeps the same ETag
+        assert server._response_cache['polygon_boundary']['version'] != version
+        assert again.status_code == 304
+    finally:
+        manifest.write_text(original)
+
+def read_stream(response):
+    body = response.data
+    if response.headers.get('Content-Encoding') == 'gzip':
+        body = zlib.decompress(body, 31)
+    return [json.loads(line) for line in body.decode().splitlines()]
+
+@pytest.mark.parametrize('encoding', [None, 'gzip'])
+def test_stream_lists_every_mission_between_summary_and_end(client, encoding):
+    headers = {'Accept-Encoding': encoding} if encoding else {}
+    response = client.get('/mission-data/stream', headers=headers)
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.headers.get('Content-Encoding') == encoding
+    records = read_stream(response)
+    types = [record['type'] for record in records]
+    assert types[:4] == ['summary', 'polygonBoundary', 'assetPoints', 'photoPoints']
+    assert types[-1] == 'end'
+    missions = [record['mission'] for record in records if record['type'] == 'mission']
+    assert records[-1]['missions'] == len(missions) == records[0]['summary']['total_missions']
+
+def test_stream_matches_mission_data(client):
+    records = read_stream(client.get('/mission-data/stream', headers={'Accept-Encoding': 'gzip'}))
+    full = client.get('/mission-data').get_json()
+    missions = [record['mission'] for record in records if record['type'] == 'mission']
+    assert missions == full['missionPaths']['missions']
+    assert records[2]['data'] == full['assetPoints']
@@ -0,0 +1,170 @@
+"""Solution cache: near matches, warm-start repairs and eviction."""
+import os
+import time
+
+import pytest
+
+import terminal
+
+def routes_through_all(data, distance=1000):
+    """One route visiting every waypoint of the data model in order."""
+    return [([0, *range(1, len(data['route_nodes'])), 0], distance)]
+
+@pytest.fixture
+def solver_calls(monkeypatch):
+    """Replace the solvers with fakes that record their calls."""
+    calls = []
+
+    def fake_solve_fleet(data, max_vehicles, per_attempt_time_s, *args, **kwargs):
+        calls.append('solve')
+        return routes_through_all(data), []
+
+    def fake_solve_decomposed(data, *args, **kwargs):
+        calls.append('decompose')
+        return routes_through_all(data), {}
+
+    def fake_repair(data, old_routes, old_route_nodes, time_budget_s=10, **kwargs):
+        calls.append('repair')
+        return routes_through_all(data), {}
+
+    monkeypatch.setattr(terminal, 'solve_fleet', fake_solve_fleet)
+    monkeypatch.setattr(terminal, 'solve_decomposed', fake_solve_decomposed)
+    monkeypatch.setattr(terminal, 'reoptimize_incremental', fake_repair)
+    monkeypatch.setattr(terminal, 'print_decomposition_report', lambda *args: None)
+    return calls
+
+@pytest.fixture
+def optimizer(site, tmp_path):
+    site_dir, info = site
+    return terminal.DroneOptimizer(site_dir, max_distance_per_trip=info['max_distance_ft'],
+                                   cache_dir=tmp_path / 'cache', output_dir=tmp_path / 'output')
+
+def test_identical_solve_is_served_from_cache(optimizer, solver_calls):
+    optimizer.solve(per_attempt_time_s=1)
+    optimizer.solve(per_attempt_time_s=1)
+    assert solver_calls == ['solve']
+    assert optimizer.from_cache
+
+def test_same_config_with_edited_waypoints_is_repaired(optimizer, solver_calls):
+    optimizer.solve(per_attempt_time_s=1)
+    optimizer.solve(per_attempt_time_s=1, remove_nodes=[5])
+    assert solver_calls == ['solve', 'repair']
+
+def test_warm_start_repair_keeps_the_requested_key_free(optimizer, solver_calls):
+    optimizer.solve(per_attempt_time_s=1)
+    near_key = optimizer.cache_key
+    optimizer.solve(per_attempt_time_s=1, remove_nodes=[5])
+    requested_key = optimizer.prepare_solve(per_attempt_time_s=1, remove_nodes=[5])[2]
+    assert optimizer.cache_key != requested_key
+    assert terminal.cache_load(requested_key, optimizer.cache_dir) is None
+    repaired = terminal.cache_load(optimizer.cache_key, optimizer.cache_dir)
+    assert repaired['meta']['solver_config']['repair_of'] == near_key
+
+    # The same edit reuses the cached repair instead of repairing again
+    optimizer.solve(per_attempt_time_s=1, remove_nodes=[5])
+    assert solver_calls == ['solve', 'repair']
+    assert optimizer.from_cache
+
+    # Without warm start the fleet search runs and owns the requested key
+    optimizer.solve(per_attempt_time_s=1, remove_nodes=[5], warm_start=False)
+    assert solver_calls == ['solve', 'repair', 'solve']
+    assert optimizer.cache_key == requested_key
+
+@pytest.mark.parametrize('changed', [
+    {'per_attempt_time_s': 2},
+    {'max_vehicles': 30},
+    {'min_vehicles': 3},
+    {'strategy': 'SAVINGS'},
+    {'early_stop': {'plateau_window_s': 5}},
+])
+def test_changed_config_runs_the_requested_search(optimizer, solver_calls, changed):
+    optimizer.solve(per_attempt_time_s=1)
+    optimizer.solve(**{'per_attempt_time_s': 1, **changed, 'remove_nodes': [5]})
+    assert solver_calls == ['solve', 'solve']
+
+def test_decompose_is_not_replaced_by_a_repair(optimizer, solver_calls):
+    optimizer.solve(per_attempt_time_s=1)
+    optimizer.solve(per_attempt_time_s=1, decompose='kmeans', num_partitions=2, remove_nodes=[5])
+    assert solver_calls == ['solve', 'decompose']
+
+def test_incremental_from_other_config_gets_its_own_key(optimizer, solver_calls):
+    optimizer.solve(per_attempt_time_s=1)
+    previous_key = optimizer.cache_key
+    optimizer.solve(per_attempt_time_s=2, remove_nodes=[5], incremental_from=previous_key)
+    assert solver_calls == ['solve', 'repair']
+
+    requested_key = optimizer.prepare_solve(per_attempt_time_s=2, remove_nodes=[5])[2]
+    assert optimizer.cache_key != requested_key
+    assert terminal.cache_load(requested_key, optimizer.cache_dir) is None
+    repaired = terminal.cache_load(optimizer.cache_key, optimizer.cache_dir)
+    assert repaired['meta']['solver_config']['repair_of'] == previous_key
+
+    # The requested configuration still gets a real solve
+    optimizer.solve(per_attempt_time_s=2, remove_nodes=[5], warm_start=False)
+    assert solver_calls == ['solve', 'repair', 'solve']
+
+def test_incremental_from_same_config_gets_its_own_key(optimizer, solver_calls):
+    optimizer.solve(per_attempt_time_s=1)
+    optimizer.solve(per_attempt_time_s=1, remove_nodes=[5], incremental_from=optimizer.cache_key)
+    assert solver_calls == ['solve', 'repair']
+    assert optimizer.cache_key != optimizer.prepare_solve(per_attempt_time_s=1, remove_nodes=[5])[2]
+
+# --- Near matches ---
+SOLVER_CONFIG = {'max_vehicles': 60, 'per_attempt_time_s': 30}
+
+def save_entry(cache_dir, key, route_nodes, solver_config=SOLVER_CONFIG, site_id='site', max_distance=5000):
+    terminal.cache_save(key, {
+        'all_routes': [([0, *range(1, len(route_nodes)), 0], 100)],
+        'route_nodes': route_nodes,
+        'meta': {'site_id': site_id, 'max_distance': max_distance, 'solver_config': solver_config},
+    }, cache_dir)
+
+def near_data(route_nodes):
+    return {'route_nodes': route_nodes, 'site_id': 'site', 'max_distance': 5000}
+
+def test_near_match_picks_the_largest_jaccard_overlap(tmp_path):
+    save_entry(tmp_path, 'overlap_90', list(range(90)) + list(range(1000, 1010)))
+    save_entry(tmp_path, 'overlap_95', list(range(95)) + list(range(2000, 2005)))
+    key, result = terminal.cache_find_near(near_data(list(range(100))), tmp_path)
+    # |A ∩ B| / |A ∪ B| = 95 / 105
+    assert key == 'overlap_95'
+    assert result['route_nodes'][:3] == [0, 1, 2]
+
+def test_near_match_respects_the_minimum_overlap(tmp_path):
+    save_entry(tmp_path, 'overlap_60', list(range(60)) + list(range(1000, 1040)))
+    assert terminal.cache_find_near(near_data(list(range(100))), tmp_path) == (None, None)
+
+@pytest.mark.parametrize('mismatch', [
+    {'site_id': 'other'},
+    {'max_distance': 6000},
+    {'solver_config': {**SOLVER_CONFIG, 'per_attempt_time_s': 10}},
+])
+def test_near_match_skips_other_sites_limits_and_configs(tmp_path, mismatch):
+    save_entry(tmp_path, 'entry', list(range(100)), **mismatch)
+    key, _ = terminal.cache_find_near(near_data(list(range(99))), tmp_path, solver_config=SOLVER_CONFIG)
+    assert key is None
+
+def test_near_match_with_the_same_config(tmp_path):
+    save_entry(tmp_path, 'entry', list(range(100)))
+    key, _ = terminal.cache_find_near(near_data(list(range(99))), tmp_path, solver_config=SOLVER_CONFIG)
+    assert key == 'entry'
+
+# --- Eviction ---
+def test_eviction_never_drops_the_entry_just_saved(tmp_path):
+    for name in ('a', 'b'):
+        save_entry(tmp_path, name, list(range(100)))
+    # Older entries look more recently used than the one about to be saved
+    future = time.time() + 100
+    for path in tmp_path.glob('*.npz'):
+        os.utime(path, (future, future))
+    terminal.cache_save('fresh', {'all_routes': [([0, 1, 0], 10)], 'route_nodes': [0, 1]},
+                        tmp_path, max_bytes=1)
+    assert [path.stem for path in tmp_path.glob('*.npz')] == ['fresh']
+
+def test_eviction_drops_least_recently_used_first(tmp_path):
+    for i, name in enumerate(('old', 'new')):
+        save_entry(tmp_path, name, list(range(100)))
+        os.utime(tmp_path / f'{name}.npz', (1000 + i, 1000 + i))
+    limit = (tmp_path / 'new.npz').stat().st_size
+    terminal.cache_evict(tmp_path, max_bytes=limit)
+    assert [path.stem for path in tmp_path.glob('*.npz')] == ['new']
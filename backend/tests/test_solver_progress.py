@@ -0,0 +1,93 @@
+"""Improving solutions reported by the solver, their log and the job event stream."""
+import json
+
+import pytest
+
+from conftest import star_data
+import server
+import terminal
+
+EARLY_STOP = {'plateau_window_s': 0.3}
+
+@pytest.fixture(scope='module')
+def site_data(site):
+    site_dir, info = site
+    return terminal.DroneOptimizer(site_dir, max_distance_per_trip=info['max_distance_ft']).create_data_model()
+
+def test_every_record_improves_on_the_last(site_data):
+    records = []
+    routes, objective = terminal.solve_with_vehicles(site_data, 6, 2, on_solution=records.append,
+                                                     early_stop=EARLY_STOP)
+    assert routes is not None and len(records) > 1
+    assert all(set(record) == {'t', 'objective', 'span', 'vehicles'} for record in records)
+    assert all(a['objective'] > b['objective'] and a['t'] <= b['t'] for a, b in zip(records, records[1:]))
+    assert records[-1]['objective'] == objective
+    used = [route for route, _ in routes if len(route) > 2]
+    assert records[-1]['vehicles'] == len(used)
+    assert records[-1]['span'] == max(dist for _, dist in routes)
+
+def test_fleet_search_tags_records_with_the_attempt():
+    records = []
+    terminal.search_fleet_size(star_data(3), 2, 6, 1, on_solution=records.append, early_stop=EARLY_STOP)
+    assert {(r['attempt'], r['num_vehicles']) for r in records} >= {(2, 3)}
+    assert all(r['num_vehicles'] >= 3 for r in records)
+
+def test_solver_log_appends_one_line_per_record(tmp_path):
+    path = tmp_path / 'logs' / 'progress.jsonl'
+    log = terminal.SolverLog(path, run_id='run1')
+    log({'t': 0.1, 'objective': 10})
+    # Flushed right away, so a reader can follow the run live
+    assert json.loads(path.read_text())['objective'] == 10
+    log({'t': 0.2, 'objective': 9})
+    log.close()
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line['run_id'] for line in lines] == ['run1', 'run1']
+    assert lines == log.records and all('time' in line for line in lines)
+    terminal.SolverLog(path, run_id='run2')({'t': 0.1, 'objective': 8})
+    assert len(path.read_text().splitlines()) == 3
+
+def test_convergence_report(capsys):
+    records = [{'attempt': 1, 'num_vehicles': 4, 't': t, 'objective': objective}
+               for t, objective in [(0.1, 2000), (0.5, 1009), (2.0, 1000.5), (3.0, 1000)]]
+    terminal.print_convergence_report(records)
+    row = capsys.readouterr().out.strip().splitlines()[-1].split()
+    # Within 1% from 0.5 s, within 0.1% from 2.0 s
+    assert row == ['1', '4', '0.10s', '3.00s', '4', '0.50s', '2.00s']
+
+# --- Job event stream ---
+class FakeJobs:
+    """Job manager stand-in: one finished job with three logged solutions."""
+    records = [{'t': t, 'objective': objective} for t, objective in [(0.1, 30), (0.2, 20), (0.4, 10)]]
+
+    def get(self, job_id):
+        if job_id != 'job1':
+            return None
+        return {'id': job_id, 'status': 'done', 'progress': {'probes': 2}, 'elapsed_s': 1.0}
+
+    def read_solver_log(self, job_id, offset=0):
+        return self.records[offset:], len(self.records)
+
+def events(response):
+    """(event, id, data) of every message of a Server-Sent Events body."""
+    parsed = []
+    for message in response.get_data(as_text=True).strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in message.splitlines())
+        parsed.append((fields['event'], fields.get('id'), json.loads(fields['data'])))
+    return parsed
+
+def test_job_events_stream_solutions_then_done(monkeypatch):
+    monkeypatch.setattr(server, 'job_manager', FakeJobs())
+    client = server.app.test_client()
+    response = client.get('/jobs/job1/events')
+    assert response.mimetype == 'text/event-stream'
+    assert response.headers['X-Accel-Buffering'] == 'no'
+    received = events(response)
+    assert [event for event, _, _ in received] == ['solution'] * 3 + ['progress', 'done']
+    # Only the last solution of a batch carries the resume offset
+    assert [event_id for _, event_id, _ in received[:3]] == [None, None, '3']
+    assert [data['objective'] for _, _, data in received[:3]] == [30, 20, 10]
+    assert received[-1][2]['status'] == 'done'
+
+    resumed = events(client.get('/jobs/job1/events', headers={'Last-Event-ID': '2'}))
+    assert [data['objective'] for event, _, data in resumed if event == 'solution'] == [10]
+    assert client.get('/jobs/other/events').status_code == 404
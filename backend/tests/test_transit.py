@@ -0,0 +1,45 @@
+"""Native transit matrix: converted once per data and equivalent to the Python callback."""
+import numpy as np
+
+from conftest import star_data
+import terminal
+
+def test_conversion_is_reused_across_builds(monkeypatch):
+    data = star_data(4)
+    first = terminal.transit_matrix(data)
+    assert first == data['distance_matrix'].tolist()
+
+    calls = []
+    original = terminal.transit_matrix
+    monkeypatch.setattr(terminal, 'transit_matrix', lambda d: calls.append(1) or original(d))
+    for num_vehicles in (3, 4, 5):
+        terminal.build_routing_model(data, num_vehicles)
+    assert len(calls) == 3
+    assert terminal.transit_matrix(data) is first
+
+def test_replaced_matrix_is_converted_again():
+    data = star_data(4)
+    first = terminal.transit_matrix(data)
+    data['distance_matrix'] = data['distance_matrix'] * 2
+    second = terminal.transit_matrix(data)
+    assert second is not first
+    assert second[0][1] == 200
+
+def test_permuted_data_does_not_reuse_the_conversion():
+    data = star_data(4)
+    data['distance_matrix'][1, 2] = data['distance_matrix'][2, 1] = 150
+    terminal.transit_matrix(data)
+    permuted, order = terminal._permute_data(data, seed=3)
+    assert 'transit_matrix' not in permuted
+    expected = data['distance_matrix'][np.ix_(order, order)].tolist()
+    assert terminal.transit_matrix(permuted) == expected
+
+def test_matrix_and_callback_evaluators_agree():
+    data = star_data(4)
+    objectives = {}
+    for transit in ('matrix', 'callback'):
+        manager, routing, _ = terminal.build_routing_model(data, 4, transit=transit)
+        solution = routing.SolveWithParameters(terminal.make_search_parameters(1))
+        assert solution is not None
+        objectives[transit] = solution.ObjectiveValue()
+    assert objectives['matrix'] == objectives['callback']
@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useMemo, useCallback } from 'react';
+import React, { useState, useEffect, useMemo, useCallback, useRef } from 'react';
 import { Loader2 } from 'lucide-react';
 import { api } from './services/api';
 
@@ -10,17 +10,25 @@ import MissionMap from './components/map';
 import MissionDetailsTable from './components/missionTable';
 import MissionDistributionChart from './components/missionGraph';
 
+// zoom the map starts at, routes are simplified to fit it and refetched when zooming in
+const INITIAL_ZOOM = 14;
+
 export default function DroneVisualization() {
   const [data, setData] = useState(null);
   const [loading, setLoading] = useState(true);
   const [selectedMissions, setSelectedMissions] = useState([]);
   const [showAllWaypoints, setShowAllWaypoints] = useState(false);
+  const [mapZoom, setMapZoom] = useState(INITIAL_ZOOM);
 
   // states for our animations
   const [animatingMission, setAnimatingMission] = useState(null);
   const [animationProgress, setAnimationProgress] = useState(0);
   const [isAnimating, setIsAnimating] = useState(false);
 
+  // missions whose geometry is being fetched, so toggling twice does not fetch twice
+  const pendingGeometry = useRef(new Set());
+  const waypointsRequested = useRef(false);
+
   // we load the data when page loads
   useEffect(() => {
     loadData();
@@ -28,8 +36,8 @@ export default function DroneVisualization() {
 
   const loadData = async () => {
     try {
-      //mission data is from the api the large json that was restructured 
-      const missionData = await api.fetchMissionData();
+      //only the mission summary is loaded up front, routes are fetched when a mission is shown
+      const missionData = await api.fetchMissionSummary();
       setData(missionData);
       setSelectedMissions(missionData.missions.map(m => m.id)); //map over each mission in the array. 
     } catch (error) {
@@ -39,6 +47,48 @@ export default function DroneVisualization() {
     }
   };
 
+  // merges fetched fields into one mission without touching the others
+  const updateMission = useCallback((missionId, fields) => {
+    setData(prev => ({
+      ...prev,
+      missions: prev.missions.map(m => (m.id === missionId ? { ...m, ...fields } : m))
+    }));
+  }, []);
+
+  const loadGeometry = useCallback(async (missionId, options) => {
+    pendingGeometry.current.add(missionId);
+    try {
+      const geometry = await api.fetchMissionGeometry(missionId, options);
+      updateMission(missionId, geometry);
+      return geometry;
+    } finally {
+      pendingGeometry.current.delete(missionId);
+    }
+  }, [updateMission]);
+
+  // fetch the route of every selected mission at the detail the current zoom needs
+  // zooming out keeps the finer route we already have, zooming in fetches a finer one
+  useEffect(() => {
+    if (!data) return;
+    const zoom = Math.floor(mapZoom);
+    data.missions
+      .filter(m => selectedMissions.includes(m.id) && !pendingGeometry.current.has(m.id))
+      .filter(m => !m.coordinates || (!m.fullResolution && m.lodZoom < zoom))
+      .forEach(m => loadGeometry(m.id, { zoom }).catch(error => console.error('Error loading mission:', error)));
+  }, [data, selectedMissions, mapZoom, loadGeometry]);
+
+  // asset poles and photo points are only fetched the first time they are shown
+  useEffect(() => {
+    if (!showAllWaypoints || waypointsRequested.current) return;
+    waypointsRequested.current = true;
+    api.fetchAllWaypoints()
+      .then(waypoints => setData(prev => ({ ...prev, ...waypoints })))
+      .catch(error => {
+        waypointsRequested.current = false;
+        console.error('Error loading waypoints:', error);
+      });
+  }, [showAllWaypoints]);
+
   //simple filter for different missions
   //cool part is the memoized function so it doesnt recreate on every render
   const toggleMission = useCallback((missionId) => {
@@ -59,12 +109,22 @@ export default function DroneVisualization() {
   const missions = useMemo(() => data?.missions || [], [data]);
 
   // passes missionId to animate
-  const handleAnimateMission = useCallback((missionId) => {
+  const handleAnimateMission = useCallback(async (missionId) => {
     if (!data || isAnimating) return; // function fails if we dont have data or are already animating
 
     // check if the mission exists but kinda redundant
-    const mission = data.missions.find(m => m.id === missionId);
+    let mission = data.missions.find(m => m.id === missionId);
     if (!mission) return;
+
+    // the animation steps through every waypoint so it needs the full route
+    if (!mission.fullResolution) {
+      try {
+        mission = { ...mission, ...(await loadGeometry(missionId)) };
+      } catch (error) {
+        console.error('Error loading mission:', error);
+        return;
+      }
+    }
     
     // deselects all missions to only show the animated one 
     // we update states 
@@ -94,7 +154,7 @@ export default function DroneVisualization() {
     
     // call to clear interval if comp unmounts
     return () => clearInterval(interval);
-  }, [data, isAnimating]); //depends on data on isAnimating
+  }, [data, isAnimating, loadGeometry]); //depends on data on isAnimating
 
   // simple wrapper function to update states
   const stopAnimation = useCallback(() => {
@@ -158,6 +218,8 @@ export default function DroneVisualization() {
           showAllWaypoints={showAllWaypoints}
           animatingMission={animatingMission}
           animationProgress={animationProgress}
+          initialZoom={INITIAL_ZOOM}
+          onZoomChange={setMapZoom}
         />
         
         <MissionDetailsTable 
@@ -2,19 +2,23 @@ import { useState, useEffect, useRef } from 'react';
 import Plot from 'react-plotly.js';
 import { generatePlotData } from '../utils/mapDataGen';
 
-export default function MissionMap({ data, selectedMissions, showAllWaypoints, animatingMission, animationProgress }) {
+export default function MissionMap({ data, selectedMissions, showAllWaypoints, animatingMission, animationProgress, initialZoom = 14, onZoomChange }) {
   const [mapError, setMapError] = useState(null);
   const plotRef = useRef(null);
   
   // stores the current map view 
   const [mapView, setMapView] = useState({
     center: {
-      lon: data.missions[0]?.coordinates[0]?.[0],
-      lat: data.missions[0]?.coordinates[0]?.[1]
+      // routes are loaded after the first render so we center on the depot
+      lon: data.depot?.longitude ?? data.missions[0]?.coordinates?.[0]?.[0],
+      lat: data.depot?.latitude ?? data.missions[0]?.coordinates?.[0]?.[1]
     },
-    zoom: 14
+    zoom: initialZoom
   });
 
+  // when the plot was last asked to redraw, to log render time in development
+  const renderStart = useRef(null);
+
   // we track if its the initial render
   const isInitialRender = useRef(true);
   
@@ -78,6 +82,7 @@ export default function MissionMap({ data, selectedMissions, showAllWaypoints, a
   }
 
   const plotData = generatePlotData(data, selectedMissions, showAllWaypoints, animatingMission, animationProgress);
+  renderStart.current = performance.now();
 
   return (
     <div className="bg-white rounded-lg shadow-md p-6">
@@ -178,9 +183,21 @@ export default function MissionMap({ data, selectedMissions, showAllWaypoints, a
                 center: figure.layout.mapbox.center,
                 zoom: figure.layout.mapbox.zoom
               });
+              // routes are simplified for the zoom level so the parent may refetch them
+              if (onZoomChange && figure.layout.mapbox.zoom !== mapView.zoom) {
+                onZoomChange(figure.layout.mapbox.zoom);
+              }
             }
             isInitialRender.current = false;
           }}
+          onAfterPlot={() => {
+            // render time per redraw and how many points were drawn, for comparing detail levels
+            if (process.env.NODE_ENV === 'development' && renderStart.current !== null) {
+              const points = plotData.reduce((sum, trace) => sum + (trace.lon?.length || 0), 0);
+              console.debug(`map render: ${(performance.now() - renderStart.current).toFixed(1)} ms, ${points} points, zoom ${mapView.zoom?.toFixed(1)}`);
+              renderStart.current = null;
+            }
+          }}
           onError={(err) => {
             console.error('Plotly error:', err);
             setMapError('Error rendering map.');
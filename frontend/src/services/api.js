@@ -1,5 +1,98 @@
 
+// restructures one mission from the backend to only the fields the frontend uses
+const toMission = m => ({
+  id: m.mission_id,
+  distance: m.total_distance_ft,
+  waypoints: m.num_waypoints,
+  photoPoints: m.num_photo_points,
+  coordinates: m.waypoints.map(wp => [wp.longitude, wp.latitude]),
+  lons: m.waypoints.map(wp => wp.longitude),
+  lats: m.waypoints.map(wp => wp.latitude),
+  waypointIndices: m.waypoints.map(wp => wp.waypoint_index),
+  fullResolution: true
+});
+
+// mission from /missions/summary, geometry is fetched later with fetchMissionGeometry
+const toMissionSummary = m => ({
+  id: m.mission_id,
+  distance: m.total_distance_ft,
+  waypoints: m.num_waypoints,
+  photoPoints: m.num_photo_points,
+  coordinates: null,
+  waypointIndices: null
+});
+
+const getJson = async (path) => {
+  const response = await fetch(`${process.env.REACT_APP_API_URL}${path}`);
+  if (!response.ok) throw new Error(`Failed to fetch ${path}`);
+  return response.json();
+};
+
+// summary fields shared by the summary and the full response
+const summaryFields = summary => ({
+  depot: summary?.depot_coordinates || {},
+  totalMissions: summary?.total_missions || 0,
+  totalDistance: summary?.total_distance_ft || 0,
+  coverage: `${summary?.total_photo_points_visited || 0} points`
+});
+
 export const api = {
+  // small first request: mission statistics and the flight zone, no waypoints
+  async fetchMissionSummary() {
+    try {
+      const [missionSummary, polygonBoundary] = await Promise.all([
+        getJson('/missions/summary'),
+        getJson('/polygon-boundary')
+      ]);
+      return {
+        missions: missionSummary.missions.map(toMissionSummary),
+        ...summaryFields(missionSummary.summary),
+        polygon: polygonBoundary.coordinates || [],
+        allPoints: [],
+        allWaypoints: { assets: [], photos: [] }
+      };
+    } catch (error) {
+      console.error('API Error:', error);
+      throw error;
+    }
+  },
+
+  // route of one mission, only coordinates and waypoint indices
+  // zoom asks the server for the simplification level that fits the map zoom (about one pixel of error)
+  // maxPoints decimates the route on the server (start and end are always kept)
+  // leave both out for every waypoint
+  async fetchMissionGeometry(missionId, { zoom, maxPoints } = {}) {
+    const params = new URLSearchParams({ fields: 'waypoint_index,longitude,latitude' });
+    if (zoom !== undefined) params.set('zoom', zoom);
+    if (maxPoints) params.set('max_points', maxPoints);
+    const mission = await getJson(`/missions/${missionId}?${params}`);
+    const lons = mission.waypoints.map(wp => wp.longitude);
+    const lats = mission.waypoints.map(wp => wp.latitude);
+    return {
+      coordinates: lons.map((lon, i) => [lon, lats[i]]),
+      lons,
+      lats,
+      waypointIndices: mission.waypoints.map(wp => wp.waypoint_index),
+      lodZoom: zoom,
+      fullResolution: mission.waypoints.length === mission.num_waypoints
+    };
+  },
+
+  // asset poles and photo points, only needed when "show all waypoints" is on
+  async fetchAllWaypoints() {
+    const [assetPoints, photoPoints] = await Promise.all([
+      getJson('/asset-points'),
+      getJson('/photo-points')
+    ]);
+    return {
+      allPoints: photoPoints.points || [],
+      allWaypoints: {
+        assets: assetPoints.points?.map(p => [p.longitude, p.latitude]) || [],
+        photos: photoPoints.points?.map(p => [p.longitude, p.latitude]) || []
+      }
+    };
+  },
+
   async fetchMissionData() {
     try {
       // Fetch all data files separately to avoid merge conflicts
@@ -13,19 +106,9 @@ export const api = {
       // data is then restructured to include only necessary data for frontend
       // various default fallbacks in case the data gets corrupted
       return {
-        missions: missionPaths.missions.map(m => ({
-          id: m.mission_id,
-          distance: m.total_distance_ft,
-          waypoints: m.num_waypoints,
-          photoPoints: m.num_photo_points,
-          coordinates: m.waypoints.map(wp => [wp.longitude, wp.latitude]),
-          waypointIndices: m.waypoints.map(wp => wp.waypoint_index)
-        })),
-        depot: missionPaths.summary?.depot_coordinates || {},
+        missions: missionPaths.missions.map(toMission),
+        ...summaryFields(missionPaths.summary),
         polygon: polygonBoundary.coordinates || [],
-        totalMissions: missionPaths.summary?.total_missions || 0,
-        totalDistance: missionPaths.summary?.total_distance_ft || 0,
-        coverage: `${missionPaths.summary?.total_photo_points_visited || 0} points`,
         allPoints: photoPoints.points || [],
         allWaypoints: {
           assets: assetPoints.points?.map(p => [p.longitude, p.latitude]) || [],
@@ -38,5 +121,32 @@ export const api = {
     }
   },
 
-  
+  // starts a background optimization, params are subset, max_distance, time_limit, min_vehicles, max_vehicles
+  async startJob(params = {}) {
+    const response = await fetch(`${process.env.REACT_APP_API_URL}/jobs`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(params)
+    });
+    if (!response.ok) throw new Error((await response.json()).error || 'Failed to start job');
+    return response.json();
+  },
+
+  async fetchJob(jobId) {
+    return getJson(`/jobs/${jobId}`);
+  },
+
+  // live solver events of a job, onSolution gets every improving solution (t, objective, span, vehicles)
+  // returns a function that closes the stream
+  subscribeJobEvents(jobId, { onSolution, onProgress, onDone } = {}) {
+    const source = new EventSource(`${process.env.REACT_APP_API_URL}/jobs/${jobId}/events`);
+    source.addEventListener('solution', e => onSolution?.(JSON.parse(e.data)));
+    source.addEventListener('progress', e => onProgress?.(JSON.parse(e.data)));
+    source.addEventListener('done', e => {
+      // close before the server ends the stream so the browser does not reconnect
+      source.close();
+      onDone?.(JSON.parse(e.data));
+    });
+    return () => source.close();
+  },
 };
@@ -48,28 +48,23 @@ export function generatePlotData(data, selectedMissions, showAllWaypoints, anima
 
   // so for in our data we have the missions array where we get each mission
   data.missions.forEach((mission, index) => {
-    if (selectedMissions.includes(mission.id)) {
+    // routes are fetched lazily, missions without coordinates are still loading
+    if (selectedMissions.includes(mission.id) && mission.coordinates) {
       //if apart of our state array we then check if the current mission matches the mission in the animatingMission state
       const isAnimating = animatingMission === mission.id;
       // which allows us to determine how much of the route to show based on animationProgress
       // if we are not animating our coords are just the full route
-      const coords = isAnimating 
-        ? mission.coordinates.slice(0, animationProgress + 1)
-        : mission.coordinates;
-      
-      const lons = coords.map(c => c[0]);
-      const lats = coords.map(c => c[1]);
+      // lons/lats are split once when the route is fetched, so animation ticks only slice them
+      const lons = isAnimating ? mission.lons.slice(0, animationProgress + 1) : mission.lons;
+      const lats = isAnimating ? mission.lats.slice(0, animationProgress + 1) : mission.lats;
       const color = colors[index % colors.length];
 
       // if we are animating and we havent reached the end we show a faded preview
       if (isAnimating && animationProgress < mission.coordinates.length - 1) {
-        const fullLons = mission.coordinates.map(c => c[0]);
-        const fullLats = mission.coordinates.map(c => c[1]);
-        
         traces.push({
           type: 'scattermapbox',
-          lon: fullLons,
-          lat: fullLats,
+          lon: mission.lons,
+          lat: mission.lats,
           mode: 'lines',
           line: { width: 2, color: color, dash: 'dot' },
           opacity: 0.3,